@@ -0,0 +1,144 @@
+"""
+This script benchmarks the DataFrame operations of utils/analytics_util.py against
+the row loops they replaced, on synthetic PR and file rows.
+
+Usage:
+python benchmarks/bench_analytics.py [--rows 10000 100000 1000000]
+
+For every size, it prints the time taken by the row loop and by the vectorized
+operation, after checking that both give the same result.
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import analytics_util
+
+DAYS_OF_WEEK = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def make_merged_prs(num_rows, seed=0):
+    """
+    Returns synthetic merged PRs spread over five years.
+    """
+    random = np.random.default_rng(seed)
+    start = pd.Timestamp("2019-01-01", tz="UTC")
+    closed_at = start + pd.to_timedelta(random.integers(0, 5 * 365 * 86400, num_rows), unit="s")
+    review_time = pd.to_timedelta(random.integers(60, 30 * 86400, num_rows), unit="s")
+    return pd.DataFrame({
+        "pr_number": np.arange(1, num_rows + 1),
+        "pr_title": [f"Change {number}" for number in range(num_rows)],
+        "closed_at": closed_at,
+        "review_time": review_time,
+    })
+
+
+def make_top_files(num_rows, num_authors=50, seed=0):
+    """
+    Returns synthetic top files rows with a list of authors each.
+    """
+    random = np.random.default_rng(seed)
+    authors = [f"author{index}" for index in range(num_authors)]
+    return pd.DataFrame({
+        "File": [f"file{index}.py" for index in range(num_rows)],
+        "Count": random.integers(1, 5, num_rows),
+        "Authors": [
+            [authors[index] for index in random.choice(num_authors, 3, replace=False)]
+            for _ in range(num_rows)
+        ],
+    })
+
+
+def loop_count_by_month_and_weekday(closed_at):
+    "The row loop replaced by analytics_util.count_by_month_and_weekday"
+    frame = pd.DataFrame({"closed_at": closed_at})
+    frame["day_of_week"] = frame["closed_at"].dt.dayofweek
+    frame["month"] = frame["closed_at"].dt.strftime("%Y-%B")
+    counts = frame.groupby(["month", "day_of_week"]).size().unstack(fill_value=0)
+    analyzed_data = []
+    for month, data in counts.iterrows():
+        for day, count in data.items():
+            analyzed_data.append({"Month": month, "Day_of_Week": DAYS_OF_WEEK[day], "Merges": count})
+    return pd.DataFrame(analyzed_data)
+
+
+def loop_format_lines(frame):
+    "The row loop replaced by analytics_util.concat_columns"
+    return [
+        f" ** PR #{row['pr_number']}: {row['pr_title']} - Review Time: {row['review_time']}"
+        for _, row in frame.iterrows()
+    ]
+
+
+def loop_unique_authors(frame):
+    "The split and join replaced by analytics_util.unique_list_values"
+    joined = [", ".join(authors) for authors in frame["Authors"]]
+    names = [name for author_names in joined for name in author_names.split(", ")]
+    return list(dict.fromkeys(names))
+
+
+def time_call(function, *args):
+    """
+    Returns the result of a call and the seconds it took.
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def run_benchmark(num_rows):
+    """
+    Times the row loops and the vectorized operations on num_rows rows.
+    Returns:
+        list: (operation, loop seconds, vectorized seconds) tuples.
+    """
+    merged_prs = make_merged_prs(num_rows)
+    top_files = make_top_files(num_rows)
+    timings = []
+
+    expected, loop_time = time_call(loop_count_by_month_and_weekday, merged_prs["closed_at"])
+    actual, vector_time = time_call(
+        analytics_util.count_by_month_and_weekday, merged_prs["closed_at"], "Merges"
+    )
+    pd.testing.assert_frame_equal(actual, expected)
+    timings.append(("count_by_month_and_weekday", loop_time, vector_time))
+
+    expected, loop_time = time_call(loop_format_lines, merged_prs)
+    actual, vector_time = time_call(
+        analytics_util.concat_columns, " ** PR #", merged_prs["pr_number"], ": ",
+        merged_prs["pr_title"], " - Review Time: ", merged_prs["review_time"],
+    )
+    assert actual.tolist() == expected
+    timings.append(("concat_columns", loop_time, vector_time))
+
+    expected, loop_time = time_call(loop_unique_authors, top_files)
+    actual, vector_time = time_call(analytics_util.unique_list_values, top_files["Authors"])
+    assert actual == expected
+    timings.append(("unique_list_values", loop_time, vector_time))
+    return timings
+
+
+def main():
+    "Runs the benchmark for every requested size and prints the timings"
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--rows", type=int, nargs="+", default=[10000, 100000, 1000000],
+        help="The numbers of rows to benchmark",
+    )
+    arguments = parser.parse_args()
+
+    print(f"{'rows':>10} {'operation':<28} {'loop (s)':>10} {'vectorized (s)':>15} {'speedup':>8}")
+    for num_rows in arguments.rows:
+        for operation, loop_time, vector_time in run_benchmark(num_rows):
+            print(
+                f"{num_rows:>10} {operation:<28} {loop_time:>10.3f} {vector_time:>15.3f} "
+                f"{loop_time / max(vector_time, 1e-9):>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
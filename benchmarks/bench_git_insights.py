@@ -0,0 +1,311 @@
+"""
+This script benchmarks the Git based insights on a synthetic repository generated offline
+by benchmarks/synthetic_repo.py.
+
+Usage:
+python benchmarks/bench_git_insights.py [--commits 1000] [--files 200] [--authors 10]
+    [--files-per-commit 3] [--diff-lines 10] [--file-types .py .js .md]
+    [--insights top_files contributors] [--backends pydriller git] [--workers 1 4]
+    [--cache cold warm] [--repeat 1] [--trace-memory]
+    [--output results.json] [--compare baseline.json]
+
+Every case, an insight run with one backend, number of workers and cache state, runs in its
+own process, so that its peak memory is measured alone. The module function of the insight
+is timed end to end, and its stages are timed by wrapping the methods of its aggregator:
+  - traversal: walking the commits and mining their diffs, including process
+  - process: feeding the commits to the aggregator, summed over the workers
+  - merge: merging the partial aggregates of the workers
+  - finalize: looking up the complexity of the reported files
+  - result: building the DataFrame
+A "cold" case starts with an empty cache, a "warm" case reuses the cache filled by the cold case.
+The results are written as JSON, which --compare reads back to print the ratios between two runs,
+for example before and after a change.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.synthetic_repo import BRANCH, SyntheticRepo, SyntheticRepoError
+
+INSIGHTS = ("top_files", "contributors")
+STAGES = ("traversal", "process", "merge", "finalize", "result")
+TIMED_METHODS = ("process", "merge", "finalize", "result")
+
+timed_aggregators = []
+
+
+def timed_method(method, stage):
+    """
+    Wraps an aggregator method to add the time it takes to the stage timings
+    kept on the aggregator, which travel with it to and from the worker processes.
+    """
+
+    def wrapper(self, *args):
+        start = time.perf_counter()
+        try:
+            return method(self, *args)
+        finally:
+            timings = self.__dict__.setdefault("bench_timings", dict.fromkeys(TIMED_METHODS, 0.0))
+            timings[stage] += time.perf_counter() - start
+            if stage == "merge":
+                for name, seconds in args[0].__dict__.get("bench_timings", {}).items():
+                    if name != "merge":
+                        timings[name] += seconds
+            elif stage == "result":
+                timed_aggregators.append(self)
+
+    return wrapper
+
+
+def instrument(aggregator_class):
+    """
+    Wraps the methods of an aggregator class with timers.
+    """
+    for stage in TIMED_METHODS:
+        setattr(aggregator_class, stage, timed_method(getattr(aggregator_class, stage), stage))
+
+
+def run_insight(insight, repo_path, start_date, end_date, backend, workers):
+    """
+    Runs the module function of an insight, with its aggregator instrumented.
+    Returns:
+        DataFrame: The result of the insight.
+    """
+    # The modules are imported here, after the cache directory of the case is set
+    from modules import fetch_author_count, fetch_most_modified_files
+
+    if insight == "top_files":
+        instrument(fetch_most_modified_files.TopFilesAggregator)
+        return fetch_most_modified_files.find_top_files(
+            repo_path, start_date, end_date, None, BRANCH, num_files=10,
+            workers=workers, backend=backend,
+        )
+    instrument(fetch_author_count.AuthorCountAggregator)
+    return fetch_author_count.get_contributors_info(
+        repo_path, f"{start_date:%Y-%m-%d}", f"{end_date:%Y-%m-%d}",
+        workers=workers, backend=backend,
+    )
+
+
+def run_case(case):
+    """
+    Runs one case in the current process and returns its measures.
+    Args:
+        case (dict): The insight, repo_path, start_date, end_date, backend, workers
+        and trace_memory of the case.
+    """
+    if case["trace_memory"]:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = run_insight(
+        case["insight"], case["repo_path"], datetime.fromisoformat(case["start_date"]),
+        datetime.fromisoformat(case["end_date"]), case["backend"], case["workers"],
+    )
+    wall_seconds = time.perf_counter() - start
+
+    timings = timed_aggregators[-1].__dict__["bench_timings"] if timed_aggregators else {}
+    stages = {stage: round(timings.get(stage, 0.0), 6) for stage in TIMED_METHODS}
+    traversal = wall_seconds - stages["merge"] - stages["finalize"] - stages["result"]
+    stages["traversal"] = round(traversal, 6)
+    measures = {
+        "wall_seconds": round(wall_seconds, 6),
+        "stages": {stage: stages[stage] for stage in STAGES},
+        "rows": len(result),
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "workers_peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1
+        ),
+    }
+    if case["trace_memory"]:
+        measures["traced_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+        tracemalloc.stop()
+    return measures
+
+
+def run_case_process(case, cache_dir):
+    """
+    Runs one case in a new process, with its own cache directory.
+    Returns:
+        dict: The measures of the case.
+    """
+    environment = dict(os.environ, GITLOG_INSIGHTS_CACHE_DIR=cache_dir)
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--run-case", json.dumps(case)],
+        env=environment, capture_output=True, text=True, check=False,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"The case {case} failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def get_revision():
+    """
+    Returns the revision of gitlog-insights being benchmarked, marked when the tree has changes.
+    """
+    project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        revision = subprocess.run(
+            ["git", "-C", project_dir, "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        changes = subprocess.run(
+            ["git", "-C", project_dir, "status", "--porcelain", "--untracked-files=no"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{revision}-dirty" if changes else revision
+
+
+def run_benchmark(arguments, repo, work_dir):
+    """
+    Generates the repository and runs every case.
+    Returns:
+        list: The cases with their measures.
+    """
+    repo_path = repo.create(os.path.join(work_dir, "repo"))
+    # The range covers the whole history, whatever the time zone used to compare dates
+    start_date = (repo.start_date - timedelta(days=1)).replace(tzinfo=None)
+    end_date = (repo.end_date + timedelta(days=1)).replace(tzinfo=None)
+
+    results = []
+    for insight in arguments.insights:
+        for backend in arguments.backends:
+            for workers in arguments.workers:
+                if backend != "pydriller" and workers > 1:
+                    # The git and rollup backends read the history in one stream, without workers
+                    continue
+                case = {
+                    "insight": insight, "repo_path": repo_path, "backend": backend,
+                    "workers": workers, "start_date": start_date.isoformat(),
+                    "end_date": end_date.isoformat(), "trace_memory": arguments.trace_memory,
+                }
+                best = {}
+                for _ in range(arguments.repeat):
+                    cache_dir = tempfile.mkdtemp(prefix="cache_", dir=work_dir)
+                    for cache_state in ("cold", "warm"):
+                        measures = run_case_process(case, cache_dir)
+                        if cache_state not in arguments.cache:
+                            continue
+                        if (cache_state not in best
+                                or measures["wall_seconds"] < best[cache_state]["wall_seconds"]):
+                            best[cache_state] = measures
+                    shutil.rmtree(cache_dir, ignore_errors=True)
+                for cache_state in arguments.cache:
+                    results.append({
+                        "insight": insight, "backend": backend, "workers": workers,
+                        "cache": cache_state, **best[cache_state],
+                    })
+                    print_case(results[-1])
+    return results
+
+
+def case_key(case):
+    "Returns the fields identifying a case across result files"
+    return case["insight"], case["backend"], case["workers"], case["cache"]
+
+
+def print_case(case):
+    "Prints the measures of a case on one line"
+    stages = " ".join(f"{stage}={case['stages'][stage]:.3f}" for stage in STAGES)
+    print(
+        f"{case['insight']:<13} {case['backend']:<10} workers={case['workers']:<3} "
+        f"{case['cache']:<5} wall={case['wall_seconds']:.3f}s {stages} "
+        f"rss={case['peak_rss_mb']}MB"
+    )
+
+
+def compare_results(baseline, current):
+    """
+    Prints the ratio of the wall time and peak memory of every case to the baseline.
+    """
+    if baseline["repo"] != current["repo"]:
+        print("Warning: the baseline was measured on a different synthetic repository")
+    if baseline.get("trace_memory") != current["trace_memory"]:
+        print("Warning: only one of the runs traced memory, which slows the runs")
+    baseline_cases = {case_key(case): case for case in baseline["cases"]}
+    print(f"\nCompared with {baseline['revision']}:")
+    for case in current["cases"]:
+        old = baseline_cases.get(case_key(case))
+        if old is None:
+            continue
+        print(
+            f"{' '.join(str(field) for field in case_key(case)):<40} "
+            f"wall {old['wall_seconds']:.3f}s -> {case['wall_seconds']:.3f}s "
+            f"({case['wall_seconds'] / max(old['wall_seconds'], 1e-9):.2f}x), "
+            f"rss {old['peak_rss_mb']}MB -> {case['peak_rss_mb']}MB"
+        )
+
+
+def main():
+    "Generates the synthetic repository, runs the cases and writes the results"
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--commits", type=int, default=1000)
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--authors", type=int, default=10)
+    parser.add_argument("--files-per-commit", type=int, default=3)
+    parser.add_argument("--diff-lines", type=int, default=10)
+    parser.add_argument("--file-types", nargs="+", default=[".py", ".js", ".md"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--insights", nargs="+", choices=INSIGHTS, default=list(INSIGHTS))
+    parser.add_argument("--backends", nargs="+", choices=("pydriller", "git", "rollup"),
+                        default=["pydriller", "git"])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1])
+    parser.add_argument("--cache", nargs="+", choices=("cold", "warm"), default=["cold", "warm"])
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="The number of runs of every case, the fastest is kept")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Also record the peak of Python allocations, which slows the runs")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="A results file to compare with")
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    arguments = parser.parse_args()
+
+    if arguments.run_case:
+        print(json.dumps(run_case(json.loads(arguments.run_case))))
+        return
+
+    repo = SyntheticRepo(
+        commits=arguments.commits, files=arguments.files, authors=arguments.authors,
+        files_per_commit=arguments.files_per_commit, diff_lines=arguments.diff_lines,
+        file_types=arguments.file_types, seed=arguments.seed,
+    )
+    with tempfile.TemporaryDirectory(prefix="gitlog_insights_bench_") as work_dir:
+        try:
+            cases = run_benchmark(arguments, repo, work_dir)
+        except (SyntheticRepoError, RuntimeError) as error:
+            print(error)
+            sys.exit(1)
+
+    results = {
+        "revision": get_revision(),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "repo": repo.parameters(),
+        "trace_memory": arguments.trace_memory,
+        "cases": cases,
+    }
+    with open(arguments.output, "w", encoding="utf-8") as output_file:
+        json.dump(results, output_file, indent=2)
+    print(f"Results written to {arguments.output}")
+
+    if arguments.compare:
+        with open(arguments.compare, encoding="utf-8") as baseline_file:
+            compare_results(json.load(baseline_file), results)
+
+
+if __name__ == "__main__":
+    main()
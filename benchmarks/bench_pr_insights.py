@@ -0,0 +1,242 @@
+"""
+This script benchmarks the PR based insights against the fake GitHub API of
+benchmarks/fake_github.py, serving a synthetic corpus of PRs or a recorded cassette.
+
+Usage:
+python benchmarks/bench_pr_insights.py [--prs 2000] [--authors 20] [--days 365]
+    [--latency 50] [--jitter 10] [--rate-limit 5000 --rate-window 3600] [--error-rate 0.01]
+    [--replay cassette.json --repo-name owner/name --start-date 2023-01-01 --end-date 2023-12-31]
+    [--insights review_time size_of_prs merge_activity] [--apis rest graphql]
+    [--store on off] [--cache cold warm] [--output results.json] [--compare baseline.json]
+
+The fake API runs in its own process. Every case, an insight run with one API mode, with
+or without the PR store and with a cold or warm cache, runs in its own process too,
+and reports its wall time, the API calls it made by endpoint and status, the bytes
+it received and the requests per second. A "warm" case reuses the caches and the PR store
+filled by the "cold" case. The results are written as JSON, which --compare reads back
+to print the ratios between two runs.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime, timedelta, timezone
+import requests
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.fake_github import DEFAULT_START_DATE, add_server_arguments
+from benchmarks.bench_git_insights import get_revision
+
+INSIGHTS = ("review_time", "size_of_prs", "merge_activity")
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_github.py")
+SERVER_ARGUMENTS = (
+    "repo_name", "prs", "authors", "days", "max_files", "seed", "latency", "jitter",
+    "rate_limit", "rate_window", "error_rate", "retry_after", "replay",
+)
+
+
+def run_insight(insight, repo_name, start_date, end_date):
+    """
+    Runs the module functions of an insight, like its script does.
+    Returns:
+        DataFrame: The result of the insight.
+    """
+    # The modules are imported here, after the settings of the case are set
+    from helpers.github_pr_data_extractor import PRDataExtractor
+    from modules import fetch_pr_review_time, fetch_report_merge_activity, fetch_size_of_pr
+
+    if insight == "review_time":
+        return fetch_pr_review_time.calculate_review_time(repo_name, start_date, end_date)
+    if insight == "size_of_prs":
+        return fetch_size_of_pr.get_pr_details(repo_name, start_date, end_date)
+    merge_details = PRDataExtractor(repo_name).get_merged_pr_details(start_date, end_date)
+    if merge_details.empty:
+        return merge_details
+    return fetch_report_merge_activity.get_merge_activity_details(merge_details)
+
+
+def run_case(case):
+    """
+    Runs one case in the current process and returns its measures.
+    """
+    start = time.perf_counter()
+    result = run_insight(case["insight"], case["repo_name"], case["start_date"], case["end_date"])
+    return {"wall_seconds": round(time.perf_counter() - start, 6), "rows": len(result)}
+
+
+def run_case_process(case, server_url, cache_dir):
+    """
+    Runs one case in a new process and adds the requests served by the fake API.
+    Returns:
+        dict: The measures of the case.
+    """
+    environment = dict(
+        os.environ,
+        GITLOG_INSIGHTS_API_URL=server_url,
+        GITLOG_INSIGHTS_CACHE_DIR=cache_dir,
+        GITLOG_INSIGHTS_PR_API=case["api"],
+        GITLOG_INSIGHTS_PR_STORE="true" if case["store"] == "on" else "false",
+        TOKEN=os.environ.get("TOKEN", "benchmark"),
+    )
+    requests.post(f"{server_url}/_stats/reset", timeout=10)
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--run-case", json.dumps(case)],
+        env=environment, capture_output=True, text=True, check=False,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"The case {case} failed:\n{completed.stderr}")
+    measures = json.loads(completed.stdout.strip().splitlines()[-1])
+    stats = requests.get(f"{server_url}/_stats", timeout=10).json()
+    measures.update({
+        "api_calls": stats["requests"],
+        "endpoints": stats["endpoints"],
+        "statuses": stats["statuses"],
+        "rate_limited": stats["rate_limited"],
+        "bytes_received": stats["bytes_sent"],
+        "requests_per_second": round(stats["requests"] / max(measures["wall_seconds"], 1e-9), 1),
+    })
+    return measures
+
+
+def start_server_process(arguments):
+    """
+    Starts the fake API in its own process.
+    Returns:
+        tuple: The process and the URL of the fake API.
+    """
+    command = [sys.executable, SERVER_SCRIPT, "--port", "0"]
+    for name in SERVER_ARGUMENTS:
+        value = getattr(arguments, name)
+        if value is not None:
+            command += [f"--{name.replace('_', '-')}", str(value)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    first_line = process.stdout.readline()
+    if not first_line:
+        process.wait()
+        raise RuntimeError("The fake GitHub API did not start")
+    return process, first_line.split()[-1]
+
+
+def run_benchmark(arguments, server_url, work_dir):
+    """
+    Runs every case against the fake API.
+    Returns:
+        list: The cases with their measures.
+    """
+    results = []
+    for insight in arguments.insights:
+        for api in arguments.apis:
+            for store in arguments.store:
+                case = {
+                    "insight": insight, "api": api, "store": store,
+                    "repo_name": arguments.repo_name,
+                    "start_date": arguments.start_date, "end_date": arguments.end_date,
+                }
+                cache_dir = tempfile.mkdtemp(prefix="cache_", dir=work_dir)
+                for cache_state in ("cold", "warm"):
+                    measures = run_case_process(case, server_url, cache_dir)
+                    if cache_state in arguments.cache:
+                        results.append({
+                            "insight": insight, "api": api, "store": store,
+                            "cache": cache_state, **measures,
+                        })
+                        print_case(results[-1])
+                shutil.rmtree(cache_dir, ignore_errors=True)
+    return results
+
+
+def case_key(case):
+    "Returns the fields identifying a case across result files"
+    return case["insight"], case["api"], case["store"], case["cache"]
+
+
+def print_case(case):
+    "Prints the measures of a case on one line"
+    print(
+        f"{case['insight']:<15} {case['api']:<8} store={case['store']:<4} {case['cache']:<5} "
+        f"wall={case['wall_seconds']:.3f}s calls={case['api_calls']} "
+        f"({case['requests_per_second']}/s) rate_limited={case['rate_limited']} "
+        f"received={case['bytes_received'] / 2**20:.1f}MB rows={case['rows']}"
+    )
+
+
+def compare_results(baseline, current):
+    """
+    Prints the ratio of the wall time and API calls of every case to the baseline.
+    """
+    if baseline["server"] != current["server"]:
+        print("Warning: the baseline was measured with a different fake API")
+    baseline_cases = {case_key(case): case for case in baseline["cases"]}
+    print(f"\nCompared with {baseline['revision']}:")
+    for case in current["cases"]:
+        old = baseline_cases.get(case_key(case))
+        if old is None:
+            continue
+        print(
+            f"{' '.join(case_key(case)):<40} "
+            f"wall {old['wall_seconds']:.3f}s -> {case['wall_seconds']:.3f}s "
+            f"({case['wall_seconds'] / max(old['wall_seconds'], 1e-9):.2f}x), "
+            f"calls {old['api_calls']} -> {case['api_calls']}"
+        )
+
+
+def main():
+    "Starts the fake API, runs the cases and writes the results"
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    add_server_arguments(parser)
+    parser.add_argument("--start-date", help="Defaults to the first day of the synthetic PRs")
+    parser.add_argument("--end-date", help="Defaults to the last day of the synthetic PRs")
+    parser.add_argument("--insights", nargs="+", choices=INSIGHTS, default=list(INSIGHTS))
+    parser.add_argument("--apis", nargs="+", choices=("rest", "graphql"), default=["rest"])
+    parser.add_argument("--store", nargs="+", choices=("on", "off"), default=["on", "off"])
+    parser.add_argument("--cache", nargs="+", choices=("cold", "warm"), default=["cold", "warm"])
+    parser.add_argument("--output", default="benchmark_pr_results.json")
+    parser.add_argument("--compare", help="A results file to compare with")
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    arguments = parser.parse_args()
+
+    if arguments.run_case:
+        print(json.dumps(run_case(json.loads(arguments.run_case))))
+        return
+
+    arguments.start_date = arguments.start_date or f"{DEFAULT_START_DATE:%Y-%m-%d}"
+    arguments.end_date = arguments.end_date or (
+        f"{DEFAULT_START_DATE + timedelta(days=arguments.days):%Y-%m-%d}"
+    )
+    server_process, server_url = start_server_process(arguments)
+    try:
+        with tempfile.TemporaryDirectory(prefix="gitlog_insights_bench_") as work_dir:
+            cases = run_benchmark(arguments, server_url, work_dir)
+    except RuntimeError as error:
+        print(error)
+        sys.exit(1)
+    finally:
+        server_process.terminate()
+        server_process.wait()
+
+    results = {
+        "revision": get_revision(),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "server": {name: getattr(arguments, name) for name in SERVER_ARGUMENTS},
+        "start_date": arguments.start_date,
+        "end_date": arguments.end_date,
+        "cases": cases,
+    }
+    with open(arguments.output, "w", encoding="utf-8") as output_file:
+        json.dump(results, output_file, indent=2)
+    print(f"Results written to {arguments.output}")
+
+    if arguments.compare:
+        with open(arguments.compare, encoding="utf-8") as baseline_file:
+            compare_results(json.load(baseline_file), results)
+
+
+if __name__ == "__main__":
+    main()
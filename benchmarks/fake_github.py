@@ -0,0 +1,717 @@
+"""
+This script runs a local stand-in for the GitHub API, to benchmark the PR based insights
+repeatably and offline. Point the insights at it with the GITLOG_INSIGHTS_API_URL setting.
+
+It serves the endpoints read by the insights:
+  - GET /search/issues, with the 1000 results cap and Link header pagination
+  - GET /repos/{owner}/{name}/pulls/{number}/files, with Link header pagination
+  - POST /graphql, for the search, count and files queries of PRDataExtractor
+The data comes either from a synthetic corpus of PRs of any size, generated from a seed,
+or from a cassette of responses recorded from the real API with --record.
+It can simulate latency, rate limits with the X-RateLimit-* headers, and secondary
+rate limit 403 errors. GET /_stats returns the requests served, POST /_stats/reset clears them.
+
+Usage:
+python benchmarks/fake_github.py [--port 8000] [--prs 2000] [--authors 20] [--days 365]
+    [--latency 50] [--jitter 10] [--rate-limit 5000 --rate-window 3600] [--error-rate 0.01]
+python benchmarks/fake_github.py --record cassette.json [--upstream https://api.github.com]
+python benchmarks/fake_github.py --replay cassette.json
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import base64
+import bisect
+import random
+import signal
+import hashlib
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlparse
+import requests
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from helpers.search_window import SEARCH_RESULT_LIMIT, parse_search_date
+
+DEFAULT_REPO_NAME = "qxf2/synthetic"
+DEFAULT_START_DATE = datetime(2023, 1, 1, tzinfo=timezone.utc)
+DEFAULT_PAGE_SIZE = 30
+MAX_PAGE_SIZE = 100
+DATE_FIELDS = ("created", "merged", "updated")
+FILE_STATUSES = ("added", "modified", "modified", "modified", "removed", "renamed")
+# The file statuses of the REST API, mapped to the change types of the GraphQL API
+CHANGE_TYPES = {"removed": "DELETED"}
+FILES_PATH_PATTERN = re.compile(r"^/repos/([^/]+/[^/]+)/pulls/(\d+)/files$")
+# The aliased fields of the batched files queries, such as pr0: pullRequest(number: $number0)
+PR_ALIAS_PATTERN = re.compile(r"(\w+): pullRequest\(number: \$(\w+)\)")
+RECORDED_HEADERS = ("Link", "ETag", "Last-Modified", "Content-Type")
+
+
+def to_api_date(date):
+    """
+    Formats a date like the GitHub API, or returns None.
+    """
+    return date.strftime("%Y-%m-%dT%H:%M:%SZ") if date else None
+
+
+def encode_cursor(offset):
+    "Returns an opaque GraphQL cursor for an offset"
+    return base64.b64encode(f"cursor:{offset}".encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    "Returns the offset following a GraphQL cursor"
+    if not cursor:
+        return 0
+    return int(base64.b64decode(cursor).decode("utf-8").split(":", 1)[1]) + 1
+
+
+def get_endpoint(path):
+    """
+    Returns the name under which requests to a path are counted.
+    """
+    if path.startswith("/search/"):
+        return "search"
+    if path.startswith("/graphql"):
+        return "graphql"
+    if FILES_PATH_PATTERN.match(path):
+        return "files"
+    return "other"
+
+
+class SyntheticCorpus:
+    """
+    Pull requests generated from a seed. The files of a PR are generated from the seed
+    and the PR number when they are requested, so large corpora take little memory.
+    """
+
+    def __init__(
+        self, repo_name=DEFAULT_REPO_NAME, num_prs=2000, authors=20, days=365,
+        max_files=300, merged_fraction=0.8, closed_fraction=0.1, seed=0,
+        start_date=DEFAULT_START_DATE,
+    ):
+        """
+        Generates the pull requests.
+        Args:
+            repo_name (str): The name of the repository, in the queries.
+            num_prs (int): The number of pull requests.
+            authors (int): The number of authors. A few authors open most PRs.
+            days (int): The number of days over which the PRs are created.
+            max_files (int): The maximum number of files of a PR. The number of files
+            has a long tail, so a few PRs need several pages of files.
+            merged_fraction (float): The fraction of merged PRs.
+            closed_fraction (float): The fraction of PRs closed without being merged.
+            seed (int): The seed of the random generator.
+            start_date (datetime): The date of the first PR.
+        """
+        self.repo_name = repo_name
+        self.max_files = max_files
+        self.seed = seed
+        random_generator = random.Random(seed)
+        author_names = [f"author{index}" for index in range(authors)]
+        author_weights = [1 / (index + 1) for index in range(authors)]
+        period = days * 86400
+
+        self.pull_requests = []
+        for number in range(1, num_prs + 1):
+            created_at = start_date + timedelta(seconds=period * number / num_prs)
+            closed_at = merged_at = None
+            outcome = random_generator.random()
+            if outcome < merged_fraction + closed_fraction:
+                review_time = timedelta(seconds=random_generator.expovariate(1 / (2 * 86400)))
+                closed_at = created_at + review_time
+                if outcome < merged_fraction:
+                    merged_at = closed_at
+            updated_at = (closed_at or created_at) + timedelta(
+                seconds=random_generator.randint(0, 3600)
+            )
+            self.pull_requests.append({
+                "number": number,
+                "title": f"Change {number}",
+                "author": random_generator.choices(author_names, author_weights)[0],
+                "created": created_at,
+                "closed": closed_at,
+                "merged": merged_at,
+                "updated": updated_at,
+            })
+
+        # The PRs sorted by every date field, to find the PRs of a date range by bisection
+        self.indexes = {}
+        for field in DATE_FIELDS:
+            dated = sorted(
+                (pull_request[field].timestamp(), pull_request["number"])
+                for pull_request in self.pull_requests if pull_request[field]
+            )
+            self.indexes[field] = (
+                [timestamp for timestamp, _ in dated], [number for _, number in dated]
+            )
+
+    def get_files(self, number):
+        """
+        Returns the files of a pull request, in the format of the REST API.
+        """
+        random_generator = random.Random(f"{self.seed}-{number}")
+        num_files = min(self.max_files, int(random_generator.paretovariate(1.2)))
+        files = []
+        for index in range(num_files):
+            status = random_generator.choice(FILE_STATUSES)
+            additions = 0 if status == "removed" else random_generator.randint(1, 200)
+            deletions = 0 if status == "added" else random_generator.randint(0, 100)
+            files.append({
+                "filename": f"src/package{index % 10}/module{number}_{index}.py",
+                "status": status,
+                "additions": additions,
+                "deletions": deletions,
+                "changes": additions + deletions,
+            })
+        return files
+
+    def search(self, query):
+        """
+        Returns the pull requests matching a search query, with the qualifiers used by
+        the insights: is:pr, is:merged, repo: and a created, merged or updated range.
+        """
+        terms = [term.split(":", 1) for term in query.split() if ":" in term]
+        flags = {value for name, value in terms if name == "is"}
+        qualifiers = {name: value for name, value in terms if name != "is"}
+        if qualifiers.get("repo", self.repo_name) != self.repo_name or "issue" in flags:
+            return []
+
+        field = next((field for field in DATE_FIELDS if field in qualifiers), "created")
+        timestamps, numbers = self.indexes[field]
+        start, end = 0, len(numbers)
+        if field in qualifiers:
+            range_start, _, range_end = qualifiers[field].partition("..")
+            start = bisect.bisect_left(
+                timestamps, parse_search_date(range_start, is_end=False).timestamp()
+            )
+            end = bisect.bisect_right(
+                timestamps, parse_search_date(range_end or "*", is_end=True).timestamp()
+            )
+        matches = [self.pull_requests[number - 1] for number in numbers[start:end]]
+        if "merged" in flags:
+            matches = [pull_request for pull_request in matches if pull_request["merged"]]
+        if "open" in flags or "closed" in flags:
+            matches = [
+                pull_request for pull_request in matches
+                if bool(pull_request["closed"]) == ("closed" in flags)
+            ]
+        return matches
+
+    @staticmethod
+    def search_item(pull_request):
+        """
+        Returns a pull request in the format of the REST search API.
+        """
+        return {
+            "number": pull_request["number"],
+            "title": pull_request["title"],
+            "user": {"login": pull_request["author"]},
+            "state": "closed" if pull_request["closed"] else "open",
+            "created_at": to_api_date(pull_request["created"]),
+            "closed_at": to_api_date(pull_request["closed"]),
+            "updated_at": to_api_date(pull_request["updated"]),
+            "pull_request": {"merged_at": to_api_date(pull_request["merged"])},
+        }
+
+    @staticmethod
+    def file_node(file):
+        """
+        Returns a file in the format of the GraphQL API.
+        """
+        return {
+            "path": file["filename"],
+            "additions": file["additions"],
+            "deletions": file["deletions"],
+            "changeType": CHANGE_TYPES.get(file["status"], file["status"].upper()),
+        }
+
+    def files_connection(self, number, first, after):
+        """
+        Returns a page of the files of a pull request, as a GraphQL connection.
+        """
+        files = self.get_files(number)
+        offset = decode_cursor(after)
+        page = files[offset:offset + first]
+        return {
+            "pageInfo": {
+                "hasNextPage": offset + first < len(files),
+                "endCursor": encode_cursor(offset + len(page) - 1) if page else after,
+            },
+            "nodes": [self.file_node(file) for file in page],
+        }
+
+    def pr_node(self, pull_request, variables):
+        """
+        Returns a pull request in the format of the GraphQL API.
+        """
+        if pull_request["merged"]:
+            state = "MERGED"
+        else:
+            state = "CLOSED" if pull_request["closed"] else "OPEN"
+        node = {
+            "number": pull_request["number"],
+            "title": pull_request["title"],
+            "state": state,
+            "createdAt": to_api_date(pull_request["created"]),
+            "closedAt": to_api_date(pull_request["closed"]),
+            "mergedAt": to_api_date(pull_request["merged"]),
+            "updatedAt": to_api_date(pull_request["updated"]),
+            "author": {"login": pull_request["author"]},
+        }
+        if variables.get("withFiles"):
+            node["files"] = self.files_connection(
+                pull_request["number"], variables.get("filesFirst", MAX_PAGE_SIZE), None
+            )
+        return node
+
+    def graphql(self, query, variables):
+        """
+        Answers the GraphQL queries of PRDataExtractor.
+        Returns:
+            dict: The body of the response.
+        """
+        aliases = PR_ALIAS_PATTERN.findall(query)
+        if aliases:
+            repository = {}
+            for alias, variable in aliases:
+                number = variables[variable]
+                if f"{variables['owner']}/{variables['name']}" != self.repo_name or not (
+                        1 <= number <= len(self.pull_requests)):
+                    return {"data": {"repository": None},
+                            "errors": [{"message": f"Could not resolve to a PullRequest {number}"}]}
+                repository[alias] = {
+                    "number": number,
+                    "files": self.files_connection(number, variables["first"], None),
+                }
+            return {"data": {"repository": repository}}
+        if "pullRequest(" in query:
+            number = variables["number"]
+            if f"{variables['owner']}/{variables['name']}" != self.repo_name or not (
+                    1 <= number <= len(self.pull_requests)):
+                return {"data": {"repository": None},
+                        "errors": [{"message": f"Could not resolve to a PullRequest {number}"}]}
+            files = self.files_connection(number, variables["first"], variables.get("after"))
+            return {"data": {"repository": {"pullRequest": {"files": files}}}}
+
+        matches = self.search(variables["query"])
+        if "issueCount" in query:
+            return {"data": {"search": {"issueCount": len(matches)}}}
+        if "search(" in query:
+            offset = decode_cursor(variables.get("after"))
+            end = min(offset + variables["first"], len(matches), SEARCH_RESULT_LIMIT)
+            page = matches[offset:end]
+            return {"data": {"search": {
+                "pageInfo": {
+                    "hasNextPage": end < min(len(matches), SEARCH_RESULT_LIMIT),
+                    "endCursor": encode_cursor(end - 1) if page else None,
+                },
+                "nodes": [self.pr_node(pull_request, variables) for pull_request in page],
+            }}}
+        return {"errors": [{"message": "Unsupported query"}]}
+
+
+class Cassette:
+    """
+    Responses recorded from the real API, replayed by the request they answered.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.responses = {}
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as cassette_file:
+                self.responses = json.load(cassette_file)["responses"]
+
+    @staticmethod
+    def make_key(method, path, query, body):
+        """
+        Returns the key of a request: its method, path, sorted query parameters and body.
+        """
+        key = f"{method} {path}?{urlencode(sorted(parse_qsl(query)))}"
+        if body:
+            key += " " + hashlib.sha256(body).hexdigest()
+        return key
+
+    def get(self, key):
+        "Returns the recorded response of a request, or None"
+        return self.responses.get(key)
+
+    def put(self, key, status, headers, body, upstream):
+        """
+        Records a response. Links to the upstream API are stored relative to it.
+        """
+        headers = {name: value for name, value in headers.items() if name in RECORDED_HEADERS}
+        if "Link" in headers:
+            headers["Link"] = headers["Link"].replace(upstream, "{base_url}")
+        with self.lock:
+            self.responses[key] = {"status": status, "headers": headers, "body": body}
+
+    def save(self):
+        "Writes the recorded responses to the cassette file"
+        with self.lock, open(self.path, "w", encoding="utf-8") as cassette_file:
+            json.dump({"responses": self.responses}, cassette_file)
+
+
+class FakeGitHubServer(ThreadingHTTPServer):
+    """
+    The HTTP server of the fake API, with the simulated latency, rate limits and errors,
+    and the statistics of the requests served.
+    """
+    daemon_threads = True
+
+    def __init__(
+        self, address, corpus=None, cassette=None, upstream=None, record=False, latency=0,
+        jitter=0, rate_limit=None, rate_window=3600, error_rate=0, retry_after=1, seed=0,
+    ):
+        """
+        Initializes the server.
+        Args:
+            address (tuple): The host and port to listen on, port 0 picks a free port.
+            corpus (SyntheticCorpus, optional): The pull requests served.
+            cassette (Cassette, optional): The recorded responses served, or recorded.
+            upstream (str, optional): The URL of the API whose responses are recorded.
+            record (bool): Whether to forward the requests to the upstream API and record them.
+            latency (float): The time taken by every response, in milliseconds.
+            jitter (float): The maximum random time added to the latency, in milliseconds.
+            rate_limit (int, optional): The number of requests allowed per rate limit window,
+            for each of the search, GraphQL and other endpoints. Unlimited by default.
+            rate_window (int): The duration of a rate limit window, in seconds.
+            error_rate (float): The fraction of requests answered with a secondary rate limit 403.
+            retry_after (int): The Retry-After of the secondary rate limit errors, in seconds.
+            seed (int): The seed of the random latencies and errors.
+        """
+        super().__init__(address, FakeGitHubHandler)
+        self.corpus = corpus
+        self.cassette = cassette
+        self.upstream = upstream.rstrip("/") if upstream else None
+        self.record = record
+        self.latency = latency / 1000
+        self.jitter = jitter / 1000
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.random_generator = random.Random(seed)
+        self.lock = threading.Lock()
+        self.rate_limit_windows = {}
+        self.reset_stats()
+
+    @property
+    def base_url(self):
+        "Returns the URL of the fake API"
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset_stats(self):
+        "Clears the statistics of the requests served"
+        with self.lock:
+            self.stats = {
+                "requests": 0,
+                "endpoints": {},
+                "statuses": {},
+                "bytes_sent": 0,
+                "rate_limited": 0,
+                "started_at": time.time(),
+            }
+
+    def get_stats(self):
+        "Returns the statistics of the requests served"
+        with self.lock:
+            stats = json.loads(json.dumps(self.stats))
+        stats["elapsed_seconds"] = round(time.time() - stats.pop("started_at"), 6)
+        return stats
+
+    def count_request(self, endpoint, status, num_bytes):
+        "Adds a request to the statistics"
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats["endpoints"][endpoint] = self.stats["endpoints"].get(endpoint, 0) + 1
+            self.stats["statuses"][str(status)] = self.stats["statuses"].get(str(status), 0) + 1
+            self.stats["bytes_sent"] += num_bytes
+            if status in (403, 429):
+                self.stats["rate_limited"] += 1
+
+    def get_delay(self):
+        "Returns the simulated latency of a response, in seconds"
+        with self.lock:
+            return self.latency + self.random_generator.uniform(0, self.jitter)
+
+    def is_secondary_rate_limited(self):
+        "Returns True when a request must fail with a secondary rate limit"
+        with self.lock:
+            return self.random_generator.random() < self.error_rate
+
+    def use_rate_limit(self, resource):
+        """
+        Counts a request against the rate limit of a resource.
+        Returns:
+            dict: The X-RateLimit-* headers of the response, with "exceeded"
+            set when the request is over the limit.
+        """
+        limit = self.rate_limit or 1000000
+        with self.lock:
+            now = time.time()
+            window = self.rate_limit_windows.get(resource)
+            if window is None or now >= window["reset"]:
+                window = self.rate_limit_windows[resource] = {
+                    "used": 0, "reset": int(now + self.rate_window)
+                }
+            exceeded = window["used"] >= limit
+            if not exceeded:
+                window["used"] += 1
+            return {
+                "X-RateLimit-Limit": str(limit),
+                "X-RateLimit-Remaining": str(limit - window["used"]),
+                "X-RateLimit-Reset": str(window["reset"]),
+                "X-RateLimit-Used": str(window["used"]),
+                "X-RateLimit-Resource": resource,
+                "exceeded": exceeded,
+            }
+
+
+class FakeGitHubHandler(BaseHTTPRequestHandler):
+    """
+    Answers the requests of the fake API.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        "Requests are counted in the statistics instead of being logged"
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        "Answers a GET request"
+        self.handle_api_request("GET", b"")
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        "Answers a POST request"
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        url = urlparse(self.path)
+        if url.path == "/_stats/reset":
+            self.server.reset_stats()
+            self.send_json(200, {})
+            return
+        self.handle_api_request("POST", body)
+
+    def send_json(self, status, body, headers=None):
+        """
+        Sends a JSON response.
+        Returns:
+            int: The number of bytes of the body.
+        """
+        data = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+        return len(data)
+
+    def handle_api_request(self, method, body):
+        """
+        Answers a request of the API, after the simulated latency and rate limits.
+        """
+        url = urlparse(self.path)
+        if url.path == "/_stats":
+            self.send_json(200, self.server.get_stats())
+            return
+
+        server = self.server
+        endpoint = get_endpoint(url.path)
+        resource = {"search": "search", "graphql": "graphql"}.get(endpoint, "core")
+        time.sleep(server.get_delay())
+        rate_limit = server.use_rate_limit(resource)
+        headers = {name: value for name, value in rate_limit.items() if name != "exceeded"}
+        if rate_limit["exceeded"]:
+            status, response = 403, {"message": "API rate limit exceeded"}
+        elif server.is_secondary_rate_limited():
+            headers["Retry-After"] = str(server.retry_after)
+            status, response = 403, {"message": "You have exceeded a secondary rate limit."}
+        else:
+            status, response, response_headers = self.get_api_response(method, url, body)
+            headers.update(response_headers)
+        if status == 200:
+            data = response if isinstance(response, bytes) else json.dumps(response).encode()
+            etag = f'"{hashlib.md5(data).hexdigest()}"'
+            headers["ETag"] = etag
+            if self.headers.get("If-None-Match") == etag:
+                status, response = 304, b""
+        size = self.send_json(status, response, headers)
+        server.count_request(endpoint, status, size)
+
+    def get_api_response(self, method, url, body):
+        """
+        Returns the status, body and headers of the response to an API request.
+        """
+        server = self.server
+        if server.cassette is not None:
+            key = Cassette.make_key(method, url.path, url.query, body)
+            if server.record:
+                return self.record_response(key, method, url, body)
+            recorded = server.cassette.get(key)
+            if recorded is None:
+                return 404, {"message": f"No recorded response for {key}"}, {}
+            headers = dict(recorded["headers"])
+            if "Link" in headers:
+                headers["Link"] = headers["Link"].replace("{base_url}", server.base_url)
+            return recorded["status"], recorded["body"].encode("utf-8"), headers
+
+        params = dict(parse_qsl(url.query))
+        if method == "POST" and url.path == "/graphql":
+            request = json.loads(body or b"{}")
+            return 200, server.corpus.graphql(request["query"], request.get("variables") or {}), {}
+        if url.path == "/search/issues":
+            matches = server.corpus.search(params.get("q", ""))
+            return self.get_page(url, params, matches[:SEARCH_RESULT_LIMIT], len(matches))
+        match = FILES_PATH_PATTERN.match(url.path)
+        if match and match.group(1) == server.corpus.repo_name:
+            number = int(match.group(2))
+            if 1 <= number <= len(server.corpus.pull_requests):
+                return self.get_page(url, params, server.corpus.get_files(number))
+        return 404, {"message": "Not Found"}, {}
+
+    def get_page(self, url, params, items, total_count=None):
+        """
+        Returns the response with a page of items and its Link header.
+        Args:
+            items (list): All the items, the page is selected with the page and
+            per_page parameters.
+            total_count (int, optional): The number of results of a search,
+            whose items are wrapped with the count.
+        """
+        per_page = min(int(params.get("per_page", DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+        page = max(int(params.get("page", 1)), 1)
+        last_page = max(1, -(-len(items) // per_page))
+        page_items = items[(page - 1) * per_page:page * per_page]
+        if total_count is not None:
+            page_items = {
+                "total_count": total_count,
+                "incomplete_results": False,
+                "items": [SyntheticCorpus.search_item(item) for item in page_items],
+            }
+
+        links = []
+        page_url = f"{self.server.base_url}{url.path}?"
+        for relation, number in (("prev", page - 1), ("next", page + 1),
+                                 ("last", last_page), ("first", 1)):
+            if (relation in ("prev", "first") and page > 1) or (
+                    relation in ("next", "last") and page < last_page):
+                links.append(f'<{page_url}{urlencode({**params, "page": number})}>; '
+                             f'rel="{relation}"')
+        return 200, page_items, {"Link": ", ".join(links)} if links else {}
+
+    def record_response(self, key, method, url, body):
+        """
+        Forwards a request to the upstream API and records its response.
+        """
+        server = self.server
+        headers = {
+            name: value for name, value in self.headers.items()
+            if name in ("Authorization", "Accept", "Content-Type")
+        }
+        upstream_response = requests.request(
+            method, f"{server.upstream}{url.path}", params=parse_qsl(url.query),
+            data=body or None, headers=headers, timeout=30,
+        )
+        if upstream_response.status_code == 200:
+            server.cassette.put(
+                key, 200, upstream_response.headers, upstream_response.text, server.upstream
+            )
+        response_headers = {
+            name: value for name, value in upstream_response.headers.items()
+            if name in RECORDED_HEADERS
+        }
+        if "Link" in response_headers:
+            response_headers["Link"] = response_headers["Link"].replace(
+                server.upstream, server.base_url
+            )
+        return upstream_response.status_code, upstream_response.content, response_headers
+
+
+def start_server(server):
+    """
+    Serves the requests of a server in a background thread.
+    Returns:
+        threading.Thread: The thread of the server.
+    """
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return thread
+
+
+def add_server_arguments(parser):
+    "Adds the arguments configuring the fake API to a parser"
+    parser.add_argument("--repo-name", default=DEFAULT_REPO_NAME)
+    parser.add_argument("--prs", type=int, default=2000, help="The number of synthetic PRs")
+    parser.add_argument("--authors", type=int, default=20)
+    parser.add_argument("--days", type=int, default=365,
+                        help="The number of days over which the PRs are created, from 2023-01-01")
+    parser.add_argument("--max-files", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0, help="In milliseconds")
+    parser.add_argument("--jitter", type=float, default=0, help="In milliseconds")
+    parser.add_argument("--rate-limit", type=int, help="Requests per window and resource")
+    parser.add_argument("--rate-window", type=int, default=3600, help="In seconds")
+    parser.add_argument("--error-rate", type=float, default=0,
+                        help="The fraction of requests failing with a secondary rate limit")
+    parser.add_argument("--retry-after", type=int, default=1, help="In seconds")
+    parser.add_argument("--replay", help="A cassette of recorded responses to serve")
+
+
+def create_server(arguments, address=("127.0.0.1", 0), record=None, upstream=None):
+    """
+    Creates the fake API configured by command line arguments.
+    """
+    cassette_path = record or arguments.replay
+    corpus = None
+    if cassette_path is None:
+        corpus = SyntheticCorpus(
+            repo_name=arguments.repo_name, num_prs=arguments.prs, authors=arguments.authors,
+            days=arguments.days, max_files=arguments.max_files, seed=arguments.seed,
+        )
+    return FakeGitHubServer(
+        address, corpus=corpus, cassette=Cassette(cassette_path) if cassette_path else None,
+        upstream=upstream, record=record is not None, latency=arguments.latency,
+        jitter=arguments.jitter, rate_limit=arguments.rate_limit,
+        rate_window=arguments.rate_window, error_rate=arguments.error_rate,
+        retry_after=arguments.retry_after, seed=arguments.seed,
+    )
+
+
+def main():
+    "Runs the fake API until it is interrupted"
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000, help="0 picks a free port")
+    parser.add_argument("--record", help="Records the responses of the upstream API to a cassette")
+    parser.add_argument("--upstream", default="https://api.github.com")
+    add_server_arguments(parser)
+    arguments = parser.parse_args()
+
+    server = create_server(
+        arguments, (arguments.host, arguments.port), arguments.record, arguments.upstream
+    )
+    print(f"Serving the fake GitHub API on {server.base_url}", flush=True)
+    # Background processes ignore SIGINT, and the cassette must also be saved on SIGTERM
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if arguments.record:
+            server.cassette.save()
+            print(f"Recorded {len(server.cassette.responses)} responses to {arguments.record}")
+
+
+if __name__ == "__main__":
+    main()
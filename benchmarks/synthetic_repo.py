@@ -0,0 +1,203 @@
+"""
+This script generates local Git repositories with a synthetic history, offline,
+for benchmarking the Git based insights. The history is written with
+`git fast-import`, so even repositories with many thousand commits are created in seconds.
+
+Usage:
+python benchmarks/synthetic_repo.py <path> [--commits 1000] [--files 200] [--authors 10]
+    [--files-per-commit 3] [--diff-lines 10] [--file-types .py .js .md]
+"""
+
+import os
+import sys
+import random
+import argparse
+import subprocess
+from datetime import datetime, timezone
+
+DEFAULT_START_DATE = datetime(2023, 1, 1, tzinfo=timezone.utc)
+BRANCH = "main"
+
+
+class SyntheticRepoError(Exception):
+    "To raise exceptions generated while creating a synthetic repository"
+
+
+def make_line(file_type, number, random_generator):
+    """
+    Returns one line of source code. Python lines contain branches, so that the
+    files have a complexity for lizard to compute.
+    """
+    value = random_generator.randint(0, 10**6)
+    if file_type == ".py":
+        if number % 4 == 0:
+            return f"def function_{number}_{value}(value):"
+        if number % 4 == 1:
+            return f"    if value > {value}:"
+        if number % 4 == 2:
+            return f"        return value - {value}"
+        return f"    return value + {value}"
+    if file_type == ".js":
+        return f"const value{number} = {value};"
+    return f"Line {number} with the value {value}."
+
+
+class SyntheticRepo:
+    """
+    The parameters of a synthetic repository and the generator of its history.
+    """
+
+    def __init__(
+        self, commits=1000, files=200, authors=10, files_per_commit=3, diff_lines=10,
+        file_types=(".py", ".js", ".md"), seed=0, start_date=DEFAULT_START_DATE,
+        commit_interval_minutes=60,
+    ):
+        """
+        Initializes the parameters of the repository.
+        Args:
+            commits (int): The number of commits.
+            files (int): The number of distinct files.
+            authors (int): The number of distinct authors.
+            files_per_commit (int): The number of files modified by every commit.
+            diff_lines (int): The number of lines changed in every modified file.
+            file_types (tuple): The extensions of the files, used in turn.
+            seed (int): The seed of the random generator, the same seed gives the same history.
+            start_date (datetime): The date of the first commit.
+            commit_interval_minutes (int): The time between two commits.
+        """
+        self.commits = commits
+        self.files = files
+        self.authors = authors
+        self.files_per_commit = min(files_per_commit, files)
+        self.diff_lines = diff_lines
+        self.file_types = tuple(file_types)
+        self.seed = seed
+        self.start_date = start_date
+        self.commit_interval = commit_interval_minutes * 60
+
+    @property
+    def end_date(self):
+        """
+        Returns:
+            datetime: The date of the last commit.
+        """
+        return datetime.fromtimestamp(
+            self.start_date.timestamp() + (self.commits - 1) * self.commit_interval, timezone.utc
+        )
+
+    def parameters(self):
+        """
+        Returns the parameters of the repository, for the benchmark results.
+        """
+        return {
+            "commits": self.commits,
+            "files": self.files,
+            "authors": self.authors,
+            "files_per_commit": self.files_per_commit,
+            "diff_lines": self.diff_lines,
+            "file_types": list(self.file_types),
+            "seed": self.seed,
+        }
+
+    def file_path(self, index):
+        """
+        Returns the path of a file. File names are unique, as the insights group by name.
+        """
+        file_type = self.file_types[index % len(self.file_types)]
+        return f"src/package{index % 10}/module{index}{file_type}"
+
+    def iter_fast_import(self):
+        """
+        Yields the fast-import stream of the history, as bytes.
+        """
+        random_generator = random.Random(self.seed)
+        contents = {}
+        start_timestamp = int(self.start_date.timestamp())
+        for commit_index in range(self.commits):
+            author = f"Author {commit_index % self.authors}"
+            email = f"author{commit_index % self.authors}@example.com"
+            timestamp = start_timestamp + commit_index * self.commit_interval
+            message = f"Change {commit_index}\n".encode("utf-8")
+            header = (
+                f"commit refs/heads/{BRANCH}\nmark :{commit_index + 1}\n"
+                f"author {author} <{email}> {timestamp} +0000\n"
+                f"committer {author} <{email}> {timestamp} +0000\n"
+                f"data {len(message)}\n"
+            ).encode("utf-8") + message
+            if commit_index > 0:
+                header += f"from :{commit_index}\n".encode("utf-8")
+            yield header
+
+            for file_index in random_generator.sample(range(self.files), self.files_per_commit):
+                path = self.file_path(file_index)
+                file_type = os.path.splitext(path)[1]
+                lines = contents.setdefault(path, [])
+                for _ in range(self.diff_lines):
+                    # Files grow until they reach a few times the diff size, then lines change
+                    if len(lines) < 4 * self.diff_lines:
+                        lines.append(make_line(file_type, len(lines), random_generator))
+                    else:
+                        number = random_generator.randrange(len(lines))
+                        lines[number] = make_line(file_type, number, random_generator)
+                data = ("\n".join(lines) + "\n").encode("utf-8")
+                yield f"M 100644 inline {path}\ndata {len(data)}\n".encode("utf-8") + data
+            yield b"\n"
+
+    def create(self, path):
+        """
+        Creates the repository at a path, which must not exist yet or be empty.
+        Returns:
+            str: The path of the repository.
+        """
+        try:
+            subprocess.run(
+                ["git", "init", "--quiet", "--initial-branch", BRANCH, path],
+                check=True, capture_output=True,
+            )
+            with subprocess.Popen(
+                ["git", "-C", path, "fast-import", "--quiet"],
+                stdin=subprocess.PIPE, stderr=subprocess.PIPE,
+            ) as process:
+                for chunk in self.iter_fast_import():
+                    process.stdin.write(chunk)
+                process.stdin.close()
+                error_output = process.stderr.read()
+                if process.wait() != 0:
+                    raise SyntheticRepoError(f"git fast-import failed: {error_output!r}")
+            subprocess.run(
+                ["git", "-C", path, "checkout", "--quiet", BRANCH], check=True, capture_output=True
+            )
+        except (OSError, subprocess.CalledProcessError) as git_error:
+            raise SyntheticRepoError(f"Error while creating {path}: {git_error}") from git_error
+        return path
+
+
+def main():
+    "Creates a synthetic repository from the command line arguments"
+    parser = argparse.ArgumentParser(description="Creates a Git repository with a synthetic history")
+    parser.add_argument("path", help="The path of the repository to create")
+    parser.add_argument("--commits", type=int, default=1000)
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--authors", type=int, default=10)
+    parser.add_argument("--files-per-commit", type=int, default=3)
+    parser.add_argument("--diff-lines", type=int, default=10)
+    parser.add_argument("--file-types", nargs="+", default=[".py", ".js", ".md"])
+    parser.add_argument("--seed", type=int, default=0)
+    arguments = parser.parse_args()
+
+    repo = SyntheticRepo(
+        commits=arguments.commits, files=arguments.files, authors=arguments.authors,
+        files_per_commit=arguments.files_per_commit, diff_lines=arguments.diff_lines,
+        file_types=arguments.file_types, seed=arguments.seed,
+    )
+    try:
+        repo.create(arguments.path)
+    except SyntheticRepoError as error:
+        print(error)
+        sys.exit(1)
+    print(f"Created {arguments.path} with {repo.commits} commits "
+          f"from {repo.start_date:%Y-%m-%d} to {repo.end_date:%Y-%m-%d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+"""
+This script provides an on-disk cache of the per-commit file statistics mined with PyDriller.
+Entries are keyed by the repository identity and the commit SHA, so repeated runs over
+the same date range only parse the diffs of commits that have not been seen before.
+"""
+
+import os
+import sys
+import sqlite3
+from collections import namedtuple
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import config_util, logger_util, profile_util
+
+logger = logger_util.get_logger('root')
+
+REMOTE_PREFIXES = ("git@", "https://", "http://", "git://")
+
+FileStats = namedtuple(
+    "FileStats", ["filename", "path", "added_lines", "deleted_lines", "complexity"]
+)
+CommitStats = namedtuple(
+    "CommitStats", ["hash", "author", "committer_date", "msg", "files"]
+)
+
+
+class CommitCacheError(Exception):
+    "To raise exceptions generated while reading or writing the commit stats cache"
+
+
+def repo_identity(repo_path):
+    """
+    Returns the key used to identify a repository in the cache.
+    Remote repositories are identified by their URL and local ones by their real path.
+    """
+    if repo_path.startswith(REMOTE_PREFIXES):
+        identity = repo_path.rstrip("/")
+        if identity.endswith(".git"):
+            identity = identity[:-len(".git")]
+        return identity
+    return os.path.realpath(repo_path)
+
+
+def mine_commit(commit, complexity_filter=None):
+    """
+    Extracts the file statistics of a PyDriller commit.
+    Args:
+        commit (pydriller.Commit): The commit to mine.
+        complexity_filter (callable, optional): Returns True for the file names whose
+        complexity must be computed. Complexity is not computed when it is None.
+    Returns:
+        CommitStats: The statistics of the commit.
+    """
+    files = []
+    with profile_util.span("git.diff_parsing"):
+        modified_files = commit.modified_files
+    for modified_file in modified_files:
+        complexity = None
+        if complexity_filter is not None and complexity_filter(modified_file.filename):
+            with profile_util.span("lizard.complexity"):
+                complexity = modified_file.complexity
+            if complexity is None:
+                complexity = -1
+        files.append(
+            FileStats(
+                modified_file.filename,
+                modified_file.new_path or modified_file.old_path,
+                modified_file.added_lines,
+                modified_file.deleted_lines,
+                complexity,
+            )
+        )
+    return CommitStats(
+        commit.hash, commit.author.name, commit.committer_date, commit.msg, tuple(files)
+    )
+
+
+class CommitStatsCache:
+    """
+    Stores CommitStats of one repository in a SQLite database.
+    """
+    commit_batch_size = 500
+
+    def __init__(self, repo_path, cache_dir=None):
+        """
+        Opens the cache database for a repository, creating it when needed.
+        """
+        self.repo_key = repo_identity(repo_path)
+        cache_dir = cache_dir or config_util.get_cache_dir("commits")
+        self.pending_writes = 0
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            self.connection = sqlite3.connect(
+                os.path.join(cache_dir, "commit_stats.sqlite3"), timeout=60
+            )
+            # WAL lets the workers of a parallel scan read the cache while the parent
+            # process, its only writer, stores the commits they mined
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.create_tables()
+        except (OSError, sqlite3.Error) as cache_error:
+            logger.exception("Error while opening the commit cache: %s", cache_error)
+            raise CommitCacheError("Error while opening the commit cache") from cache_error
+
+    def create_tables(self):
+        """
+        Creates the cache tables if they do not exist yet.
+        """
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS commits (
+                repo TEXT NOT NULL,
+                sha TEXT NOT NULL,
+                author TEXT,
+                committer_date TEXT,
+                msg TEXT,
+                PRIMARY KEY (repo, sha)
+            );
+            CREATE TABLE IF NOT EXISTS files (
+                repo TEXT NOT NULL,
+                sha TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                filename TEXT,
+                path TEXT,
+                added_lines INTEGER,
+                deleted_lines INTEGER,
+                complexity INTEGER,
+                PRIMARY KEY (repo, sha, position)
+            );
+            CREATE TABLE IF NOT EXISTS complexities (
+                repo TEXT NOT NULL,
+                sha TEXT NOT NULL,
+                path TEXT NOT NULL,
+                complexity INTEGER NOT NULL,
+                PRIMARY KEY (repo, sha, path)
+            );
+            """
+        )
+
+    def get(self, sha, complexity_filter=None):
+        """
+        Returns the cached statistics of a commit.
+        Args:
+            sha (str): The hash of the commit.
+            complexity_filter (callable, optional): Returns True for the file names
+            whose complexity is needed.
+        Returns:
+            CommitStats: The cached statistics, or None when the commit is not cached
+            or a needed complexity value is missing.
+        """
+        commit_row = self.connection.execute(
+            "SELECT author, committer_date, msg FROM commits WHERE repo = ? AND sha = ?",
+            (self.repo_key, sha),
+        ).fetchone()
+        if commit_row is None:
+            return None
+
+        file_rows = self.connection.execute(
+            "SELECT filename, path, added_lines, deleted_lines, complexity FROM files "
+            "WHERE repo = ? AND sha = ? ORDER BY position",
+            (self.repo_key, sha),
+        ).fetchall()
+        files = tuple(FileStats(*row) for row in file_rows)
+        if complexity_filter is not None:
+            for file_stats in files:
+                if file_stats.complexity is None and complexity_filter(file_stats.filename):
+                    return None
+
+        author, committer_date, msg = commit_row
+        if committer_date is not None:
+            committer_date = datetime.fromisoformat(committer_date)
+        return CommitStats(sha, author, committer_date, msg, files)
+
+    def put(self, commit_stats):
+        """
+        Stores the statistics of a commit.
+        Complexity values already in the cache are kept when the new ones are missing.
+        """
+        committer_date = commit_stats.committer_date
+        if committer_date is not None:
+            committer_date = committer_date.isoformat()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO commits (repo, sha, author, committer_date, msg) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (self.repo_key, commit_stats.hash, commit_stats.author, committer_date,
+             commit_stats.msg),
+        )
+        self.connection.executemany(
+            "INSERT INTO files (repo, sha, position, filename, path, added_lines, "
+            "deleted_lines, complexity) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (repo, sha, position) DO UPDATE SET "
+            "filename = excluded.filename, path = excluded.path, "
+            "added_lines = excluded.added_lines, deleted_lines = excluded.deleted_lines, "
+            "complexity = COALESCE(excluded.complexity, files.complexity)",
+            [
+                (self.repo_key, commit_stats.hash, position) + tuple(file_stats)
+                for position, file_stats in enumerate(commit_stats.files)
+            ],
+        )
+        self.pending_writes += 1
+        if self.pending_writes >= self.commit_batch_size:
+            self.flush()
+
+    def get_complexity(self, sha, path):
+        """
+        Returns the cached complexity of a file as of a commit, or None when it is unknown.
+        """
+        row = self.connection.execute(
+            "SELECT complexity FROM complexities WHERE repo = ? AND sha = ? AND path = ? "
+            "UNION ALL SELECT complexity FROM files WHERE repo = ? AND sha = ? AND path = ? "
+            "AND complexity IS NOT NULL LIMIT 1",
+            (self.repo_key, sha, path) * 2,
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_complexity(self, sha, path, complexity):
+        """
+        Stores the complexity of a file as of a commit. It is kept apart from the files
+        of the cached commits, since the commits read by the "git" backend are not cached,
+        and also set on the file of the commit when it is cached.
+        """
+        self.connection.execute(
+            "INSERT INTO complexities (repo, sha, path, complexity) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (repo, sha, path) DO UPDATE SET complexity = excluded.complexity",
+            (self.repo_key, sha, path, complexity),
+        )
+        self.connection.execute(
+            "UPDATE files SET complexity = ? WHERE repo = ? AND sha = ? AND path = ?",
+            (complexity, self.repo_key, sha, path),
+        )
+        self.pending_writes += 1
+
+    def flush(self):
+        """
+        Commits the pending writes to disk.
+        """
+        self.connection.commit()
+        self.pending_writes = 0
+
+    def close(self):
+        """
+        Writes the pending entries and closes the database.
+        """
+        self.flush()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def compute_file_complexity(commit, path):
+    """
+    Computes the complexity of a file as of a PyDriller commit that modified it.
+    Returns:
+        int: The complexity, or -1 when it cannot be computed.
+    """
+    for modified_file in commit.modified_files:
+        if (modified_file.new_path or modified_file.old_path) == path:
+            complexity = modified_file.complexity
+            return -1 if complexity is None else complexity
+    return -1
+
+
+def open_cache(repo_path, use_cache=True):
+    """
+    Returns the commit cache of a repository, or None when caching is disabled.
+    """
+    if use_cache and config_util.get_bool_setting("commit_cache", True):
+        return CommitStatsCache(repo_path)
+    return None
+
+
+def collect_commit_stats(
+    commits, repo_path, complexity_filter=None, use_cache=True, mined=None
+):
+    """
+    Yields the statistics of PyDriller commits.
+    Cached commits are served from the cache, the others are mined and added to the cache.
+    Args:
+        commits (iterable): The PyDriller commits.
+        repo_path (str): The path or URL identifying the repository in the cache.
+        complexity_filter (callable, optional): Returns True for the file names whose
+        complexity must be computed.
+        use_cache (bool): Whether to use the commit cache.
+        mined (list, optional): When given, the mined commits are appended to it instead
+        of being written to the cache, which is then only read. Used by the workers
+        of a parallel scan, so they never hold a write transaction on the shared cache.
+    Yields:
+        CommitStats: The statistics of each commit.
+    """
+    cache = open_cache(repo_path, use_cache)
+    num_hits = num_mined = 0
+    try:
+        for commit in commits:
+            commit_stats = cache.get(commit.hash, complexity_filter) if cache else None
+            if commit_stats is None:
+                commit_stats = mine_commit(commit, complexity_filter)
+                num_mined += 1
+                if mined is not None:
+                    mined.append(commit_stats)
+                elif cache:
+                    cache.put(commit_stats)
+            else:
+                num_hits += 1
+            yield commit_stats
+    except sqlite3.Error as cache_error:
+        logger.exception("Error while using the commit cache: %s", cache_error)
+        raise CommitCacheError("Error while using the commit cache") from cache_error
+    finally:
+        if cache:
+            cache.close()
+        profile_util.count("commit_cache.hits", num_hits)
+        profile_util.count("commit_cache.misses", num_mined)
+
+
+def store_commit_stats(cache, commit_stats_list):
+    """
+    Writes the statistics of commits mined elsewhere, such as in the workers
+    of a parallel scan, to the cache.
+    """
+    try:
+        for commit_stats in commit_stats_list:
+            cache.put(commit_stats)
+        cache.flush()
+    except sqlite3.Error as cache_error:
+        logger.exception("Error while writing the commit cache: %s", cache_error)
+        raise CommitCacheError("Error while writing the commit cache") from cache_error
+
@@ -0,0 +1,405 @@
+"""
+This script walks the commits of a repository once and feeds them to several aggregators.
+Each Git based insight is written as an aggregator, so running many insights on the
+same repository and date range only parses every diff once.
+
+Commits are read with PyDriller by default. The "git" backend streams
+`git log --numstat` instead, which is much faster and lighter but only provides
+line counts: aggregators that need complexity compute it in `finalize`.
+The "rollup" backend answers from the day buckets of the rollup index, which is
+extended with the new commits on every run, without walking the commits of the range.
+
+With more than one worker, the PyDriller commits are split into contiguous shards that are mined
+in a process pool. Every shard is fed to its own copy of the aggregators and the partial
+aggregates are merged in commit order, so the results match the serial scan.
+"""
+
+import os
+import sys
+import tempfile
+import sqlite3
+import threading
+import multiprocessing
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from git import Repo
+from pydriller import Git, Repository
+from .git_log_parser import iter_numstat_commits
+from .rollup_index import RollupIndex, is_rollup_range
+from .repo_mirror import RepoMirrorCache, is_mirror_cache_enabled
+from .commit_cache import (
+    REMOTE_PREFIXES, CommitCacheError, collect_commit_stats, compute_file_complexity,
+    open_cache, store_commit_stats,
+)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import config_util, logger_util, profile_util
+
+logger = logger_util.get_logger('root')
+
+SHARDS_PER_WORKER = 4
+BACKENDS = ("pydriller", "git", "rollup")
+
+
+class CommitAggregator(ABC):
+    """
+    Base class of the insights computed from a stream of commits.
+    Subclasses implement `process`, called once per commit in traversal order,
+    and `result`, called once the traversal is over. They may implement `finalize`
+    to look up data, such as complexity, for the few files they report.
+    Two capabilities are optional, and the scanner only uses the backends they enable
+    when all the aggregators of a run implement them:
+    - `merge(other)` appends the aggregate of another aggregator of the same type, which
+    processed the commits following the ones processed by this one. Aggregators implementing
+    it, which must also be picklable, are mined in parallel with more than one worker.
+    - `process_rollup(rollup)` updates the aggregate with the totals of a date range,
+    a RollupRange read from the rollup index, instead of its commits. Aggregators
+    implementing it can be used with the "rollup" backend.
+    """
+
+    def needs_complexity(self, file_name):
+        """
+        Returns True when the aggregator needs the complexity of the given file.
+        """
+        return False
+
+    @abstractmethod
+    def process(self, commit):
+        """
+        Updates the aggregate with one commit.
+        Args:
+            commit (CommitStats): The statistics of the commit.
+        """
+
+    def finalize(self, scanner):
+        """
+        Called once all the commits are processed and merged, before `result`.
+        Args:
+            scanner (CommitScanner): The scanner, which can compute file complexities.
+        """
+
+    @abstractmethod
+    def result(self):
+        """
+        Returns the result of the insight.
+        """
+
+
+def supports(aggregators, capability):
+    """
+    Returns True when all the aggregators implement an optional capability,
+    such as "merge" or "process_rollup".
+    """
+    return all(callable(getattr(aggregator, capability, None)) for aggregator in aggregators)
+
+
+@contextmanager
+def local_repository(repo_path):
+    """
+    Yields a local path for the repository. Remote repositories are served from
+    the mirror cache, or cloned into a temporary directory that is removed afterwards
+    when the mirror cache is disabled.
+    """
+    if not repo_path.startswith(REMOTE_PREFIXES):
+        yield repo_path
+        return
+    if is_mirror_cache_enabled():
+        yield RepoMirrorCache().get_local_path(repo_path)
+        return
+    with tempfile.TemporaryDirectory(prefix="gitlog_insights_") as clone_dir:
+        with profile_util.span("git.clone"):
+            Repo.clone_from(url=repo_path, to_path=clone_dir)
+        yield clone_dir
+
+
+def split_into_shards(items, num_shards):
+    """
+    Splits a list into contiguous shards of nearly equal size.
+    """
+    shard_size, remainder = divmod(len(items), num_shards)
+    shards = []
+    start = 0
+    for index in range(num_shards):
+        end = start + shard_size + (1 if index < remainder else 0)
+        shards.append(items[start:end])
+        start = end
+    return shards
+
+
+worker_repository = None
+# PyDriller writes to the repository config when opening it, which fails on the config
+# lock file when two threads, such as the queries of the insights service, open it at once
+open_repository_lock = threading.Lock()
+
+
+def open_worker_repository(local_path, open_lock, profiling=False):
+    """
+    Opens the repository once in each worker process.
+    PyDriller writes to the repository config when opening it, so the workers
+    take turns to avoid failing on the config lock file.
+    Profiling is turned on in the workers when it is on in the parent process.
+    """
+    global worker_repository  # pylint: disable=global-statement
+    if profiling:
+        profile_util.enable()
+    with open_lock:
+        worker_repository = Git(local_path)
+
+
+def feed_aggregators(commit_list, aggregators):
+    """
+    Feeds commits to the aggregators, counting the commits and files walked.
+    """
+    num_commits = num_files = 0
+    for commit in commit_list:
+        num_commits += 1
+        num_files += len(commit.files)
+        for aggregator in aggregators:
+            aggregator.process(commit)
+    profile_util.count("git.commits", num_commits)
+    profile_util.count("git.files_touched", num_files)
+
+
+def scan_shard(repo_path, commit_hashes, aggregators, use_cache):
+    """
+    Feeds a shard of commits to the aggregators. Runs in a worker process.
+    The commit cache is only read here: the commits mined by the worker are returned
+    and written by the parent process.
+    Returns:
+        tuple: The aggregators, updated with the commits of the shard, the CommitStats
+        of the commits missing from the cache and the profile recorded by the worker,
+        None when profiling is off.
+    """
+
+    def needs_complexity(file_name):
+        return any(aggregator.needs_complexity(file_name) for aggregator in aggregators)
+
+    mined = []
+    commits = (worker_repository.get_commit(commit_hash) for commit_hash in commit_hashes)
+    feed_aggregators(
+        collect_commit_stats(commits, repo_path, needs_complexity, use_cache, mined),
+        aggregators,
+    )
+    return aggregators, mined, profile_util.take_snapshot()
+
+
+class CommitScanner:
+    """
+    Walks the commits of a repository within a date range and feeds them to aggregators.
+    """
+
+    def __init__(
+        self, repo_path, since=None, to=None, branch=None, use_cache=True, workers=None,
+        backend=None,
+    ):
+        """
+        Initializes the scanner with the repository and the range of commits to walk.
+        Args:
+            repo_path (str): The path or URL of the repository.
+            since (datetime, optional): Only commits after this date are walked.
+            to (datetime, optional): Only commits up to this date are walked.
+            branch (str, optional): Only commits of this branch are walked.
+            use_cache (bool): Whether to use the commit cache.
+            workers (int, optional): The number of processes mining the commits.
+            Defaults to the GITLOG_INSIGHTS_WORKERS setting, or 1.
+            backend (str, optional): "pydriller", "git" or "rollup". Defaults to the
+            GITLOG_INSIGHTS_GIT_BACKEND setting, or "pydriller".
+        """
+        self.repo_path = repo_path
+        self.since = since
+        self.to = to
+        self.branch = branch
+        self.use_cache = use_cache
+        if workers is None:
+            workers = config_util.get_int_setting("workers", 1)
+        self.workers = max(1, workers)
+        self.backend = backend or config_util.get_setting("git_backend", "pydriller")
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{self.backend}', expected one of {BACKENDS}")
+        self.local_path = None
+        self.git_repo = None
+
+    def run(self, *aggregators):
+        """
+        Walks the commits once and feeds every commit to all the aggregators.
+        Args:
+            aggregators (CommitAggregator): The aggregators to feed.
+        Returns:
+            list: The result of each aggregator, in the order they were given.
+        """
+        with local_repository(self.repo_path) as local_path:
+            self.local_path = local_path
+            try:
+                with profile_util.span("git.traversal"):
+                    if self.backend == "rollup" and self.can_use_rollup(aggregators):
+                        self.run_rollup(aggregators)
+                    elif self.backend in ("git", "rollup"):
+                        # The rollup index does not split days, other ranges are streamed
+                        self.run_numstat(aggregators)
+                    elif self.workers > 1 and self.can_run_parallel(aggregators):
+                        aggregators = self.run_parallel(aggregators)
+                    else:
+                        self.run_serial(aggregators)
+                with profile_util.span("aggregate.finalize"):
+                    for aggregator in aggregators:
+                        aggregator.finalize(self)
+            finally:
+                if self.git_repo is not None:
+                    self.git_repo.clear()
+                self.git_repo = None
+                self.local_path = None
+
+        with profile_util.span("aggregate.result"):
+            return [aggregator.result() for aggregator in aggregators]
+
+    def can_use_rollup(self, aggregators):
+        """
+        Returns True when the rollup index can answer the run: the date range is made of
+        whole days and all the aggregators implement `process_rollup`.
+        """
+        if not is_rollup_range(self.since, self.to):
+            return False
+        if not supports(aggregators, "process_rollup"):
+            logger.warning(
+                "Not all the aggregators support the rollup backend, "
+                "streaming the commits with git log instead"
+            )
+            return False
+        return True
+
+    def can_run_parallel(self, aggregators):
+        """
+        Returns True when the commits can be mined in parallel,
+        that is when all the aggregators implement `merge`.
+        """
+        if not supports(aggregators, "merge"):
+            logger.warning(
+                "Not all the aggregators can merge partial aggregates, "
+                "mining the commits in a single process instead"
+            )
+            return False
+        return True
+
+    def run_serial(self, aggregators):
+        """
+        Feeds the commits to the aggregators in the current process.
+        """
+
+        def needs_complexity(file_name):
+            return any(aggregator.needs_complexity(file_name) for aggregator in aggregators)
+
+        repository = Repository(
+            self.local_path, since=self.since, to=self.to, only_in_branch=self.branch
+        )
+        commit_list = collect_commit_stats(
+            repository.traverse_commits(), self.repo_path, needs_complexity, self.use_cache
+        )
+        feed_aggregators(commit_list, aggregators)
+
+    def run_numstat(self, aggregators):
+        """
+        Feeds the commits streamed from git log --numstat to the aggregators.
+        The commit cache is not used, since reading the counts from git is as fast.
+        """
+        commit_list = iter_numstat_commits(
+            self.local_path, since=self.since, to=self.to, branch=self.branch
+        )
+        feed_aggregators(commit_list, aggregators)
+
+    def run_rollup(self, aggregators):
+        """
+        Extends the rollup index with the new commits and feeds the totals
+        of the date range to the aggregators.
+        """
+        with RollupIndex(self.repo_path, self.branch) as index:
+            index.update(self.local_path)
+            rollup = index.query(self.since, self.to)
+        for aggregator in aggregators:
+            aggregator.process_rollup(rollup)
+
+    def run_parallel(self, aggregators):
+        """
+        Mines shards of commits in a process pool and merges the partial aggregates
+        in commit order. The workers return the commits they mined, which are written
+        to the commit cache here, so the cache has a single writer.
+        Returns:
+            list: The merged aggregators.
+        """
+        repository = Repository(
+            self.local_path, since=self.since, to=self.to, only_in_branch=self.branch
+        )
+        commit_hashes = [commit.hash for commit in repository.traverse_commits()]
+        if not commit_hashes:
+            return aggregators
+
+        num_shards = min(len(commit_hashes), self.workers * SHARDS_PER_WORKER)
+        shards = split_into_shards(commit_hashes, num_shards)
+        logger.debug(
+            "Mining %d commits in %d shards with %d workers",
+            len(commit_hashes), num_shards, self.workers,
+        )
+        # Opened before the workers start, so the cache tables exist when they read them
+        cache = open_cache(self.repo_path, self.use_cache)
+        try:
+            with ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=open_worker_repository,
+                initargs=(self.local_path, multiprocessing.Lock(), profile_util.is_enabled()),
+            ) as executor:
+                futures = [
+                    executor.submit(
+                        scan_shard, self.repo_path, shard, list(aggregators), self.use_cache
+                    )
+                    for shard in shards
+                ]
+                merged = None
+                for future in futures:
+                    partials, mined, snapshot = future.result()
+                    profile_util.merge_snapshot(snapshot)
+                    if cache:
+                        store_commit_stats(cache, mined)
+                    if merged is None:
+                        merged = partials
+                        continue
+                    for aggregator, partial in zip(merged, partials):
+                        aggregator.merge(partial)
+        finally:
+            if cache:
+                cache.close()
+        return merged
+
+    def file_complexities(self, file_commits):
+        """
+        Returns the complexity of files as of the commits that last modified them.
+        Values are read from the commit cache when available, otherwise computed
+        with lizard and stored in the cache. Only available while the scanner runs.
+        Args:
+            file_commits (list): (commit hash, file path) pairs.
+        Returns:
+            list: The complexity of each file, -1 when it cannot be computed.
+        """
+        complexities = []
+        cache = open_cache(self.repo_path, self.use_cache)
+        try:
+            for commit_hash, path in file_commits:
+                complexity = cache.get_complexity(commit_hash, path) if cache else None
+                if complexity is None:
+                    if self.git_repo is None:
+                        with open_repository_lock:
+                            self.git_repo = Git(self.local_path)
+                    commit = self.git_repo.get_commit(commit_hash)
+                    with profile_util.span("lizard.complexity"):
+                        complexity = compute_file_complexity(commit, path)
+                    profile_util.count("complexity.computed")
+                    if cache:
+                        cache.set_complexity(commit_hash, path, complexity)
+                else:
+                    profile_util.count("complexity.cache_hits")
+                complexities.append(complexity)
+        except sqlite3.Error as cache_error:
+            logger.exception("Error while using the commit cache: %s", cache_error)
+            raise CommitCacheError("Error while using the commit cache") from cache_error
+        finally:
+            if cache:
+                cache.close()
+        return complexities
@@ -0,0 +1,182 @@
+"""
+This script streams commit statistics out of `git log --numstat`.
+It is a lightweight alternative to PyDriller for the insights that only need line
+counts and author names: no diff text, source code or complexity is ever loaded.
+"""
+
+import os
+import re
+import sys
+import subprocess
+from datetime import datetime, timezone
+from .commit_cache import CommitStats, FileStats
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import logger_util
+
+logger = logger_util.get_logger('root')
+
+RECORD_START = "\x1e"
+FIELD_SEPARATOR = "\x1f"
+HEADER_END = "\x1d"
+NUMSTAT_FORMAT = "%x1e%H%x1f%an%x1f%cI%x1f%B%x1d"
+
+QUOTED_CHARACTERS = {"a": "\a", "b": "\b", "t": "\t", "n": "\n", "v": "\v", "f": "\f",
+                     "r": "\r", '"': '"', "\\": "\\"}
+ESCAPE_PATTERN = re.compile(r"\\([0-7]{3}|.)")
+RENAME_PATTERN = re.compile(r"^(.*)\{(.*) => (.*)\}(.*)$")
+
+
+class GitLogError(Exception):
+    "To raise exceptions generated while running or parsing git log"
+
+
+def to_git_date(date):
+    """
+    Formats a date for the --since/--until options.
+    Dates without a timezone are taken as UTC, like PyDriller does.
+    """
+    if date.tzinfo is None or date.tzinfo.utcoffset(date) is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return str(date)
+
+
+def unquote_path(path):
+    """
+    Decodes a path that git quoted because of special characters.
+    """
+    if not (path.startswith('"') and path.endswith('"')):
+        return path
+
+    def replace_escape(match):
+        escape = match.group(1)
+        if len(escape) == 3:
+            return chr(int(escape, 8))
+        return QUOTED_CHARACTERS.get(escape, escape)
+
+    unquoted = ESCAPE_PATTERN.sub(replace_escape, path[1:-1])
+    # Octal escapes are the bytes of UTF-8 encoded characters
+    return unquoted.encode("latin-1", errors="ignore").decode("utf-8", errors="replace")
+
+
+def parse_renamed_path(path):
+    """
+    Returns the new path of a numstat path, which is written as
+    'old => new' or 'dir/{old => new}/file' for renamed files.
+    """
+    match = RENAME_PATTERN.match(path)
+    if match:
+        prefix, _, new_part, suffix = match.groups()
+        return re.sub("/+", "/", f"{prefix}{new_part}{suffix}")
+    if " => " in path:
+        return path.split(" => ", 1)[1]
+    return path
+
+
+def parse_numstat_line(line):
+    """
+    Parses one 'added<TAB>deleted<TAB>path' line of the numstat output.
+    Binary files are reported with '-' and counted as zero lines.
+    """
+    added, deleted, path = line.split("\t", 2)
+    path = unquote_path(parse_renamed_path(path))
+    return FileStats(
+        os.path.basename(path),
+        path,
+        0 if added == "-" else int(added),
+        0 if deleted == "-" else int(deleted),
+        None,
+    )
+
+
+def parse_header(header):
+    """
+    Parses the formatted commit header: hash, author, committer date and message.
+    """
+    commit_hash, author, committer_date, msg = header.split(HEADER_END, 1)[0].split(
+        FIELD_SEPARATOR, 3
+    )
+    return commit_hash, author, datetime.fromisoformat(committer_date), msg.strip()
+
+
+def parse_numstat_log(lines):
+    """
+    Parses the output of git log --numstat --format=NUMSTAT_FORMAT.
+    Args:
+        lines (iterable): The lines of the output.
+    Yields:
+        CommitStats: The statistics of each commit. Complexity is always None.
+    """
+    header_lines = None
+    commit_info = None
+    files = []
+    for line in lines:
+        if line.startswith(RECORD_START):
+            if commit_info is not None:
+                yield CommitStats(*commit_info, tuple(files))
+            commit_info = None
+            files = []
+            header_lines = [line[len(RECORD_START):]]
+        elif header_lines is not None:
+            header_lines.append(line)
+        else:
+            line = line.rstrip("\n")
+            if line:
+                files.append(parse_numstat_line(line))
+            continue
+
+        if HEADER_END in line:
+            commit_info = parse_header("".join(header_lines))
+            header_lines = None
+
+    if commit_info is not None:
+        yield CommitStats(*commit_info, tuple(files))
+
+
+def run_git_log(repo_path, arguments):
+    """
+    Runs git log in a local repository and yields its output line by line.
+    """
+    command = ["git", "-C", repo_path, "-c", "core.quotepath=off", "log"] + arguments
+    try:
+        process = subprocess.Popen(  # pylint: disable=consider-using-with
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            encoding="utf-8",
+            errors="replace",
+        )
+    except OSError as os_error:
+        logger.exception("Error while running git log: %s", os_error)
+        raise GitLogError("Error while running git log") from os_error
+
+    try:
+        yield from process.stdout
+    finally:
+        process.stdout.close()
+        error_output = process.stderr.read()
+        process.stderr.close()
+        return_code = process.wait()
+        if return_code != 0:
+            logger.error("git log failed with status %s: %s", return_code, error_output)
+            raise GitLogError(f"git log failed with status {return_code}: {error_output}")
+
+
+def iter_numstat_commits(repo_path, since=None, to=None, branch=None):
+    """
+    Yields the statistics of the commits of a local repository in the given range,
+    oldest first, like PyDriller does. Merge commits have no files, as in PyDriller.
+    Args:
+        repo_path (str): The path of the local repository.
+        since (datetime, optional): Only commits after this date are returned.
+        to (datetime, optional): Only commits up to this date are returned.
+        branch (str, optional): Only commits of this branch are returned.
+    Yields:
+        CommitStats: The statistics of each commit.
+    """
+    arguments = ["--numstat", "-M", "--reverse", "--no-color", f"--format={NUMSTAT_FORMAT}"]
+    if since is not None:
+        arguments.append(f"--since={to_git_date(since)}")
+    if to is not None:
+        arguments.append(f"--until={to_git_date(to)}")
+    arguments.extend([branch or "HEAD", "--"])
+    yield from parse_numstat_log(run_git_log(repo_path, arguments))
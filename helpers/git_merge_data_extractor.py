@@ -0,0 +1,157 @@
+"""
+This script extracts merged pull requests from the local Git history of a repository,
+without the GitHub API. GitHub records a merged PR either as a merge commit,
+"Merge pull request #12 from owner/branch", or as a squash commit whose subject
+ends with the PR number, "Title (#12)". PRs merged with "Rebase and merge" leave
+no trace of their number and are not found.
+
+The author of a squash commit is the author of the PR. A merge commit only names
+the owner of the merged branch, often a fork or the repository itself, so the author
+of the PRs found through merge commits is left empty.
+"""
+
+import os
+import re
+import sys
+from datetime import timedelta, timezone
+import pandas as pd
+from .commit_cache import REMOTE_PREFIXES
+from .commit_scanner import local_repository
+from .git_log_parser import FIELD_SEPARATOR, HEADER_END, RECORD_START, run_git_log
+from .search_window import parse_search_date
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import logger_util
+
+logger = logger_util.get_logger('root')
+
+MERGE_FORMAT = "%x1e%H%x1f%an%x1f%ae%x1f%aI%x1f%cI%x1f%B%x1d"
+MERGE_COMMIT_PATTERN = re.compile(r"^Merge pull request #(\d+) from ([^/\s]+)/(\S+)")
+SQUASH_COMMIT_PATTERN = re.compile(r"^(.*) \(#(\d+)\)$")
+NOREPLY_EMAIL_PATTERN = re.compile(r"^(?:\d+\+)?([^@]+)@users\.noreply\.github\.com$")
+# git log stops walking soon after the commits get older than --since, so the ones
+# whose dates are out of order by clock skew are only read with some slack
+DATE_SLACK = timedelta(days=1)
+
+
+def to_api_date(date):
+    """
+    Formats a date in UTC like the dates of the GitHub API.
+    """
+    return date.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def get_login(author_name, author_email):
+    """
+    Returns the GitHub login of a commit author when the email is a GitHub noreply
+    address, which is the case for the commits made from the GitHub UI, else the name.
+    """
+    match = NOREPLY_EMAIL_PATTERN.match(author_email)
+    return match.group(1) if match else author_name
+
+
+def parse_merge_log(lines):
+    """
+    Parses the output of git log --format=MERGE_FORMAT.
+    Yields:
+        tuple: The hash, author name, author email, author date, committer date
+        and message of each commit.
+    """
+    record = []
+    for line in lines:
+        if line.startswith(RECORD_START):
+            record = [line[len(RECORD_START):]]
+        else:
+            record.append(line)
+        if HEADER_END in line:
+            yield tuple("".join(record).split(HEADER_END, 1)[0].split(FIELD_SEPARATOR, 5))
+            record = []
+
+
+def get_merged_pr(subject, body, login):
+    """
+    Returns the number, title and author of the PR merged by a commit, or None
+    when the commit did not merge a PR. The author of a merge commit is None, since
+    the owner of the merged branch it names is not the author of the PR.
+    """
+    match = MERGE_COMMIT_PATTERN.match(subject)
+    if match:
+        # GitHub writes the PR title after the subject of the merge commit
+        title = next((line.strip() for line in body.splitlines() if line.strip()), match.group(3))
+        return int(match.group(1)), title, None
+    match = SQUASH_COMMIT_PATTERN.match(subject)
+    if match:
+        return int(match.group(2)), match.group(1), login
+    return None
+
+
+class GitMergeDataExtractor:
+    """
+    Extracts merged pull requests from the merge and squash commits of a repository.
+    It provides `get_merged_pr_details` like `PRDataExtractor`, with the same columns.
+    """
+
+    def __init__(self, repo_path, branch=None):
+        """
+        Initializes the extractor.
+        Args:
+            repo_path (str): The path or URL of the repository, or its GitHub name,
+            for example qxf2/newsletter_automation. Remote repositories are read from
+            the mirror cache.
+            branch (str, optional): The branch whose history is read. Defaults to HEAD.
+        """
+        if repo_path.startswith(REMOTE_PREFIXES) or os.path.isdir(repo_path):
+            self.repo_path = repo_path
+        else:
+            self.repo_path = f"https://github.com/{repo_path}.git"
+        self.branch = branch
+
+    def get_merged_pr_details(self, start_date, end_date):
+        """
+        Retrieves details of the pull requests merged within a specified date range.
+        Args:
+            start_date (str): The start date of the date range for the merged pull requests.
+            end_date (str): The end date of the date range for the merged pull requests.
+        Returns:
+            DataFrame: Containing the details of the merged pull requests. The merge date
+            is the committer date of the commit. As the creation of a PR is not recorded
+            in Git, created_at is the author date of the commit. The author is empty
+            for the PRs merged with a merge commit.
+        Raises:
+            GitLogError: When git log fails.
+            RepoMirrorError: When the mirror of a remote repository cannot be updated.
+        """
+        start = parse_search_date(start_date, is_end=False)
+        end = parse_search_date(end_date, is_end=True)
+        # Only the commits around the range are read, then filtered exactly below
+        arguments = [
+            "--no-color", f"--format={MERGE_FORMAT}",
+            f"--since={(start - DATE_SLACK).isoformat()}",
+            f"--until={(end + DATE_SLACK).isoformat()}",
+            self.branch or "HEAD", "--",
+        ]
+
+        pr_list = []
+        seen_numbers = set()
+        with local_repository(self.repo_path) as local_path:
+            for commit in parse_merge_log(run_git_log(local_path, arguments)):
+                _, author_name, author_email, author_date, committer_date, msg = commit
+                merged_at = parse_search_date(committer_date, is_end=False)
+                if not start <= merged_at <= end:
+                    continue
+                subject, _, body = msg.strip().partition("\n")
+                merged_pr = get_merged_pr(subject, body, get_login(author_name, author_email))
+                # A PR referenced again, by a cherry-pick for example, is counted once
+                if merged_pr is None or merged_pr[0] in seen_numbers:
+                    continue
+                seen_numbers.add(merged_pr[0])
+                pr_number, pr_title, author = merged_pr
+                pr_list.append({
+                    "pr_number": pr_number,
+                    "pr_title": pr_title,
+                    "created_at": to_api_date(parse_search_date(author_date, is_end=False)),
+                    "author": author,
+                    "status": "closed",
+                    "closed_at": to_api_date(merged_at),
+                })
+        logger.debug("Found %d merged PRs in the history of %s", len(pr_list), self.repo_path)
+        return pd.DataFrame(pr_list)
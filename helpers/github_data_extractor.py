@@ -4,22 +4,72 @@ The class takes a repository name as an argument and initializes an instance wit
 """
 
 import os
+import sys
+import time
 import logging
+import random
+import threading
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
 from requests.exceptions import HTTPError
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import config_util, logger_util, profile_util
+from .http_cache import open_response_cache
 
 logging.basicConfig(filename='error.log', level=logging.ERROR)
+logger = logger_util.get_logger('root')
+
+RATE_LIMIT_STATUS_CODES = (403, 429)
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+
+
+class GraphQLError(Exception):
+    "To raise the errors reported in the body of a GraphQL response"
 
 class GitHubDataExtractor:
     """
     Extracts data from GitHub using the GitHub API.
     """
     base_url = "https://api.github.com"
+    timeout = 10
+    max_rate_limit_wait = 3600
+    pacing_fraction = 0.2
+    backoff_base = 1
+    backoff_cap = 60
 
-    def __init__(self, repo_name):
+    def __init__(self, repo_name, max_workers=None, pool_size=None, max_retries=None):
         """
         Initializes the GitHubDataExtractor class with a repository name.
+        Args:
+            repo_name (str): The name of the repository, for example qxf2/newsletter_automation.
+            max_workers (int, optional): The maximum number of concurrent requests.
+            Defaults to the GITLOG_INSIGHTS_API_CONCURRENCY setting, or 8.
+            pool_size (int, optional): The number of kept-alive connections.
+            Defaults to the GITLOG_INSIGHTS_API_POOL_SIZE setting, or max_workers.
+            max_retries (int, optional): The number of retries of a failed request.
+            Defaults to the GITLOG_INSIGHTS_API_MAX_RETRIES setting, or 5.
         """
         self.repo_name = repo_name
+        self.base_url = (config_util.get_setting("api_url") or self.base_url).rstrip("/")
+        if max_workers is None:
+            max_workers = config_util.get_int_setting("api_concurrency", 8)
+        self.max_workers = max(1, max_workers)
+        if pool_size is None:
+            pool_size = config_util.get_int_setting("api_pool_size", self.max_workers)
+        if max_retries is None:
+            max_retries = config_util.get_int_setting("api_max_retries", 5)
+        self.max_retries = max(0, max_retries)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        # Every request takes a slot, so the threads of all the callers sharing this
+        # extractor never send more than max_workers requests at once
+        self.request_slots = threading.BoundedSemaphore(self.max_workers)
+        self.rate_limit_lock = threading.Lock()
+        self.rate_limit_state = {}
+        self.response_cache = open_response_cache()
 
     @property
     def token(self):
@@ -47,4 +97,203 @@ class GitHubDataExtractor:
         if response.status_code == 200:
             return True
         raise HTTPError(f"Error: {response.status_code}")
-        
\ No newline at end of file
+
+    @staticmethod
+    def get_rate_limit_resource(url):
+        """
+        Returns the rate limit bucket a request counts against.
+        GitHub limits the search and GraphQL APIs separately from the other endpoints.
+        """
+        path = urlparse(url).path
+        if path.startswith("/search/"):
+            return "search"
+        if path.startswith("/graphql"):
+            return "graphql"
+        return "core"
+
+    def wait_for_turn(self, resource):
+        """
+        Sleeps until the next request for a rate limit bucket may be sent.
+        Requests are spaced out evenly when the remaining rate limit runs low,
+        and held back entirely until the reset once it is exhausted.
+        """
+        with self.rate_limit_lock:
+            state = self.rate_limit_state.setdefault(resource, {"next": 0, "interval": 0})
+            now = time.time()
+            start = max(now, state["next"])
+            state["next"] = start + state["interval"]
+        if start > now:
+            profile_util.count("rate_limit.waits")
+            with profile_util.span("rate_limit.wait"):
+                time.sleep(start - now)
+
+    def update_rate_limit(self, resource, response):
+        """
+        Updates the pacing of a rate limit bucket from the X-RateLimit-* headers.
+        """
+        try:
+            remaining = int(response.headers["X-RateLimit-Remaining"])
+            limit = int(response.headers.get("X-RateLimit-Limit", remaining))
+            seconds_to_reset = max(float(response.headers["X-RateLimit-Reset"]) - time.time(), 0)
+        except (KeyError, ValueError):
+            return
+        with self.rate_limit_lock:
+            state = self.rate_limit_state.setdefault(resource, {"next": 0, "interval": 0})
+            if remaining == 0:
+                self.pause_state(state, seconds_to_reset + 1)
+            elif remaining < limit * self.pacing_fraction:
+                state["interval"] = seconds_to_reset / remaining
+            else:
+                state["interval"] = 0
+
+    def pause_state(self, state, seconds):
+        """
+        Holds back the requests of a rate limit bucket. Must be called with the lock held.
+        """
+        seconds = min(seconds, self.max_rate_limit_wait)
+        state["next"] = max(state["next"], time.time() + seconds)
+        state["interval"] = 0
+        logger.warning("GitHub rate limit reached, pausing requests for %.0f seconds", seconds)
+
+    def get_retry_wait(self, response, attempt):
+        """
+        Returns the number of seconds to wait before retrying a failed request,
+        or None when the response must not be retried.
+        """
+        retry_after = response.headers.get("Retry-After")
+        if response.status_code in RATE_LIMIT_STATUS_CODES:
+            if retry_after is not None:
+                try:
+                    return float(retry_after)
+                except ValueError:
+                    return self.get_backoff(attempt, minimum=60)
+            if response.headers.get("X-RateLimit-Remaining") == "0":
+                reset_time = float(response.headers.get("X-RateLimit-Reset", time.time() + 60))
+                return max(reset_time - time.time(), 0) + 1
+            if "rate limit" in response.text.lower():
+                # Secondary rate limits come without headers, GitHub asks to wait a minute
+                return self.get_backoff(attempt, minimum=60)
+            return None
+        if response.status_code in RETRY_STATUS_CODES:
+            return self.get_backoff(attempt)
+        return None
+
+    def get_backoff(self, attempt, minimum=0):
+        """
+        Returns an exponential backoff with full jitter for a retry attempt.
+        """
+        ceiling = min(self.backoff_cap, self.backoff_base * 2 ** attempt)
+        return minimum + random.uniform(0, ceiling)
+
+    def send_request(self, url, params=None, headers=None, json_body=None):
+        """
+        Sends a request to the GitHub API through the pooled session: a GET request,
+        or a POST request when a JSON body is given.
+        Requests are paced to stay under the rate limit, and failed or rate limited
+        requests are retried with a jittered backoff. At most max_workers requests
+        are sent at once.
+        Returns:
+            requests.Response: The response of the API.
+        """
+        resource = self.get_rate_limit_resource(url)
+        for attempt in range(self.max_retries + 1):
+            self.wait_for_turn(resource)
+            if attempt:
+                profile_util.count("http.retries")
+            try:
+                with self.request_slots, profile_util.span("http.request"):
+                    response = self.session.request(
+                        "GET" if json_body is None else "POST", url,
+                        headers=headers or self.header, params=params, json=json_body,
+                        timeout=self.timeout,
+                    )
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as error:
+                if attempt == self.max_retries:
+                    raise
+                wait = self.get_backoff(attempt)
+                logger.warning("Request to %s failed (%s), retrying in %.1f seconds",
+                               url, error, wait)
+                with profile_util.span("http.backoff"):
+                    time.sleep(wait)
+                continue
+
+            profile_util.count("http.requests")
+            profile_util.count("http.bytes", len(response.content))
+            self.update_rate_limit(resource, response)
+            wait = self.get_retry_wait(response, attempt)
+            if wait is None or attempt == self.max_retries:
+                return response
+            if response.status_code in RATE_LIMIT_STATUS_CODES:
+                profile_util.count("http.rate_limited")
+                with self.rate_limit_lock:
+                    state = self.rate_limit_state.setdefault(
+                        resource, {"next": 0, "interval": 0}
+                    )
+                    self.pause_state(state, wait)
+            else:
+                logger.warning("Request to %s returned %s, retrying in %.1f seconds",
+                               url, response.status_code, wait)
+                with profile_util.span("http.backoff"):
+                    time.sleep(wait)
+        return response
+
+    def get_response(self, url, params=None, immutable=False):
+        """
+        Gets a resource of the GitHub API, using the response cache when it is enabled.
+        Cached responses are revalidated with a conditional request and served again
+        when GitHub answers 304 Not Modified.
+        Args:
+            url (str): The URL to request.
+            params (dict, optional): The query parameters.
+            immutable (bool): True when the resource cannot change anymore, such as the
+            files of a merged PR. Cached immutable resources are served without any request.
+        Returns:
+            requests.Response: The response of the API.
+        """
+        if self.response_cache is None:
+            return self.send_request(url, params)
+
+        cache_key = self.response_cache.make_key(url, params, self.token)
+        cached_response = self.response_cache.get(cache_key)
+        headers = self.header
+        if cached_response is not None:
+            if immutable:
+                profile_util.count("http_cache.hits")
+                self.response_cache.touch(cache_key)
+                return cached_response
+            if "ETag" in cached_response.headers:
+                headers["If-None-Match"] = cached_response.headers["ETag"]
+            if "Last-Modified" in cached_response.headers:
+                headers["If-Modified-Since"] = cached_response.headers["Last-Modified"]
+
+        response = self.send_request(url, params, headers)
+        if response.status_code == 304 and cached_response is not None:
+            profile_util.count("http_cache.revalidated")
+            self.response_cache.touch(cache_key, revalidated=True)
+            return cached_response
+        profile_util.count("http_cache.misses")
+        if response.status_code == 200:
+            self.response_cache.put(cache_key, response)
+        return response
+
+    def send_graphql_query(self, query, variables=None):
+        """
+        Sends a query to the GitHub GraphQL API.
+        Args:
+            query (str): The GraphQL query.
+            variables (dict, optional): The variables of the query.
+        Returns:
+            dict: The data of the response.
+        Raises:
+            HTTPError: When the response status code is not 200.
+            GraphQLError: When the response reports errors.
+        """
+        response = self.send_request(
+            f"{self.base_url}/graphql", json_body={"query": query, "variables": variables or {}}
+        )
+        self.validate_response(response)
+        body = response.json()
+        if body.get("errors"):
+            messages = "; ".join(error.get("message", "") for error in body["errors"])
+            raise GraphQLError(f"GraphQL query failed: {messages}")
+        return body["data"]
@@ -0,0 +1,171 @@
+"""
+This script helps in reading paginated responses of the GitHub API.
+Pages are requested with the maximum page size. Once the first page of a resource tells
+how many pages there are, through its `last` link, the remaining pages are fetched
+concurrently, and every page is yielded as soon as it arrives.
+"""
+
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+MAX_PAGE_SIZE = 100
+
+
+def get_page_number(url):
+    """
+    Returns the value of the page parameter of a URL, 1 when it is missing.
+    """
+    query = dict(parse_qsl(urlparse(url).query))
+    return int(query.get("page", 1))
+
+
+def set_page_number(url, page):
+    """
+    Returns the URL with its page parameter set to the given page.
+    """
+    parsed_url = urlparse(url)
+    query = dict(parse_qsl(parsed_url.query))
+    query["page"] = str(page)
+    return urlunparse(parsed_url._replace(query=urlencode(query)))
+
+
+class GitHubPaginator:
+    """
+    Reads all the pages of GitHub API resources.
+    The pages of all the resources read at once are fetched in a single pool, rather
+    than in a pool per resource, so the number of threads never exceeds max_workers.
+    """
+
+    def __init__(self, extractor, max_workers=None):
+        """
+        Initializes the paginator.
+        Args:
+            extractor (GitHubDataExtractor): The extractor sending the requests.
+            max_workers (int, optional): The maximum number of pages fetched at once.
+            Defaults to the max_workers of the extractor. With 1, the pages are fetched
+            one after another in the calling thread.
+        """
+        self.extractor = extractor
+        self.max_workers = max_workers or extractor.max_workers
+
+    def fetch_page(self, url, params=None, immutable=False):
+        """
+        Fetches one page and checks its status code.
+        """
+        response = self.extractor.get_response(url, params=params, immutable=immutable)
+        self.extractor.validate_response(response)
+        return response
+
+    def get_following_tasks(self, task, response):
+        """
+        Returns the pages to fetch after a page of a resource: all the remaining pages
+        when the first page has a `last` link, otherwise the next page, since the pages
+        can then only be followed one after another.
+        Tasks are (resource index, page number, following, url, params, immutable) tuples,
+        following being True for the pages reached through next links.
+        """
+        index, page, following, _, _, immutable = task
+        if page == 1:
+            last_url = response.links.get("last", {}).get("url")
+            if last_url is not None:
+                return [
+                    (index, next_page, False, set_page_number(last_url, next_page), None,
+                     immutable)
+                    for next_page in range(2, get_page_number(last_url) + 1)
+                ]
+        elif not following:
+            return []
+        next_url = response.links.get("next", {}).get("url")
+        if next_url is None:
+            return []
+        return [(index, get_page_number(next_url), True, next_url, None, immutable)]
+
+    def iter_pages(self, resources, items_key=None):
+        """
+        Yields the items of the pages of several resources as the pages arrive. The pages
+        of all the resources are fetched in a single pool of at most max_workers threads.
+        Args:
+            resources (list): (url, params, immutable, first_page) tuples. immutable is
+            True when the resource cannot change anymore, and first_page is the first page
+            when it was already fetched with the same parameters, or None.
+            items_key (str, optional): The key holding the items in the JSON body,
+            for example "items" for the search API. None when the body is a list.
+        Yields:
+            tuple: The index of the resource, the page number and the items of the page.
+        Raises:
+            HTTPError: When a page is not returned with status 200.
+        """
+
+        def read_page(task, response):
+            tasks.extend(self.get_following_tasks(task, response))
+            body = response.json()
+            return task[0], task[1], body.get(items_key, []) if items_key else body
+
+        tasks = deque()
+        for index, (url, params, immutable, first_page) in enumerate(resources):
+            params = dict(params or {})
+            params.setdefault("per_page", MAX_PAGE_SIZE)
+            task = (index, 1, False, url, params, immutable)
+            if first_page is None:
+                tasks.append(task)
+            else:
+                yield read_page(task, first_page)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {}
+            try:
+                while tasks or futures:
+                    if self.max_workers == 1 or (len(tasks) == 1 and not futures):
+                        # A single page, such as the next page of a resource
+                        # without a last link, is fetched in the calling thread
+                        task = tasks.popleft()
+                        yield read_page(task, self.fetch_page(*task[3:]))
+                        continue
+                    while tasks:
+                        task = tasks.popleft()
+                        futures[executor.submit(self.fetch_page, *task[3:])] = task
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield read_page(futures.pop(future), future.result())
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    def get_items_of_resources(self, resources, items_key=None):
+        """
+        Returns the items of all the pages of several resources, read with iter_pages.
+        Args:
+            resources (list): (url, params, immutable, first_page) tuples, as for iter_pages.
+            items_key (str, optional): The key holding the items in the JSON body.
+        Returns:
+            list: The items of every resource, in page order.
+        Raises:
+            HTTPError: When a page is not returned with status 200.
+        """
+        pages = [{} for _ in resources]
+        for index, page, items in self.iter_pages(resources, items_key):
+            pages[index][page] = items
+        return [
+            [item for page in sorted(resource_pages) for item in resource_pages[page]]
+            for resource_pages in pages
+        ]
+
+    def get_all_items(self, url, params=None, items_key=None, immutable=False, first_page=None):
+        """
+        Returns the items of all the pages of a resource, in page order.
+        Args:
+            url (str): The URL of the resource.
+            params (dict, optional): The query parameters.
+            items_key (str, optional): The key holding the items in the JSON body,
+            for example "items" for the search API. None when the body is a list.
+            immutable (bool): True when the resource cannot change anymore.
+            first_page (requests.Response, optional): The first page, when it was
+            already fetched with the same parameters.
+        Returns:
+            list: The items of all the pages.
+        """
+        pages = {}
+        for _, page, items in self.iter_pages([(url, params, immutable, first_page)], items_key):
+            pages[page] = items
+        return [item for page in sorted(pages) for item in pages[page]]
@@ -4,22 +4,164 @@ This script helps in extracting pull request data from GitHub.
 
 import os
 import sys
+import sqlite3
+import time
+import threading
+from datetime import datetime, timezone
+from itertools import chain
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import requests
-from .github_data_extractor import GitHubDataExtractor
+from .github_data_extractor import GitHubDataExtractor, GraphQLError
+from .github_paginator import MAX_PAGE_SIZE, GitHubPaginator
+from .search_window import format_search_date, parse_search_date, split_query
+from .pr_store import (
+    PRStore, PRStoreError, get_missing_ranges, get_sync_lag, is_pr_store_enabled,
+    shift_api_date, to_api_date,
+)
+from .pr_metrics_cube import MEASURES, PRMetricsCube
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils import logger_util
+from utils import config_util, logger_util, profile_util
 
 logger = logger_util.get_logger('root')
 
+API_MODES = ("rest", "graphql")
+GRAPHQL_PAGE_SIZE = 50
+GRAPHQL_FILES_PAGE_SIZE = 100
+PR_FILES_BATCH_SIZE = 25
+
+SEARCH_PRS_QUERY = """
+query($query: String!, $first: Int!, $after: String, $withFiles: Boolean!, $filesFirst: Int!) {
+  search(query: $query, type: ISSUE, first: $first, after: $after) {
+    pageInfo { hasNextPage endCursor }
+    nodes {
+      ... on PullRequest {
+        number
+        title
+        state
+        createdAt
+        closedAt
+        mergedAt
+        updatedAt
+        author { login }
+        files(first: $filesFirst) @include(if: $withFiles) {
+          pageInfo { hasNextPage endCursor }
+          nodes { path additions deletions changeType }
+        }
+      }
+    }
+  }
+}
+"""
+
+COUNT_PRS_QUERY = """
+query($query: String!) {
+  search(query: $query, type: ISSUE, first: 1) { issueCount }
+}
+"""
+
+PR_FILES_QUERY = """
+query($owner: String!, $name: String!, $number: Int!, $first: Int!, $after: String) {
+  repository(owner: $owner, name: $name) {
+    pullRequest(number: $number) {
+      files(first: $first, after: $after) {
+        pageInfo { hasNextPage endCursor }
+        nodes { path additions deletions changeType }
+      }
+    }
+  }
+}
+"""
+
+# Reads the first files of several pull requests, through one aliased field per pull request
+PR_FILES_BATCH_QUERY = """
+query($owner: String!, $name: String!, $first: Int!%s) {
+  repository(owner: $owner, name: $name) {
+%s  }
+}
+fragment prFiles on PullRequest {
+  number
+  files(first: $first) {
+    pageInfo { hasNextPage endCursor }
+    nodes { path additions deletions changeType }
+  }
+}
+"""
+
+# The GraphQL change types, mapped to the file statuses of the REST API
+FILE_STATUSES = {"DELETED": "removed"}
+
 class PRDataExtractionError(Exception):
     "To raise exceptions generated while trying to fetch PR Data"
 
+
+def create_files_batch_query(batch_size):
+    """
+    Returns the query reading the first files of batch_size pull requests, whose numbers
+    are the $number0, $number1... variables and whose nodes are the pr0, pr1... fields.
+    """
+    variables = "".join(f", $number{index}: Int!" for index in range(batch_size))
+    fields = "".join(
+        f"    pr{index}: pullRequest(number: $number{index}) {{ ...prFiles }}\n"
+        for index in range(batch_size)
+    )
+    return PR_FILES_BATCH_QUERY % (variables, fields)
+
+
+def unique_by_number(pull_requests):
+    """
+    Returns the pull requests without the ones already seen, by number.
+    """
+    seen_numbers = set()
+    unique_pull_requests = []
+    for pull_request in pull_requests:
+        if pull_request["number"] not in seen_numbers:
+            seen_numbers.add(pull_request["number"])
+            unique_pull_requests.append(pull_request)
+    return unique_pull_requests
+
+
 class PRDataExtractor(GitHubDataExtractor):
     """
     The `PRDataExtractor` class is a subclass of the `GitHubDataExtractor` class and
     is used to extract data related to pull requests from GitHub using the GitHub API.
+    With the "graphql" API mode, PRs and their files are read through the GraphQL API,
+    many PRs per request, instead of one REST request per PR.
+    With the PR store, the PRs of a date range are read from a local store that is
+    synced with the PRs updated since the previous sync.
     """
+
+    def __init__(self, repo_name, max_workers=None, api=None, use_store=None, sync_interval=0):
+        """
+        Initializes the extractor.
+        Args:
+            repo_name (str): The name of the repository, for example qxf2/newsletter_automation.
+            max_workers (int, optional): The maximum number of concurrent requests.
+            api (str, optional): "rest" or "graphql". Defaults to the GITLOG_INSIGHTS_PR_API
+            setting, or "rest".
+            use_store (bool, optional): Whether to read the PRs from the local PR store.
+            Defaults to the GITLOG_INSIGHTS_PR_STORE setting, or True.
+            sync_interval (float): The seconds during which the PRs updated since a sync
+            are not fetched again by this extractor, for long-lived extractors.
+        """
+        super().__init__(repo_name, max_workers)
+        self.api = api or config_util.get_setting("pr_api", "rest")
+        if self.api not in API_MODES:
+            raise ValueError(f"Unknown API mode '{self.api}', expected one of {API_MODES}")
+        self.use_store = is_pr_store_enabled() if use_store is None else use_store
+        self.sync_interval = sync_interval
+        self.last_sync = None
+        # The threads sharing a long-lived extractor sync its store one at a time
+        self.sync_lock = threading.Lock()
+
+    @property
+    def paginator(self):
+        """
+        Returns:
+            GitHubPaginator: The paginator reading all the pages of the API responses.
+        """
+        return GitHubPaginator(self)
+
     @property
     def endpoint(self):
         """
@@ -51,6 +193,8 @@ class PRDataExtractor(GitHubDataExtractor):
         Returns:
             pandas DataFrame: Containing the details of the pull requests.
         """
+        if self.use_store:
+            return self.get_stored_pr_details("created", start_date, end_date)
         query = f"is:pr repo:{self.repo_name} created:{start_date}..{end_date}"
         return self.get_pr_details_using_query(query)
 
@@ -63,6 +207,8 @@ class PRDataExtractor(GitHubDataExtractor):
         Returns:
             DataFrame: Containing the details of the merged pull requests.
         """
+        if self.use_store:
+            return self.get_stored_pr_details("merged", start_date, end_date)
         query = f"is:pr is:merged repo:{self.repo_name} merged:{start_date}..{end_date}"
         return self.get_pr_details_using_query(query)
 
@@ -74,11 +220,11 @@ class PRDataExtractor(GitHubDataExtractor):
         Returns:
             DataFrame: Containing the details of the pull requests matching the query.
         """
+        if self.api == "graphql":
+            return self.get_pr_details_using_graphql(query)
+
         try:
-            params = {"q": query}
-            response = requests.get(self.endpoint, headers=self.header, params=params, timeout=10)
-            if response.status_code!=200:
-                raise PRDataExtractionError(f"Error while fetching response. Status code: {response.status_code}")
+            pr_data = self.search_items(query)
         except requests.exceptions.HTTPError as http_error:
             logger.exception("An error occurred while fetching response: %s", http_error)
             raise PRDataExtractionError("Error while fetching response") from http_error
@@ -87,8 +233,6 @@ class PRDataExtractor(GitHubDataExtractor):
             raise PRDataExtractionError("Error occurred") from error
 
         try:
-            pr_data = response.json().get("items", [])
-
             pr_list = []
             for pull_request in pr_data:
                 pr_dict = {
@@ -105,30 +249,6 @@ class PRDataExtractor(GitHubDataExtractor):
                 }
                 pr_list.append(pr_dict)
 
-            # Check the link header for the next page URL
-            next_page = response.links.get("next", {}).get("url")
-
-            # Loop until there is no more next page
-            while next_page:
-                response = requests.get(next_page, headers=self.header, timeout=10)
-                pr_data = response.json().get("items", [])
-                for pull_request in pr_data:
-                    pr_dict = {
-                        "pr_number": pull_request["number"],
-                        "pr_title": pull_request["title"],
-                        "created_at": pull_request["created_at"],
-                        "author": pull_request["user"]["login"],
-                        "status": pull_request["state"],
-                        "closed_at": (
-                            pull_request["closed_at"]
-                            if pull_request["state"] == "closed"
-                            else "N/A"
-                        ),
-                    }
-                    pr_list.append(pr_dict)
-                # Update the next page URL
-                next_page = response.links.get("next", {}).get("url")
-
         except KeyError as key_error:
             logger.exception("KeyError occurred while extracting PR data: %s", key_error)
             raise PRDataExtractionError("Error extracting PR data. KeyError:") from key_error
@@ -146,11 +266,13 @@ class PRDataExtractor(GitHubDataExtractor):
         Returns:
             DataFrame: A pandnas DataFrame containing the details of the files.
         """
+        if self.use_store:
+            return self.get_stored_pr_files_details(start_date, end_date)
+        if self.api == "graphql":
+            return self.get_pr_files_details_using_graphql(self.create_query(start_date, end_date))
+
         try:
-            params = {"q": self.create_query(start_date, end_date)}
-            response = requests.get(self.endpoint, headers=self.header, params=params, timeout=10)
-            if response.status_code!=200:
-                raise PRDataExtractionError(f"Error while fetching response. Status code: {response.status_code}")
+            pr_data = self.search_items(self.create_query(start_date, end_date))
         except requests.exceptions.HTTPError as http_error:
             logger.exception("An error occurred while fetching response: %s", http_error)
             raise PRDataExtractionError("Error occurred while fetching response") from http_error
@@ -159,14 +281,16 @@ class PRDataExtractor(GitHubDataExtractor):
             raise PRDataExtractionError("An error occurred") from error
 
         try:
-            pr_data = response.json().get("items", [])
+            pr_numbers = [pull_request["number"] for pull_request in pr_data]
+            # The files of a merged PR cannot change, so they never need to be refetched
+            merged_flags = [
+                bool(pull_request.get("pull_request", {}).get("merged_at"))
+                for pull_request in pr_data
+            ]
+            all_files_details = self.extract_many_files_data(pr_numbers, merged_flags)
 
             pr_files_list = []
-            for pull_request in pr_data:
-                pr_number = pull_request["number"]
-
-                files_details = self.extract_files_data(pr_number)
-
+            for pr_number, files_details in zip(pr_numbers, all_files_details):
                 for file_dict in files_details:
                     file_dict["pr_number"] = pr_number
                     pr_files_list.append(file_dict)
@@ -178,18 +302,66 @@ class PRDataExtractor(GitHubDataExtractor):
         pr_files_df = pd.DataFrame(pr_files_list)
         return pr_files_df
 
-    def extract_files_data(self, pr_number):
+    def count_search_results(self, query):
+        """
+        Fetches the first page of a search.
+        Returns:
+            tuple: The number of results of the search and the first page.
+        """
+        response = self.paginator.fetch_page(self.endpoint, {"q": query, "per_page": MAX_PAGE_SIZE})
+        return response.json().get("total_count", 0), response
+
+    def search_items(self, query):
+        """
+        Returns the items of a search, past the 1000 results cap of the search API:
+        the date range of the query is split into windows under the cap, and the
+        pages of the windows are fetched concurrently.
+        Args:
+            query (str): The query string for searching pull requests on GitHub.
+        Returns:
+            list: The items of the search, each pull request once.
+        """
+
+        windows = split_query(query, self.count_search_results)
+        # The pages of all the windows are fetched in a single pool
+        window_items = self.paginator.get_items_of_resources(
+            [(self.endpoint, {"q": window_query}, False, first_page)
+             for window_query, first_page in windows],
+            items_key="items",
+        )
+        return unique_by_number(chain.from_iterable(window_items))
+
+    def extract_files_data(self, pr_number, is_merged=False):
         """
         Retrieve details of the files associated with a pull request from GitHub.
         Args:
             pr_number (int): The number of the pull request for which to retrieve file details.
+            is_merged (bool): Whether the pull request is merged, in which case cached
+            file details are used without any request.
         Returns:
             list: A list of dictionaries, where each dictionary represents the details of a file
             associated with the pull request.
         """
+        return self.extract_many_files_data([pr_number], [is_merged])[0]
+
+    def extract_many_files_data(self, pr_numbers, merged_flags):
+        """
+        Retrieve details of the files associated with several pull requests from GitHub.
+        The pages of the files of all the pull requests are fetched concurrently.
+        Args:
+            pr_numbers (list): The numbers of the pull requests.
+            merged_flags (list): Whether each pull request is merged, in which case cached
+            file details are used without any request.
+        Returns:
+            list: The details of the files of each pull request, as returned by
+            extract_files_data.
+        """
         try:
-            endpoint = f"{self.base_url}/repos/{self.repo_name}/pulls/{pr_number}/files"
-            response = requests.get(endpoint, headers=self.header, timeout=10)
+            all_files_data = self.paginator.get_items_of_resources([
+                (f"{self.base_url}/repos/{self.repo_name}/pulls/{pr_number}/files",
+                 None, is_merged, None)
+                for pr_number, is_merged in zip(pr_numbers, merged_flags)
+            ])
         except requests.exceptions.HTTPError as http_error:
             logger.exception("An error occurred while fetching files data: %s", http_error)
             raise PRDataExtractionError("Error occurred fetching files data") from http_error
@@ -199,21 +371,471 @@ class PRDataExtractor(GitHubDataExtractor):
 
 
         try:
-            files_data = response.json()
-            files_details = []
-
-            for file in files_data:
-                file_dict = {
-                    "filename": file["filename"],
-                    "status": file["status"],
-                    "additions": file["additions"],
-                    "deletions": file["deletions"],
-                    "changes": file["changes"],
-                }
+            all_files_details = []
+            for files_data in all_files_data:
+                files_details = []
+
+                for file in files_data:
+                    file_dict = {
+                        "filename": file["filename"],
+                        "status": file["status"],
+                        "additions": file["additions"],
+                        "deletions": file["deletions"],
+                        "changes": file["changes"],
+                    }
 
-                files_details.append(file_dict)
+                    files_details.append(file_dict)
+                all_files_details.append(files_details)
 
         except KeyError as key_error:
             logger.exception("KeyError occurred while extracting PR data: %s", key_error)
             raise PRDataExtractionError("Error occurred extracting data:") from key_error
-        return files_details
+        return all_files_details
+
+    def count_graphql_results(self, query):
+        """
+        Returns the number of results of a search with the GraphQL API.
+        """
+        data = self.send_graphql_query(COUNT_PRS_QUERY, {"query": query})
+        return data["search"]["issueCount"], None
+
+    def search_pull_requests(self, query, with_files=False):
+        """
+        Searches pull requests with the GraphQL API. Like with the REST API, the date range
+        of the query is split into windows under the 1000 results cap of the search.
+        Args:
+            query (str): The query string for searching pull requests on GitHub.
+            with_files (bool): Whether to also read the files of every pull request.
+        Returns:
+            list: The pull request nodes, each pull request once.
+        """
+        windows = split_query(query, self.count_graphql_results)
+        # The windows are searched, then the truncated file lists completed, in one pool
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            window_nodes = list(executor.map(
+                lambda window: self.search_window_pull_requests(window[0], with_files), windows
+            ))
+            pr_nodes = unique_by_number(chain.from_iterable(window_nodes))
+            if not with_files:
+                return pr_nodes
+            self.complete_file_nodes(executor, pr_nodes)
+        for node in pr_nodes:
+            node["files"] = node["files"]["nodes"]
+        return pr_nodes
+
+    def complete_file_nodes(self, executor, pr_nodes):
+        """
+        Reads the files that did not fit in the first page of the files connection
+        of pull request nodes, and adds them to the nodes of the connection.
+        Args:
+            executor (ThreadPoolExecutor): The pool of the caller, which reads them.
+            pr_nodes (list): The pull request nodes, with their files connection.
+        """
+        for node in pr_nodes:
+            if node["files"] is None:
+                # GitHub answers null when it can not list the files in time:
+                # they are read again from the first one
+                node["files"] = {"pageInfo": {"hasNextPage": True, "endCursor": None}, "nodes": []}
+        truncated_nodes = [node for node in pr_nodes if node["files"]["pageInfo"]["hasNextPage"]]
+        remaining_files = executor.map(
+            self.get_file_nodes,
+            [node["number"] for node in truncated_nodes],
+            [node["files"]["pageInfo"]["endCursor"] for node in truncated_nodes],
+        )
+        for node, file_nodes in zip(truncated_nodes, remaining_files):
+            node["files"]["nodes"].extend(file_nodes)
+
+    def search_window_pull_requests(self, query, with_files=False):
+        """
+        Searches pull requests with the GraphQL API, following the search cursors.
+        Args:
+            query (str): The query string for searching pull requests on GitHub.
+            with_files (bool): Whether to also read the files of every pull request.
+        Returns:
+            list: The pull request nodes. With files, the "files" of every node holds
+            the first page of its files connection, completed by search_pull_requests.
+        """
+        variables = {
+            "query": query,
+            "first": GRAPHQL_PAGE_SIZE,
+            "after": None,
+            "withFiles": with_files,
+            "filesFirst": GRAPHQL_FILES_PAGE_SIZE,
+        }
+        pr_nodes = []
+        while True:
+            search = self.send_graphql_query(SEARCH_PRS_QUERY, variables)["search"]
+            # Nodes of other types than PullRequest come back empty
+            pr_nodes.extend(node for node in search["nodes"] if node)
+            if not search["pageInfo"]["hasNextPage"]:
+                return pr_nodes
+            variables["after"] = search["pageInfo"]["endCursor"]
+
+    def get_file_nodes(self, pr_number, after=None):
+        """
+        Reads the file nodes of a pull request with the GraphQL API.
+        Args:
+            pr_number (int): The number of the pull request.
+            after (str, optional): The cursor of the last file node already read,
+            for the files that did not fit in the search results.
+        Returns:
+            list: The file nodes.
+        """
+        owner, name = self.repo_name.split("/", 1)
+        variables = {
+            "owner": owner,
+            "name": name,
+            "number": pr_number,
+            "first": GRAPHQL_FILES_PAGE_SIZE,
+            "after": after,
+        }
+        file_nodes = []
+        while True:
+            files = self.send_graphql_query(PR_FILES_QUERY, variables)["repository"][
+                "pullRequest"]["files"]
+            if files is None:
+                logger.warning("GitHub did not list the files of PR #%d, counting them as empty",
+                               pr_number)
+                return file_nodes
+            file_nodes.extend(files["nodes"])
+            if not files["pageInfo"]["hasNextPage"]:
+                return file_nodes
+            variables["after"] = files["pageInfo"]["endCursor"]
+
+    def get_files_batch(self, pr_numbers):
+        """
+        Reads the first page of the files of several pull requests in one GraphQL query.
+        Returns:
+            list: The pull request nodes, with their number and files connection.
+        """
+        owner, name = self.repo_name.split("/", 1)
+        variables = {"owner": owner, "name": name, "first": GRAPHQL_FILES_PAGE_SIZE}
+        variables.update({f"number{index}": number for index, number in enumerate(pr_numbers)})
+        repository = self.send_graphql_query(
+            create_files_batch_query(len(pr_numbers)), variables
+        )["repository"]
+        return [repository[f"pr{index}"] for index in range(len(pr_numbers))]
+
+    def get_files_of_pull_requests(self, pr_numbers):
+        """
+        Reads the file nodes of several pull requests with the GraphQL API, in queries of
+        PR_FILES_BATCH_SIZE pull requests. Only the pull requests with more files than
+        fit in a page are then read one at a time.
+        Returns:
+            list: The file nodes of each pull request.
+        """
+        batches = [
+            pr_numbers[start:start + PR_FILES_BATCH_SIZE]
+            for start in range(0, len(pr_numbers), PR_FILES_BATCH_SIZE)
+        ]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pr_nodes = list(chain.from_iterable(executor.map(self.get_files_batch, batches)))
+            self.complete_file_nodes(executor, pr_nodes)
+        return [node["files"]["nodes"] for node in pr_nodes]
+
+    @staticmethod
+    def pr_dict_from_node(pr_node):
+        """
+        Returns the details of a pull request node, in the format of the REST search API.
+        """
+        is_closed = pr_node["state"] != "OPEN"
+        return {
+            "pr_number": pr_node["number"],
+            "pr_title": pr_node["title"],
+            "created_at": pr_node["createdAt"],
+            # Deleted accounts have no author, the REST API calls them ghost
+            "author": (pr_node["author"] or {}).get("login", "ghost"),
+            "status": "closed" if is_closed else "open",
+            "closed_at": pr_node["closedAt"] if is_closed else "N/A",
+        }
+
+    @staticmethod
+    def file_dict_from_node(file_node):
+        """
+        Returns the details of a file node, in the format of the REST files API.
+        """
+        change_type = file_node["changeType"]
+        return {
+            "filename": file_node["path"],
+            "status": FILE_STATUSES.get(change_type, change_type.lower()),
+            "additions": file_node["additions"],
+            "deletions": file_node["deletions"],
+            "changes": file_node["additions"] + file_node["deletions"],
+        }
+
+    def get_pr_details_using_graphql(self, query):
+        """
+        Retrieves details of pull requests matching a query with the GraphQL API.
+        Returns:
+            DataFrame: The same columns as get_pr_details_using_query.
+        """
+        try:
+            pr_nodes = self.search_pull_requests(query)
+        except (requests.exceptions.RequestException, GraphQLError) as error:
+            logger.exception("An error occurred while fetching PRs with GraphQL: %s", error)
+            raise PRDataExtractionError("Error while fetching response") from error
+
+        try:
+            pr_list = [self.pr_dict_from_node(pr_node) for pr_node in pr_nodes]
+        except (KeyError, TypeError) as data_error:
+            logger.exception("Error occurred while extracting PR data: %s", data_error)
+            raise PRDataExtractionError("Error extracting PR data") from data_error
+        return pd.DataFrame(pr_list)
+
+    def get_pr_files_details_using_graphql(self, query):
+        """
+        Retrieves details of the files of the pull requests matching a query
+        with the GraphQL API.
+        Returns:
+            DataFrame: The same columns as get_pr_files_details.
+        """
+        try:
+            pr_nodes = self.search_pull_requests(query, with_files=True)
+        except (requests.exceptions.RequestException, GraphQLError) as error:
+            logger.exception("An error occurred while fetching PR files with GraphQL: %s", error)
+            raise PRDataExtractionError("Error occurred while fetching response") from error
+
+        try:
+            pr_files_list = []
+            for pr_node in pr_nodes:
+                for file_node in pr_node["files"]:
+                    file_dict = self.file_dict_from_node(file_node)
+                    file_dict["pr_number"] = pr_node["number"]
+                    pr_files_list.append(file_dict)
+        except (KeyError, TypeError) as data_error:
+            logger.exception("Error occurred while extracting PR files details: %s", data_error)
+            raise PRDataExtractionError(
+                "Error occurred extracting PR files details"
+            ) from data_error
+        return pd.DataFrame(pr_files_list)
+
+    @staticmethod
+    def store_record_from_item(item):
+        """
+        Returns the store record of a pull request found with the REST search API.
+        """
+        return {
+            "number": item["number"],
+            "title": item["title"],
+            "author": item["user"]["login"],
+            "state": item["state"],
+            "created_at": item["created_at"],
+            "closed_at": item["closed_at"],
+            "merged_at": item.get("pull_request", {}).get("merged_at"),
+            "updated_at": item["updated_at"],
+        }
+
+    @staticmethod
+    def store_record_from_node(pr_node):
+        """
+        Returns the store record of a pull request found with the GraphQL API.
+        """
+        return {
+            "number": pr_node["number"],
+            "title": pr_node["title"],
+            "author": (pr_node["author"] or {}).get("login", "ghost"),
+            "state": "open" if pr_node["state"] == "OPEN" else "closed",
+            "created_at": pr_node["createdAt"],
+            "closed_at": pr_node["closedAt"],
+            "merged_at": pr_node["mergedAt"],
+            "updated_at": pr_node["updatedAt"],
+        }
+
+    @staticmethod
+    def pr_dict_from_record(record):
+        """
+        Returns the details of a stored pull request, in the format of the REST search API.
+        """
+        return {
+            "pr_number": record["number"],
+            "pr_title": record["title"],
+            "created_at": record["created_at"],
+            "author": record["author"],
+            "status": record["state"],
+            "closed_at": record["closed_at"] if record["state"] == "closed" else "N/A",
+        }
+
+    def search_store_records(self, query):
+        """
+        Returns the store records of the pull requests matching a search query,
+        with the API of the extractor.
+        """
+        if self.api == "graphql":
+            return [self.store_record_from_node(node) for node in self.search_pull_requests(query)]
+        return [self.store_record_from_item(item) for item in self.search_items(query)]
+
+    def sync_store(self, store, date_field, start_date, end_date):
+        """
+        Fetches the pull requests updated since the last sync, and the ones whose date_field
+        falls within the parts of a date range the store does not cover yet, and upserts
+        them in the store. The updates are searched again from a few minutes before the
+        watermark, for the PRs GitHub indexed late, and not fetched again within
+        sync_interval of the last sync. Syncs of the same extractor run one at a time.
+        Args:
+            store (PRStore): The store of the repository.
+            date_field (str): "created" or "merged".
+            start_date (str): The start date of the range that must be covered.
+            end_date (str): The end date of the range, included.
+        """
+        with self.sync_lock:
+            sync_started = time.monotonic()
+            watermark = store.get_watermark()
+            is_recent = (
+                self.last_sync is not None and sync_started - self.last_sync < self.sync_interval
+            )
+            if watermark is None:
+                # Nothing is stored yet: the ranges fetched below are current as of now
+                store.set_watermark(to_api_date(datetime.now(timezone.utc)))
+                self.last_sync = sync_started
+            elif not is_recent:
+                query_start = format_search_date(
+                    parse_search_date(shift_api_date(watermark, -get_sync_lag()), is_end=False)
+                )
+                records = self.search_store_records(
+                    f"is:pr repo:{self.repo_name} updated:{query_start}..*"
+                )
+                store.upsert_pull_requests(records)
+                profile_util.count("pr_store.synced_prs", len(records))
+                logger.debug("Synced %d PRs updated since %s", len(records), query_start)
+                # The latest update seen, rather than the local time, is immune to clock skew
+                store.set_watermark(max([watermark] + [record["updated_at"] for record in records]))
+                self.last_sync = sync_started
+
+            missing_ranges = get_missing_ranges(
+                store.get_covered_ranges(date_field), start_date, end_date
+            )
+            for range_start, range_end in missing_ranges:
+                query_range = (
+                    f"{format_search_date(parse_search_date(range_start, is_end=False))}.."
+                    f"{format_search_date(parse_search_date(range_end, is_end=True))}"
+                )
+                records = self.search_store_records(
+                    f"is:pr repo:{self.repo_name} {date_field}:{query_range}"
+                )
+                store.upsert_pull_requests(records)
+                store.add_covered_range(date_field, range_start, range_end)
+                profile_util.count("pr_store.synced_prs", len(records))
+                logger.debug("Synced %d PRs %s in %s", len(records), date_field, query_range)
+
+    def get_stored_pr_details(self, date_field, start_date, end_date):
+        """
+        Syncs the PR store and returns the details of the stored pull requests
+        whose date_field falls within a date range.
+        Returns:
+            DataFrame: The same columns as get_pr_details_using_query.
+        """
+        try:
+            with PRStore(self.repo_name) as store:
+                with profile_util.span("pr_store.sync"):
+                    self.sync_store(store, date_field, start_date, end_date)
+                records = store.get_pull_requests(date_field, start_date, end_date)
+        except (requests.exceptions.RequestException, GraphQLError) as error:
+            logger.exception("An error occurred while syncing the PR store: %s", error)
+            raise PRDataExtractionError("Error while fetching response") from error
+        except (PRStoreError, sqlite3.Error) as store_error:
+            logger.exception("An error occurred while using the PR store: %s", store_error)
+            raise PRDataExtractionError("Error while using the PR store") from store_error
+        except (KeyError, TypeError) as data_error:
+            logger.exception("Error occurred while extracting PR data: %s", data_error)
+            raise PRDataExtractionError("Error extracting PR data") from data_error
+        return pd.DataFrame([self.pr_dict_from_record(record) for record in records])
+
+    def fetch_pr_files(self, pr_numbers, merged_flags):
+        """
+        Retrieves the details of the files of several pull requests, with the API
+        of the extractor.
+        Returns:
+            list: The dictionaries with the details of each file, for each pull request.
+        """
+        if self.api == "rest":
+            return self.extract_many_files_data(pr_numbers, merged_flags)
+        return [
+            [self.file_dict_from_node(node) for node in file_nodes]
+            for file_nodes in self.get_files_of_pull_requests(pr_numbers)
+        ]
+
+    def sync_pr_files(self, store, start_date, end_date):
+        """
+        Syncs the PR store and the files of the pull requests created within a date range.
+        Only the files of the pull requests updated since their files were stored are fetched.
+        Returns:
+            list: The numbers of the pull requests created within the date range.
+        """
+        with profile_util.span("pr_store.sync"):
+            self.sync_store(store, "created", start_date, end_date)
+        numbers = [
+            record["number"] for record in store.get_pull_requests("created", start_date, end_date)
+        ]
+        stale_records = store.get_stale_files(numbers)
+        profile_util.count("pr_store.file_hits", len(numbers) - len(stale_records))
+        profile_util.count("pr_store.file_fetches", len(stale_records))
+        all_files_details = self.fetch_pr_files(
+            [record["number"] for record in stale_records],
+            [bool(record["merged_at"]) for record in stale_records],
+        )
+        for record, files_details in zip(stale_records, all_files_details):
+            store.put_files(record["number"], record["updated_at"], files_details)
+        return numbers
+
+    def get_stored_pr_files_details(self, start_date, end_date):
+        """
+        Syncs the PR store and returns the details of the files of the pull requests
+        created within a date range.
+        Returns:
+            DataFrame: The same columns as get_pr_files_details.
+        """
+        try:
+            with PRStore(self.repo_name) as store:
+                pr_files_list = store.get_files(self.sync_pr_files(store, start_date, end_date))
+        except (requests.exceptions.RequestException, GraphQLError) as error:
+            logger.exception("An error occurred while syncing the PR store: %s", error)
+            raise PRDataExtractionError("Error occurred while fetching response") from error
+        except (PRStoreError, sqlite3.Error) as store_error:
+            logger.exception("An error occurred while using the PR store: %s", store_error)
+            raise PRDataExtractionError("Error while using the PR store") from store_error
+        except (KeyError, TypeError) as data_error:
+            logger.exception("Error occurred while extracting PR files details: %s", data_error)
+            raise PRDataExtractionError(
+                "Error occurred extracting PR files details"
+            ) from data_error
+        return pd.DataFrame(pr_files_list)
+
+    def get_pr_metrics(self, measure, start_date, end_date, sync=True):
+        """
+        Returns the metrics of the pull requests of a range of days, merged from the
+        daily buckets of the PR metrics cube kept in the PR store.
+        Args:
+            measure (str): "review" for the review time of the PRs merged within the range,
+            "size" for the size of the PRs created within the range.
+            start_date (str): The first day of the range, for example 2023-01-01.
+            end_date (str): The last day of the range, included.
+            sync (bool): Whether to sync the store first. It can be False right after
+            the details of the same range were read with this extractor.
+        Returns:
+            ReviewMetrics or SizeMetrics: The metrics of the range.
+        """
+        if measure not in MEASURES:
+            raise ValueError(f"Unknown measure '{measure}', expected one of {MEASURES}")
+        if not self.use_store:
+            raise PRDataExtractionError("The PR metrics need the PR store")
+        try:
+            with PRStore(self.repo_name) as store:
+                if sync and measure == "size":
+                    self.sync_pr_files(store, start_date, end_date)
+                elif sync:
+                    with profile_util.span("pr_store.sync"):
+                        self.sync_store(store, "merged", start_date, end_date)
+                with profile_util.span("pr_cube.query"):
+                    cube = PRMetricsCube(store)
+                    if measure == "review":
+                        return cube.get_review_metrics(start_date, end_date)
+                    return cube.get_size_metrics(start_date, end_date)
+        except (requests.exceptions.RequestException, GraphQLError) as error:
+            logger.exception("An error occurred while syncing the PR store: %s", error)
+            raise PRDataExtractionError("Error while fetching response") from error
+        except (PRStoreError, sqlite3.Error) as store_error:
+            logger.exception("An error occurred while using the PR metrics: %s", store_error)
+            raise PRDataExtractionError("Error while using the PR metrics") from store_error
+        except (KeyError, TypeError) as data_error:
+            logger.exception("Error occurred while extracting PR data: %s", data_error)
+            raise PRDataExtractionError("Error extracting PR data") from data_error
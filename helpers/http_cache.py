@@ -0,0 +1,212 @@
+"""
+This script provides a disk-backed cache of GitHub API responses.
+Responses are stored with their ETag and Last-Modified headers so that repeated
+requests can be sent as conditional requests; a 304 answer is served from the cache.
+Entries are evicted when they get too old or when the cache grows too large.
+The cache is an optimization only: when its database can not be read or written,
+the error is logged and the request is sent without the cache.
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import requests
+from requests.structures import CaseInsensitiveDict
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import config_util, logger_util
+
+logger = logger_util.get_logger('root')
+
+CACHED_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Link")
+DEFAULT_MAX_SIZE_MB = 256
+DEFAULT_MAX_AGE_DAYS = 30
+
+
+class ResponseCache:
+    """
+    Stores GitHub API responses in a SQLite database.
+    """
+    eviction_interval = 100
+
+    def __init__(self, cache_dir=None, max_size_mb=None, max_age_days=None):
+        """
+        Opens the cache database, creating it when needed.
+        Args:
+            cache_dir (str, optional): The directory of the cache database.
+            max_size_mb (int, optional): The size above which the least recently used
+            responses are removed. Defaults to GITLOG_INSIGHTS_HTTP_CACHE_MAX_MB.
+            max_age_days (int, optional): The age after which responses are removed.
+            Defaults to GITLOG_INSIGHTS_HTTP_CACHE_MAX_AGE_DAYS.
+        """
+        cache_dir = cache_dir or config_util.get_cache_dir("http")
+        if max_size_mb is None:
+            max_size_mb = config_util.get_int_setting("http_cache_max_mb", DEFAULT_MAX_SIZE_MB)
+        if max_age_days is None:
+            max_age_days = config_util.get_int_setting(
+                "http_cache_max_age_days", DEFAULT_MAX_AGE_DAYS
+            )
+        self.max_size = max_size_mb * 1024 * 1024
+        self.max_age = max_age_days * 24 * 3600
+        self.writes_since_eviction = 0
+        self.lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.connection = sqlite3.connect(
+            os.path.join(cache_dir, "responses.sqlite3"), timeout=60, check_same_thread=False
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT,
+                headers TEXT,
+                body BLOB,
+                stored_at REAL,
+                used_at REAL,
+                size INTEGER
+            )
+            """
+        )
+        self.connection.commit()
+
+    @staticmethod
+    def make_key(url, params, token):
+        """
+        Returns the cache key of a request. The token is part of the key because
+        different tokens may be allowed to see different data.
+        """
+        request = requests.Request("GET", url, params=params).prepare()
+        token_hash = hashlib.sha256((token or "").encode("utf-8")).hexdigest()
+        return hashlib.sha256(f"{token_hash} {request.url}".encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        Returns the cached response of a request, or None, also when the cache
+        can not be read.
+        """
+        try:
+            with self.lock:
+                row = self.connection.execute(
+                    "SELECT url, headers, body, stored_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error as cache_error:
+            logger.warning("Error while reading the response cache: %s", cache_error)
+            return None
+        if row is None:
+            return None
+        url, headers, body, stored_at = row
+        if time.time() - stored_at > self.max_age:
+            return None
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response.headers = CaseInsensitiveDict(json.loads(headers))
+        response._content = body  # pylint: disable=protected-access
+        response.encoding = "utf-8"
+        return response
+
+    def touch(self, key, revalidated=False):
+        """
+        Marks a cached response as used. A revalidated response is also
+        considered as fresh as a newly stored one.
+        """
+        now = time.time()
+        with self.lock:
+            try:
+                if revalidated:
+                    self.connection.execute(
+                        "UPDATE responses SET stored_at = ?, used_at = ? WHERE key = ?",
+                        (now, now, key),
+                    )
+                else:
+                    self.connection.execute(
+                        "UPDATE responses SET used_at = ? WHERE key = ?", (now, key)
+                    )
+                self.connection.commit()
+            except sqlite3.Error as cache_error:
+                self.rollback(cache_error)
+
+    def put(self, key, response):
+        """
+        Stores a successful response.
+        """
+        headers = {
+            name: response.headers[name] for name in CACHED_HEADERS if name in response.headers
+        }
+        body = response.content
+        now = time.time()
+        with self.lock:
+            try:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO responses (key, url, headers, body, stored_at, "
+                    "used_at, size) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, response.url, json.dumps(headers), body, now, now, len(body)),
+                )
+                self.connection.commit()
+                self.writes_since_eviction += 1
+                if self.writes_since_eviction >= self.eviction_interval:
+                    self.evict()
+            except sqlite3.Error as cache_error:
+                self.rollback(cache_error)
+
+    def rollback(self, cache_error):
+        """
+        Logs an error while writing the cache and cancels the pending writes.
+        Must be called with the lock held.
+        """
+        logger.warning("Error while writing the response cache: %s", cache_error)
+        try:
+            self.connection.rollback()
+        except sqlite3.Error:
+            pass
+
+    def evict(self):
+        """
+        Removes the expired responses, then the least recently used ones until
+        the cache fits its size limit. Must be called with the lock held.
+        """
+        self.writes_since_eviction = 0
+        self.connection.execute(
+            "DELETE FROM responses WHERE stored_at < ?", (time.time() - self.max_age,)
+        )
+        total_size = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+        if total_size > self.max_size:
+            rows = self.connection.execute(
+                "SELECT key, size FROM responses ORDER BY used_at"
+            ).fetchall()
+            evicted_keys = []
+            for key, size in rows:
+                if total_size <= self.max_size:
+                    break
+                evicted_keys.append((key,))
+                total_size -= size
+            self.connection.executemany("DELETE FROM responses WHERE key = ?", evicted_keys)
+            logger.debug("Evicted %d cached responses", len(evicted_keys))
+        self.connection.commit()
+
+
+def is_http_cache_enabled():
+    """
+    Checks the GITLOG_INSIGHTS_HTTP_CACHE setting.
+    """
+    return config_util.get_bool_setting("http_cache", True)
+
+
+def open_response_cache():
+    """
+    Returns the response cache, or None when it is disabled or can not be opened.
+    """
+    if not is_http_cache_enabled():
+        return None
+    try:
+        return ResponseCache()
+    except (OSError, sqlite3.Error) as cache_error:
+        logger.warning("Error while opening the response cache, requests are not cached: %s",
+                       cache_error)
+        return None
@@ -0,0 +1,209 @@
+"""
+This script provides compact per-file statistics for the commit aggregators.
+File names and authors are interned to dense integer ids, and every modification is
+buffered as a few integers. The buffers are folded into NumPy arrays of counts and
+line totals, and into a sorted-unique array of packed (file, author) pairs, so the
+memory used grows with the number of distinct files and authors, not with the number
+of modifications.
+"""
+
+from array import array
+import numpy as np
+
+PAIR_SHIFT = 32
+AUTHOR_MASK = (1 << PAIR_SHIFT) - 1
+
+
+class InternTable:
+    """
+    Maps strings to dense integer ids, in the order they are first seen.
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.values = []
+
+    def intern(self, value):
+        """
+        Returns the id of a value, adding the value when it is new.
+        """
+        value_id = self.ids.get(value)
+        if value_id is None:
+            value_id = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return value_id
+
+    def intern_all(self, values):
+        """
+        Returns the ids of values as an array, adding the new values.
+        """
+        return np.fromiter((self.intern(value) for value in values), dtype=np.int64,
+                           count=len(values))
+
+    def __len__(self):
+        return len(self.values)
+
+
+def ensure_size(values, size):
+    """
+    Returns an array holding at least size elements, growing it by doubling
+    so that repeated growth is amortized. New elements are zero.
+    """
+    if len(values) >= size:
+        return values
+    grown = np.zeros(max(size, 2 * len(values), 16), dtype=values.dtype)
+    grown[:len(values)] = values
+    return grown
+
+
+def unique_in_order(values):
+    """
+    Returns the distinct values of an array, in the order they first appear.
+    """
+    _, first_indexes = np.unique(values, return_index=True)
+    return values[np.sort(first_indexes)]
+
+
+class FileAuthorStats:
+    """
+    Counts the modifications and the modified lines of every file, and keeps the
+    authors of every file in the order they were first seen.
+    """
+    flush_size = 1 << 16
+
+    def __init__(self):
+        self.files = InternTable()
+        self.authors = InternTable()
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.lines = np.zeros(0, dtype=np.int64)
+        # Packed (file id, author id) pairs, each once, in the order they were first seen,
+        # and the same pairs sorted to look them up
+        self.pairs = np.zeros(0, dtype=np.int64)
+        self.sorted_pairs = np.zeros(0, dtype=np.int64)
+        self.pending_files = array("q")
+        self.pending_authors = array("q")
+        self.pending_lines = array("q")
+
+    def add_many(self, file_ids, author_id, lines=None):
+        """
+        Records the modifications of several files by one author, such as the files
+        of a commit, in one call.
+        Args:
+            file_ids (list): The ids of the files in the files table.
+            author_id (int): The id of the author in the authors table.
+            lines (list, optional): The number of added and deleted lines of every file.
+        """
+        self.pending_files.extend(file_ids)
+        self.pending_authors.extend([author_id] * len(file_ids))
+        self.pending_lines.extend(lines if lines is not None else [0] * len(file_ids))
+        if len(self.pending_files) >= self.flush_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Folds the buffered modifications into the arrays.
+        """
+        num_files = len(self.files)
+        self.counts = ensure_size(self.counts, num_files)
+        self.lines = ensure_size(self.lines, num_files)
+        if not self.pending_files:
+            return
+        file_ids = np.frombuffer(self.pending_files, dtype=np.int64)
+        author_ids = np.frombuffer(self.pending_authors, dtype=np.int64)
+        self.counts[:num_files] += np.bincount(file_ids, minlength=num_files)
+        np.add.at(self.lines, file_ids, np.frombuffer(self.pending_lines, dtype=np.int64))
+        self.add_pairs((file_ids << PAIR_SHIFT) | author_ids)
+        self.pending_files = array("q")
+        self.pending_authors = array("q")
+        self.pending_lines = array("q")
+
+    def add_totals(self, file_ids, counts, lines, pair_file_ids, pair_author_ids):
+        """
+        Records the totals of files over many modifications, such as the totals
+        of a date range read from the rollup index.
+        Args:
+            file_ids (numpy.ndarray): The ids of the files in the files table, each once.
+            counts (list): The number of modifications of every file.
+            lines (list): The number of added and deleted lines of every file.
+            pair_file_ids (numpy.ndarray): The file ids of the (file, author) pairs, in the order
+            the pairs were first seen.
+            pair_author_ids (numpy.ndarray): The author ids of the pairs.
+        """
+        self.flush()
+        self.counts[file_ids] += np.asarray(counts, dtype=np.int64)
+        self.lines[file_ids] += np.asarray(lines, dtype=np.int64)
+        self.add_pairs((pair_file_ids << PAIR_SHIFT) | pair_author_ids)
+
+    def merge(self, other):
+        """
+        Adds the statistics of later modifications.
+        Returns:
+            numpy.ndarray: The ids in this table of the files of the other table.
+        """
+        self.flush()
+        other.flush()
+        file_map = self.files.intern_all(other.files.values)
+        author_map = self.authors.intern_all(other.authors.values)
+        num_files = len(self.files)
+        self.counts = ensure_size(self.counts, num_files)
+        self.lines = ensure_size(self.lines, num_files)
+        # Every file appears once in the map, so plain indexing adds each count once
+        self.counts[file_map] += other.counts[:len(file_map)]
+        self.lines[file_map] += other.lines[:len(file_map)]
+        other_pairs = (file_map[other.pairs >> PAIR_SHIFT] << PAIR_SHIFT) | author_map[
+            other.pairs & AUTHOR_MASK
+        ]
+        self.add_pairs(other_pairs)
+        return file_map
+
+    def add_pairs(self, new_pairs):
+        """
+        Appends the (file, author) pairs that were not seen before.
+        """
+        new_pairs = unique_in_order(new_pairs)
+        positions = np.searchsorted(self.sorted_pairs, new_pairs)
+        is_known = positions < len(self.sorted_pairs)
+        is_known[is_known] = self.sorted_pairs[positions[is_known]] == new_pairs[is_known]
+        new_pairs = new_pairs[~is_known]
+        positions = positions[~is_known]
+        self.pairs = np.concatenate([self.pairs, new_pairs])
+        order = np.argsort(new_pairs)
+        self.sorted_pairs = np.insert(self.sorted_pairs, positions[order], new_pairs[order])
+
+    def get_counts(self):
+        """
+        Returns the number of modifications of every file, by file id.
+        """
+        self.flush()
+        return self.counts[:len(self.files)]
+
+    def get_lines(self):
+        """
+        Returns the number of modified lines of every file, by file id.
+        """
+        self.flush()
+        return self.lines[:len(self.files)]
+
+    def get_authors(self, file_ids=None):
+        """
+        Returns the authors of files, in the order they were first seen.
+        Args:
+            file_ids (iterable, optional): The ids of the files. Defaults to all the files.
+        Returns:
+            list: The list of author names of every file.
+        """
+        self.flush()
+        pair_files = self.pairs >> PAIR_SHIFT
+        order = np.argsort(pair_files, kind="stable")
+        sorted_files = pair_files[order]
+        sorted_authors = (self.pairs & AUTHOR_MASK)[order]
+        if file_ids is None:
+            file_ids = range(len(self.files))
+        file_ids = np.asarray(list(file_ids), dtype=np.int64)
+        starts = np.searchsorted(sorted_files, file_ids, side="left")
+        ends = np.searchsorted(sorted_files, file_ids, side="right")
+        author_names = self.authors.values
+        return [
+            [author_names[author_id] for author_id in sorted_authors[start:end]]
+            for start, end in zip(starts, ends)
+        ]
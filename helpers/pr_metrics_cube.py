@@ -0,0 +1,457 @@
+"""
+This script provides a cube of the PR metrics of a repository, bucketed by day and author,
+kept in the database of the PR store.
+
+Every bucket holds the measures of the PRs of one author on one UTC day:
+  - review buckets, by merge day: the number of merged PRs, the sum and the sum of squares
+    of their review times, and the longest review time with its PR
+  - size buckets, by creation day: the number of PRs, the sums of their changed lines
+    and files, and the most changed lines and files with their PRs
+The averages, the per-author figures and the maximums of any range of days are then
+answered by merging the buckets of the range, without reading a single PR.
+
+Triggers on the store tables record the days whose PRs changed, and only these days are
+aggregated again when the cube is refreshed.
+"""
+
+import os
+import sys
+import math
+from collections import namedtuple
+import pandas as pd
+from .pr_store import get_date_bounds
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import logger_util, profile_util
+
+logger = logger_util.get_logger('root')
+
+MEASURES = ("review", "size")
+REVIEW_AUTHOR_COLUMNS = (
+    "author", "prs", "review_seconds", "review_squares", "max_review_seconds", "last_pr"
+)
+SIZE_AUTHOR_COLUMNS = (
+    "author", "prs", "lines_changed", "files_changed", "max_lines_changed", "max_files_changed"
+)
+
+ReviewMetrics = namedtuple(
+    "ReviewMetrics",
+    ["prs", "review_seconds", "review_squares", "max_review_seconds", "max_review_pr",
+     "authors"],
+)
+ReviewMetrics.__doc__ = """
+The review time measures of the PRs merged within a range of days.
+review_seconds and review_squares are the sums of the review times and of their squares,
+max_review_pr the PR with the longest review time, the lowest number on ties.
+authors is a DataFrame of REVIEW_AUTHOR_COLUMNS sorted by author, last_pr being the
+highest PR number of the author.
+"""
+
+SizeMetrics = namedtuple(
+    "SizeMetrics",
+    ["prs", "lines_changed", "files_changed", "max_lines_changed", "max_lines_pr",
+     "max_files_changed", "max_files_pr", "authors"],
+)
+SizeMetrics.__doc__ = """
+The size measures of the PRs created within a range of days, summed over the PRs.
+max_lines_pr and max_files_pr are the PRs with the most changed lines and files, the
+lowest numbers on ties. authors is a DataFrame of SIZE_AUTHOR_COLUMNS sorted by author.
+"""
+
+
+def get_day_range(start_date, end_date):
+    """
+    Returns the first and the last UTC day of a date range, as YYYY-MM-DD strings.
+    Raises:
+        ValueError: When the range does not start and end on whole days.
+    """
+    start, end = get_date_bounds(start_date, end_date)
+    if not (start.endswith("T00:00:00Z") and end.endswith("T23:59:59Z")):
+        raise ValueError(
+            f"The PR metrics are bucketed by day, {start_date}..{end_date} is not a range of days"
+        )
+    return start[:10], end[:10]
+
+
+def get_mean_review_time(prs, review_seconds):
+    """
+    Returns the mean review time of PRs, rounded like the mean of a review time Series.
+    """
+    if not prs:
+        return pd.NaT
+    return pd.Timedelta(int(review_seconds * 10**9 / prs))
+
+
+def get_std_review_time(prs, review_seconds, review_squares):
+    """
+    Returns the sample standard deviation of the review time of PRs.
+    """
+    if prs < 2:
+        return pd.NaT
+    variance = (review_squares - review_seconds * review_seconds / prs) / (prs - 1)
+    return pd.Timedelta(seconds=math.sqrt(max(variance, 0)))
+
+
+class PRMetricsCube:
+    """
+    Maintains and queries the PR metrics cube of one repository of a PR store.
+    """
+
+    def __init__(self, store):
+        """
+        Creates the cube tables and triggers in the database of a store if needed.
+        Args:
+            store (PRStore): The open store of the repository.
+        """
+        self.repo_name = store.repo_name
+        self.connection = store.connection
+        self.create_tables()
+
+    def create_tables(self):
+        """
+        Creates the bucket tables, and the triggers recording the days to aggregate again.
+        The triggers use upserts, as the conflict clause of a statement would override
+        an INSERT OR IGNORE.
+        """
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS pr_review_buckets (
+                repo TEXT NOT NULL,
+                day TEXT NOT NULL,
+                author TEXT NOT NULL,
+                prs INTEGER NOT NULL,
+                review_seconds INTEGER NOT NULL,
+                review_squares REAL NOT NULL,
+                max_review_seconds INTEGER NOT NULL,
+                max_review_pr INTEGER NOT NULL,
+                last_pr INTEGER NOT NULL,
+                PRIMARY KEY (repo, day, author)
+            );
+            CREATE TABLE IF NOT EXISTS pr_size_buckets (
+                repo TEXT NOT NULL,
+                day TEXT NOT NULL,
+                author TEXT NOT NULL,
+                prs INTEGER NOT NULL,
+                lines_changed INTEGER NOT NULL,
+                files_changed INTEGER NOT NULL,
+                max_lines_changed INTEGER NOT NULL,
+                max_lines_pr INTEGER NOT NULL,
+                max_files_changed INTEGER NOT NULL,
+                max_files_pr INTEGER NOT NULL,
+                PRIMARY KEY (repo, day, author)
+            );
+            CREATE TABLE IF NOT EXISTS pr_metrics_dirty_days (
+                repo TEXT NOT NULL,
+                measure TEXT NOT NULL,
+                day TEXT NOT NULL,
+                PRIMARY KEY (repo, measure, day)
+            );
+            CREATE TABLE IF NOT EXISTS pr_metrics_state (
+                repo TEXT PRIMARY KEY
+            );
+            CREATE TRIGGER IF NOT EXISTS pr_metrics_insert AFTER INSERT ON pull_requests
+            WHEN NEW.merged_at IS NOT NULL
+            BEGIN
+                INSERT INTO pr_metrics_dirty_days
+                VALUES (NEW.repo, 'review', substr(NEW.merged_at, 1, 10))
+                ON CONFLICT DO NOTHING;
+            END;
+            CREATE TRIGGER IF NOT EXISTS pr_metrics_update
+            AFTER UPDATE OF author, state, created_at, closed_at, merged_at ON pull_requests
+            BEGIN
+                INSERT INTO pr_metrics_dirty_days
+                SELECT NEW.repo, 'review', substr(NEW.merged_at, 1, 10)
+                WHERE NEW.merged_at IS NOT NULL
+                ON CONFLICT DO NOTHING;
+                INSERT INTO pr_metrics_dirty_days
+                SELECT OLD.repo, 'review', substr(OLD.merged_at, 1, 10)
+                WHERE OLD.merged_at IS NOT NULL
+                ON CONFLICT DO NOTHING;
+                INSERT INTO pr_metrics_dirty_days
+                SELECT NEW.repo, 'size', substr(NEW.created_at, 1, 10)
+                WHERE NEW.files_updated_at IS NOT NULL
+                ON CONFLICT DO NOTHING;
+                INSERT INTO pr_metrics_dirty_days
+                SELECT OLD.repo, 'size', substr(OLD.created_at, 1, 10)
+                WHERE OLD.files_updated_at IS NOT NULL
+                ON CONFLICT DO NOTHING;
+            END;
+            CREATE TRIGGER IF NOT EXISTS pr_metrics_delete AFTER DELETE ON pull_requests
+            BEGIN
+                INSERT INTO pr_metrics_dirty_days
+                SELECT OLD.repo, 'review', substr(OLD.merged_at, 1, 10)
+                WHERE OLD.merged_at IS NOT NULL
+                ON CONFLICT DO NOTHING;
+                INSERT INTO pr_metrics_dirty_days
+                SELECT OLD.repo, 'size', substr(OLD.created_at, 1, 10)
+                WHERE OLD.files_updated_at IS NOT NULL
+                ON CONFLICT DO NOTHING;
+            END;
+            CREATE TRIGGER IF NOT EXISTS pr_metrics_files
+            AFTER UPDATE OF files_updated_at ON pull_requests
+            BEGIN
+                INSERT INTO pr_metrics_dirty_days
+                VALUES (NEW.repo, 'size', substr(NEW.created_at, 1, 10))
+                ON CONFLICT DO NOTHING;
+            END;
+            """
+        )
+
+    def refresh(self):
+        """
+        Aggregates again the buckets of the days whose PRs changed since the last refresh,
+        or all the buckets the first time the cube is used for the repository.
+        """
+        connection = self.connection
+        if connection.in_transaction:
+            connection.commit()
+        if self.is_fresh():
+            return
+        # The write lock is taken at once, so the dirty days cannot change meanwhile
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            is_built = connection.execute(
+                "SELECT 1 FROM pr_metrics_state WHERE repo = ?", (self.repo_name,)
+            ).fetchone()
+            if not is_built:
+                self.mark_all_days()
+            self.refresh_review_buckets()
+            self.refresh_size_buckets()
+            connection.execute(
+                "DELETE FROM pr_metrics_dirty_days WHERE repo = ?", (self.repo_name,)
+            )
+            connection.execute(
+                "INSERT OR IGNORE INTO pr_metrics_state (repo) VALUES (?)", (self.repo_name,)
+            )
+            connection.commit()
+        except BaseException:
+            connection.rollback()
+            raise
+
+    def is_fresh(self):
+        """
+        Returns True when the cube was built for the repository and no day is dirty.
+        """
+        return self.connection.execute(
+            "SELECT EXISTS (SELECT 1 FROM pr_metrics_state WHERE repo = ?) "
+            "AND NOT EXISTS (SELECT 1 FROM pr_metrics_dirty_days WHERE repo = ?)",
+            (self.repo_name, self.repo_name),
+        ).fetchone()[0] == 1
+
+    def mark_all_days(self):
+        """
+        Records every day with a merged PR, or a PR with stored files, as dirty.
+        """
+        self.connection.execute(
+            "INSERT OR IGNORE INTO pr_metrics_dirty_days "
+            "SELECT repo, 'review', substr(merged_at, 1, 10) FROM pull_requests "
+            "WHERE repo = ? AND merged_at IS NOT NULL",
+            (self.repo_name,),
+        )
+        self.connection.execute(
+            "INSERT OR IGNORE INTO pr_metrics_dirty_days "
+            "SELECT repo, 'size', substr(created_at, 1, 10) FROM pull_requests "
+            "WHERE repo = ? AND files_updated_at IS NOT NULL",
+            (self.repo_name,),
+        )
+
+    def replace_buckets(self, table, measure, buckets):
+        """
+        Replaces the buckets of the dirty days of a measure.
+        Args:
+            buckets (dict): The values of the bucket columns after repo, day and author,
+            keyed by (day, author).
+        """
+        self.connection.execute(
+            f"DELETE FROM {table} WHERE repo = ? AND day IN (SELECT day FROM "
+            "pr_metrics_dirty_days WHERE repo = ? AND measure = ?)",
+            (self.repo_name, self.repo_name, measure),
+        )
+        if not buckets:
+            return
+        num_values = len(next(iter(buckets.values())))
+        self.connection.executemany(
+            f"INSERT INTO {table} VALUES (?, ?, ?{', ?' * num_values})",
+            [(self.repo_name, day, author) + tuple(values)
+             for (day, author), values in buckets.items()],
+        )
+        profile_util.count(f"pr_cube.{measure}_buckets", len(buckets))
+
+    def refresh_review_buckets(self):
+        """
+        Aggregates the review time of the merged PRs of the dirty days.
+        """
+        rows = self.connection.execute(
+            "SELECT substr(merged_at, 1, 10), author, number, "
+            "CAST(strftime('%s', closed_at) AS INTEGER) "
+            "- CAST(strftime('%s', created_at) AS INTEGER) "
+            "FROM pull_requests WHERE repo = ? AND state = 'closed' "
+            "AND merged_at IS NOT NULL AND closed_at IS NOT NULL AND created_at IS NOT NULL "
+            "AND substr(merged_at, 1, 10) IN (SELECT day FROM pr_metrics_dirty_days "
+            "WHERE repo = ? AND measure = 'review') ORDER BY number",
+            (self.repo_name, self.repo_name),
+        )
+        buckets = {}
+        for day, author, number, seconds in rows:
+            bucket = buckets.get((day, author))
+            if bucket is None:
+                buckets[(day, author)] = [1, seconds, seconds * seconds, seconds, number, number]
+                continue
+            bucket[0] += 1
+            bucket[1] += seconds
+            bucket[2] += seconds * seconds
+            # The PRs come by increasing number, so ties keep the lowest one
+            if seconds > bucket[3]:
+                bucket[3], bucket[4] = seconds, number
+            bucket[5] = number
+        for bucket in buckets.values():
+            bucket[2] = float(bucket[2])
+        self.replace_buckets("pr_review_buckets", "review", buckets)
+
+    def refresh_size_buckets(self):
+        """
+        Aggregates the changed lines and files of the PRs created on the dirty days.
+        """
+        rows = self.connection.execute(
+            "SELECT substr(pr.created_at, 1, 10), pr.author, pr.number, "
+            "COUNT(DISTINCT file.filename), COALESCE(SUM(file.changes), 0) "
+            "FROM pull_requests AS pr JOIN pr_files AS file "
+            "ON file.repo = pr.repo AND file.number = pr.number "
+            "WHERE pr.repo = ? AND substr(pr.created_at, 1, 10) IN (SELECT day FROM "
+            "pr_metrics_dirty_days WHERE repo = ? AND measure = 'size') "
+            "GROUP BY pr.number ORDER BY pr.number",
+            (self.repo_name, self.repo_name),
+        )
+        buckets = {}
+        for day, author, number, files, lines in rows:
+            bucket = buckets.get((day, author))
+            if bucket is None:
+                buckets[(day, author)] = [1, lines, files, lines, number, files, number]
+                continue
+            bucket[0] += 1
+            bucket[1] += lines
+            bucket[2] += files
+            if lines > bucket[3]:
+                bucket[3], bucket[4] = lines, number
+            if files > bucket[5]:
+                bucket[5], bucket[6] = files, number
+        self.replace_buckets("pr_size_buckets", "size", buckets)
+
+    def get_review_metrics(self, start_date, end_date):
+        """
+        Returns the review time measures of the PRs merged within a range of days.
+        Args:
+            start_date (str): The first day of the range, for example 2023-01-01.
+            end_date (str): The last day of the range, included.
+        Returns:
+            ReviewMetrics: The merged measures of the buckets of the range.
+        """
+        self.refresh()
+        bounds = (self.repo_name,) + get_day_range(start_date, end_date)
+        authors = pd.DataFrame(
+            self.connection.execute(
+                "SELECT author, SUM(prs), SUM(review_seconds), SUM(review_squares), "
+                "MAX(max_review_seconds), MAX(last_pr) FROM pr_review_buckets "
+                "WHERE repo = ? AND day BETWEEN ? AND ? GROUP BY author ORDER BY author",
+                bounds,
+            ).fetchall(),
+            columns=REVIEW_AUTHOR_COLUMNS,
+        )
+        longest = self.connection.execute(
+            "SELECT max_review_seconds, max_review_pr FROM pr_review_buckets "
+            "WHERE repo = ? AND day BETWEEN ? AND ? "
+            "ORDER BY max_review_seconds DESC, max_review_pr LIMIT 1",
+            bounds,
+        ).fetchone() or (None, None)
+        return ReviewMetrics(
+            int(authors["prs"].sum()),
+            int(authors["review_seconds"].sum()),
+            float(authors["review_squares"].sum()),
+            *longest,
+            authors,
+        )
+
+    def get_size_metrics(self, start_date, end_date):
+        """
+        Returns the size measures of the PRs created within a range of days.
+        Args:
+            start_date (str): The first day of the range, for example 2023-01-01.
+            end_date (str): The last day of the range, included.
+        Returns:
+            SizeMetrics: The merged measures of the buckets of the range.
+        """
+        self.refresh()
+        bounds = (self.repo_name,) + get_day_range(start_date, end_date)
+        authors = pd.DataFrame(
+            self.connection.execute(
+                "SELECT author, SUM(prs), SUM(lines_changed), SUM(files_changed), "
+                "MAX(max_lines_changed), MAX(max_files_changed) FROM pr_size_buckets "
+                "WHERE repo = ? AND day BETWEEN ? AND ? GROUP BY author ORDER BY author",
+                bounds,
+            ).fetchall(),
+            columns=SIZE_AUTHOR_COLUMNS,
+        )
+        most_lines, most_files = (
+            self.connection.execute(
+                f"SELECT max_{name}_changed, max_{name}_pr FROM pr_size_buckets "
+                "WHERE repo = ? AND day BETWEEN ? AND ? "
+                f"ORDER BY max_{name}_changed DESC, max_{name}_pr LIMIT 1",
+                bounds,
+            ).fetchone() or (None, None)
+            for name in ("lines", "files")
+        )
+        return SizeMetrics(
+            int(authors["prs"].sum()),
+            int(authors["lines_changed"].sum()),
+            int(authors["files_changed"].sum()),
+            *most_lines,
+            *most_files,
+            authors,
+        )
+
+
+def summarize_review_metrics(metrics):
+    """
+    Returns the review time metrics as a JSON serializable dictionary, times in seconds.
+    """
+    authors = metrics.authors
+    return {
+        "prs": metrics.prs,
+        "mean_review_seconds": metrics.review_seconds / metrics.prs if metrics.prs else None,
+        "std_review_seconds": (
+            get_std_review_time(
+                metrics.prs, metrics.review_seconds, metrics.review_squares
+            ).total_seconds() if metrics.prs > 1 else None
+        ),
+        "max_review_seconds": metrics.max_review_seconds,
+        "max_review_pr": metrics.max_review_pr,
+        "authors": pd.DataFrame({
+            "author": authors["author"],
+            "prs": authors["prs"],
+            "mean_review_seconds": authors["review_seconds"] / authors["prs"],
+            "max_review_seconds": authors["max_review_seconds"],
+        }).to_dict("records"),
+    }
+
+
+def summarize_size_metrics(metrics):
+    """
+    Returns the size metrics as a JSON serializable dictionary.
+    """
+    authors = metrics.authors
+    return {
+        "prs": metrics.prs,
+        "mean_lines_changed": metrics.lines_changed / metrics.prs if metrics.prs else None,
+        "mean_files_changed": metrics.files_changed / metrics.prs if metrics.prs else None,
+        "max_lines_changed": metrics.max_lines_changed,
+        "max_lines_pr": metrics.max_lines_pr,
+        "max_files_changed": metrics.max_files_changed,
+        "max_files_pr": metrics.max_files_pr,
+        "authors": pd.DataFrame({
+            "author": authors["author"],
+            "prs": authors["prs"],
+            "mean_lines_changed": authors["lines_changed"] / authors["prs"],
+            "mean_files_changed": authors["files_changed"] / authors["prs"],
+            "max_lines_changed": authors["max_lines_changed"],
+            "max_files_changed": authors["max_files_changed"],
+        }).to_dict("records"),
+    }
@@ -0,0 +1,353 @@
+"""
+This script provides a local store of the pull requests of GitHub repositories.
+The store is synced incrementally: only the PRs updated since the last sync are fetched
+and upserted. The PR based insights then read the PRs of their date range from the store,
+so re-running a report over already synced history needs almost no API request.
+
+The store records, for each date field, the ranges whose PRs were fetched with a
+created: or merged: search, and the watermark, the latest update seen. Only the parts
+of a requested range that are not covered yet are searched, and the PRs updated since
+the watermark are fetched to keep the covered ranges current. The updates are
+searched again from a few minutes before the watermark, since GitHub indexes
+the PRs with a delay and a late-indexed PR would otherwise never be fetched.
+"""
+
+import os
+import sys
+import sqlite3
+from datetime import timedelta
+from .search_window import parse_search_date
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import config_util, logger_util
+
+logger = logger_util.get_logger('root')
+
+PR_COLUMNS = (
+    "number", "title", "author", "state", "created_at", "closed_at", "merged_at", "updated_at"
+)
+FILE_COLUMNS = ("filename", "status", "additions", "deletions", "changes")
+DATE_FIELDS = ("created", "closed", "merged", "updated")
+SYNC_FIELDS = ("created", "merged")
+DEFAULT_SYNC_LAG = 300
+
+
+class PRStoreError(Exception):
+    "To raise exceptions generated while reading or writing the PR store"
+
+
+def to_api_date(date):
+    """
+    Formats a UTC datetime like the dates of the GitHub API, which sort as strings.
+    """
+    return date.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def get_date_bounds(start_date, end_date):
+    """
+    Returns the first and last second of a date range, formatted like the API dates.
+    """
+    return (
+        to_api_date(parse_search_date(start_date, is_end=False)),
+        to_api_date(parse_search_date(end_date, is_end=True)),
+    )
+
+
+class PRStore:
+    """
+    Stores the pull requests and PR files of one repository in a SQLite database.
+    """
+
+    def __init__(self, repo_name, cache_dir=None):
+        """
+        Opens the store database, creating it when needed.
+        Args:
+            repo_name (str): The name of the repository, for example qxf2/newsletter_automation.
+            cache_dir (str, optional): The directory of the store database.
+        """
+        self.repo_name = repo_name
+        cache_dir = cache_dir or config_util.get_cache_dir("prs")
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            self.connection = sqlite3.connect(
+                os.path.join(cache_dir, "pr_store.sqlite3"), timeout=60
+            )
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.create_tables()
+        except (OSError, sqlite3.Error) as store_error:
+            logger.exception("Error while opening the PR store: %s", store_error)
+            raise PRStoreError("Error while opening the PR store") from store_error
+
+    def create_tables(self):
+        """
+        Creates the store tables if they do not exist yet.
+        """
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS pull_requests (
+                repo TEXT NOT NULL,
+                number INTEGER NOT NULL,
+                title TEXT,
+                author TEXT,
+                state TEXT,
+                created_at TEXT,
+                closed_at TEXT,
+                merged_at TEXT,
+                updated_at TEXT,
+                files_updated_at TEXT,
+                PRIMARY KEY (repo, number)
+            );
+            CREATE INDEX IF NOT EXISTS pull_requests_created
+                ON pull_requests (repo, created_at);
+            CREATE INDEX IF NOT EXISTS pull_requests_merged
+                ON pull_requests (repo, merged_at);
+            CREATE TABLE IF NOT EXISTS pr_files (
+                repo TEXT NOT NULL,
+                number INTEGER NOT NULL,
+                position INTEGER NOT NULL,
+                filename TEXT,
+                status TEXT,
+                additions INTEGER,
+                deletions INTEGER,
+                changes INTEGER,
+                PRIMARY KEY (repo, number, position)
+            );
+            CREATE TABLE IF NOT EXISTS sync_state (
+                repo TEXT PRIMARY KEY,
+                watermark TEXT
+            );
+            CREATE TABLE IF NOT EXISTS sync_coverage (
+                repo TEXT NOT NULL,
+                date_field TEXT NOT NULL,
+                range_start TEXT NOT NULL,
+                range_end TEXT NOT NULL,
+                PRIMARY KEY (repo, date_field, range_start)
+            );
+            """
+        )
+
+    def get_watermark(self):
+        """
+        Returns:
+            str: The latest update synced, as an API date, or None when the repository
+            was never synced.
+        """
+        row = self.connection.execute(
+            "SELECT watermark FROM sync_state WHERE repo = ?", (self.repo_name,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_watermark(self, watermark):
+        """
+        Records the latest update synced.
+        """
+        self.connection.execute(
+            "INSERT INTO sync_state (repo, watermark) VALUES (?, ?) "
+            "ON CONFLICT (repo) DO UPDATE SET watermark = excluded.watermark",
+            (self.repo_name, watermark),
+        )
+        self.connection.commit()
+
+    def get_covered_ranges(self, date_field):
+        """
+        Returns:
+            list: The (start, end) ranges of API dates of date_field whose PRs are stored,
+            in order and without overlaps.
+        """
+        return self.connection.execute(
+            "SELECT range_start, range_end FROM sync_coverage "
+            "WHERE repo = ? AND date_field = ? ORDER BY range_start",
+            (self.repo_name, date_field),
+        ).fetchall()
+
+    def add_covered_range(self, date_field, start, end):
+        """
+        Records that the PRs whose date_field falls within a range are stored,
+        merging the range with the covered ranges it overlaps or touches.
+        """
+        ranges = merge_ranges(self.get_covered_ranges(date_field) + [(start, end)])
+        self.connection.execute(
+            "DELETE FROM sync_coverage WHERE repo = ? AND date_field = ?",
+            (self.repo_name, date_field),
+        )
+        self.connection.executemany(
+            "INSERT INTO sync_coverage (repo, date_field, range_start, range_end) "
+            "VALUES (?, ?, ?, ?)",
+            [(self.repo_name, date_field, range_start, range_end)
+             for range_start, range_end in ranges],
+        )
+        self.connection.commit()
+
+    def upsert_pull_requests(self, pull_requests):
+        """
+        Stores pull requests, keeping the stored ones that were updated more recently.
+        Args:
+            pull_requests (list): Dictionaries with the keys of PR_COLUMNS.
+        """
+        self.connection.executemany(
+            f"INSERT INTO pull_requests (repo, {', '.join(PR_COLUMNS)}) "
+            f"VALUES (?, {', '.join('?' for _ in PR_COLUMNS)}) "
+            "ON CONFLICT (repo, number) DO UPDATE SET "
+            + ", ".join(f"{column} = excluded.{column}" for column in PR_COLUMNS[1:])
+            + " WHERE excluded.updated_at >= pull_requests.updated_at",
+            [
+                (self.repo_name,) + tuple(pull_request[column] for column in PR_COLUMNS)
+                for pull_request in pull_requests
+            ],
+        )
+        self.connection.commit()
+
+    def get_pull_requests(self, date_field, start_date, end_date):
+        """
+        Returns the stored pull requests whose date_field falls within a date range,
+        newest first like the search API.
+        Args:
+            date_field (str): One of DATE_FIELDS.
+            start_date (str): The start date of the range, for example 2023-01-01.
+            end_date (str): The end date of the range, included.
+        Returns:
+            list: Dictionaries with the keys of PR_COLUMNS.
+        """
+        if date_field not in DATE_FIELDS:
+            raise ValueError(f"Unknown date field '{date_field}', expected one of {DATE_FIELDS}")
+        rows = self.connection.execute(
+            f"SELECT {', '.join(PR_COLUMNS)} FROM pull_requests "
+            f"WHERE repo = ? AND {date_field}_at BETWEEN ? AND ? ORDER BY number DESC",
+            (self.repo_name,) + get_date_bounds(start_date, end_date),
+        ).fetchall()
+        return [dict(zip(PR_COLUMNS, row)) for row in rows]
+
+    def get_stale_files(self, numbers):
+        """
+        Returns the pull requests among the given numbers whose files are not stored,
+        or were stored before the last update of the pull request.
+        Returns:
+            list: Dictionaries with the keys of PR_COLUMNS.
+        """
+        stale_prs = []
+        for number in numbers:
+            row = self.connection.execute(
+                f"SELECT {', '.join(PR_COLUMNS)} FROM pull_requests WHERE repo = ? "
+                "AND number = ? AND files_updated_at IS NOT updated_at",
+                (self.repo_name, number),
+            ).fetchone()
+            if row:
+                stale_prs.append(dict(zip(PR_COLUMNS, row)))
+        return stale_prs
+
+    def put_files(self, number, updated_at, files):
+        """
+        Replaces the stored files of a pull request.
+        Args:
+            number (int): The number of the pull request.
+            updated_at (str): The update date of the pull request the files belong to.
+            files (list): Dictionaries with the keys of FILE_COLUMNS.
+        """
+        self.connection.execute(
+            "DELETE FROM pr_files WHERE repo = ? AND number = ?", (self.repo_name, number)
+        )
+        self.connection.executemany(
+            f"INSERT INTO pr_files (repo, number, position, {', '.join(FILE_COLUMNS)}) "
+            f"VALUES (?, ?, ?, {', '.join('?' for _ in FILE_COLUMNS)})",
+            [
+                (self.repo_name, number, position) + tuple(file[column] for column in FILE_COLUMNS)
+                for position, file in enumerate(files)
+            ],
+        )
+        self.connection.execute(
+            "UPDATE pull_requests SET files_updated_at = ? WHERE repo = ? AND number = ?",
+            (updated_at, self.repo_name, number),
+        )
+        self.connection.commit()
+
+    def get_files(self, numbers):
+        """
+        Returns the stored files of pull requests, in the order of the numbers.
+        Returns:
+            list: Dictionaries with the keys of FILE_COLUMNS and the "pr_number" key.
+        """
+        files = []
+        for number in numbers:
+            rows = self.connection.execute(
+                f"SELECT {', '.join(FILE_COLUMNS)} FROM pr_files "
+                "WHERE repo = ? AND number = ? ORDER BY position",
+                (self.repo_name, number),
+            ).fetchall()
+            for row in rows:
+                file = dict(zip(FILE_COLUMNS, row))
+                file["pr_number"] = number
+                files.append(file)
+        return files
+
+    def close(self):
+        """
+        Closes the database.
+        """
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def shift_api_date(date, seconds):
+    """
+    Returns an API date moved by a number of seconds.
+    """
+    return to_api_date(parse_search_date(date, is_end=False) + timedelta(seconds=seconds))
+
+
+def merge_ranges(ranges):
+    """
+    Returns (start, end) ranges of API dates sorted, with the ones that overlap or
+    follow each other merged.
+    """
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= shift_api_date(merged[-1][1], 1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def get_missing_ranges(covered_ranges, start_date, end_date):
+    """
+    Returns the parts of a date range that are not covered yet.
+    Args:
+        covered_ranges (list): The covered (start, end) ranges of API dates, in order.
+        start_date (str): The start date of the requested range, for example 2023-01-01.
+        end_date (str): The end date of the requested range, included.
+    Returns:
+        list: The missing (start, end) ranges of API dates.
+    """
+    start, end = get_date_bounds(start_date, end_date)
+    missing = []
+    for covered_start, covered_end in covered_ranges:
+        if covered_end < start:
+            continue
+        if covered_start > end:
+            break
+        if covered_start > start:
+            missing.append((start, shift_api_date(covered_start, -1)))
+        start = shift_api_date(covered_end, 1)
+        if start > end:
+            return missing
+    missing.append((start, end))
+    return missing
+
+
+def get_sync_lag():
+    """
+    Returns the seconds before the watermark from which the updates are searched again,
+    from the GITLOG_INSIGHTS_PR_STORE_SYNC_LAG setting.
+    """
+    return max(0, config_util.get_int_setting("pr_store_sync_lag", DEFAULT_SYNC_LAG))
+
+
+def is_pr_store_enabled():
+    """
+    Checks the GITLOG_INSIGHTS_PR_STORE setting.
+    """
+    return config_util.get_bool_setting("pr_store", True)
@@ -0,0 +1,199 @@
+"""
+This script manages a cache of bare mirrors of remote Git repositories.
+The first use of a URL creates a mirror with `git clone --bare`; later uses only
+`git fetch` the new objects. Mirrors only fetch the branches and the tags: the other
+refs of a GitHub repository, such as the refs/pull/* heads of every pull request,
+are not read by the insights. The least recently used mirrors are removed when the
+cache grows beyond its size limit.
+"""
+
+import os
+import re
+import sys
+import shutil
+import hashlib
+import threading
+import subprocess
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import config_util, logger_util, profile_util
+
+logger = logger_util.get_logger('root')
+
+DEFAULT_MAX_SIZE_MB = 10240
+FETCH_REFSPECS = ("+refs/heads/*:refs/heads/*", "+refs/tags/*:refs/tags/*")
+
+mirror_locks = {}
+mirror_locks_guard = threading.Lock()
+
+
+class RepoMirrorError(Exception):
+    "To raise exceptions generated while creating or updating a repository mirror"
+
+
+def get_mirror_lock(mirror_path):
+    """
+    Returns the lock serializing the updates of one mirror within this process.
+    """
+    with mirror_locks_guard:
+        return mirror_locks.setdefault(mirror_path, threading.Lock())
+
+
+def get_dir_size(path):
+    """
+    Returns the total size in bytes of the files under a directory.
+    """
+    total_size = 0
+    for dir_path, _, file_names in os.walk(path):
+        for file_name in file_names:
+            try:
+                total_size += os.lstat(os.path.join(dir_path, file_name)).st_size
+            except OSError:
+                continue
+    return total_size
+
+
+def run_git(arguments, input_text=None):
+    """
+    Runs a git command and raises RepoMirrorError when it fails.
+    Returns:
+        str: The output of the command.
+    """
+    try:
+        completed = subprocess.run(
+            ["git"] + arguments, check=True, capture_output=True, encoding="utf-8",
+            errors="replace", input=input_text,
+        )
+    except subprocess.CalledProcessError as git_error:
+        logger.error("git %s failed: %s", arguments[0], git_error.stderr)
+        raise RepoMirrorError(
+            f"git {arguments[0]} failed with status {git_error.returncode}: {git_error.stderr}"
+        ) from git_error
+    except OSError as os_error:
+        logger.exception("Error while running git: %s", os_error)
+        raise RepoMirrorError("Error while running git") from os_error
+    return completed.stdout
+
+
+def configure_fetch(mirror_path):
+    """
+    Makes a mirror fetch only the branches and the tags.
+    """
+    run_git(["-C", mirror_path, "config", "--replace-all", "remote.origin.fetch",
+             FETCH_REFSPECS[0]])
+    for refspec in FETCH_REFSPECS[1:]:
+        run_git(["-C", mirror_path, "config", "--add", "remote.origin.fetch", refspec])
+
+
+def upgrade_mirror(mirror_path):
+    """
+    Converts a mirror created with `git clone --mirror`, which fetches every ref,
+    to fetch only the branches and the tags, and removes its other refs.
+    """
+    is_full_mirror = run_git([
+        "-C", mirror_path, "config", "--type=bool", "--default=false", "--get",
+        "remote.origin.mirror",
+    ]).strip() == "true"
+    if not is_full_mirror:
+        return
+    logger.debug("Restricting mirror %s to branches and tags", mirror_path)
+    run_git(["-C", mirror_path, "config", "--unset-all", "remote.origin.mirror"])
+    configure_fetch(mirror_path)
+    refs = run_git(["-C", mirror_path, "for-each-ref", "--format=%(refname)"]).split()
+    other_refs = [ref for ref in refs if not ref.startswith(("refs/heads/", "refs/tags/"))]
+    if other_refs:
+        run_git(
+            ["-C", mirror_path, "update-ref", "--stdin"],
+            "".join(f"delete {ref}\n" for ref in other_refs),
+        )
+
+
+class RepoMirrorCache:
+    """
+    A directory of bare repository mirrors keyed by URL.
+    """
+
+    def __init__(self, cache_dir=None, max_size_mb=None):
+        """
+        Initializes the cache.
+        Args:
+            cache_dir (str, optional): The directory holding the mirrors.
+            max_size_mb (int, optional): The size above which the least recently used
+            mirrors are removed. Defaults to the GITLOG_INSIGHTS_MIRROR_CACHE_MAX_MB setting.
+        """
+        self.cache_dir = cache_dir or config_util.get_cache_dir("mirrors")
+        if max_size_mb is None:
+            max_size_mb = config_util.get_int_setting(
+                "mirror_cache_max_mb", DEFAULT_MAX_SIZE_MB
+            )
+        self.max_size = max_size_mb * 1024 * 1024
+
+    def mirror_path(self, url):
+        """
+        Returns the directory of the mirror of a URL.
+        """
+        name = re.sub(r"[^A-Za-z0-9_.-]", "_", url.rstrip("/").rsplit("/", 1)[-1])
+        if not name.endswith(".git"):
+            name = f"{name}.git"
+        digest = hashlib.sha1(url.encode("utf-8")).hexdigest()[:12]
+        return os.path.join(self.cache_dir, f"{digest}-{name}")
+
+    def get_local_path(self, url):
+        """
+        Returns the path of an up to date mirror of the repository.
+        Args:
+            url (str): The URL of the remote repository.
+        Returns:
+            str: The path of the bare mirror.
+        """
+        mirror_path = self.mirror_path(url)
+        with get_mirror_lock(mirror_path):
+            if os.path.isdir(mirror_path):
+                logger.debug("Fetching mirror of %s", url)
+                upgrade_mirror(mirror_path)
+                with profile_util.span("git.fetch"):
+                    run_git(["-C", mirror_path, "fetch", "--prune", "--quiet", "origin"])
+            else:
+                logger.debug("Creating mirror of %s", url)
+                os.makedirs(self.cache_dir, exist_ok=True)
+                partial_path = f"{mirror_path}.partial"
+                shutil.rmtree(partial_path, ignore_errors=True)
+                with profile_util.span("git.clone"):
+                    run_git(["clone", "--bare", "--quiet", url, partial_path])
+                configure_fetch(partial_path)
+                os.replace(partial_path, mirror_path)
+            # The modification time of the mirror directory records its last use
+            os.utime(mirror_path)
+        self.evict(keep=mirror_path)
+        return mirror_path
+
+    def evict(self, keep=None):
+        """
+        Removes the least recently used mirrors until the cache fits its size limit.
+        Args:
+            keep (str, optional): A mirror that must not be removed.
+        """
+        if not os.path.isdir(self.cache_dir):
+            return
+        mirrors = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_dir() and entry.name.endswith(".git"):
+                mirrors.append((entry.stat().st_mtime, entry.path, get_dir_size(entry.path)))
+        total_size = sum(size for _, _, size in mirrors)
+
+        for _, path, size in sorted(mirrors):
+            if total_size <= self.max_size:
+                break
+            if path == keep:
+                continue
+            with get_mirror_lock(path):
+                logger.debug("Evicting mirror %s (%d bytes)", path, size)
+                shutil.rmtree(path, ignore_errors=True)
+            total_size -= size
+
+
+def is_mirror_cache_enabled():
+    """
+    Checks the GITLOG_INSIGHTS_MIRROR_CACHE setting.
+    """
+    return config_util.get_bool_setting("mirror_cache", True)
+
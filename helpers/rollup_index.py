@@ -0,0 +1,403 @@
+"""
+This script provides a persisted rollup index of the commits of a repository branch:
+per-day, per-file aggregates of the touches, added and deleted lines, the contributions
+of every author and the details of the last touch.
+
+The index is built once from `git log --numstat` and extended with the commits added
+since, so the Git based insights answer any date range by merging the day buckets of
+the range, without walking the history or parsing any diff.
+
+Every day is split into two buckets: its first second, midnight, and the rest of the day.
+The insights filter commits between two midnights, both included, which is then
+exactly a contiguous range of buckets.
+"""
+
+import os
+import sys
+import sqlite3
+from collections import namedtuple
+from datetime import datetime, timezone
+from git import Repo
+from git.exc import GitError
+from gitdb.exc import BadName
+from .commit_cache import repo_identity
+from .git_log_parser import iter_numstat_commits
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import config_util, logger_util, profile_util
+
+logger = logger_util.get_logger('root')
+
+SECONDS_PER_DAY = 86400
+# A commit sorts by its position in the history, then by the position of the file
+FILE_POSITIONS = 1 << 20
+MIN_SLOT = -(1 << 62)
+MAX_SLOT = 1 << 62
+LAST_TOUCH_COLUMNS = ("last_order", "last_sha", "last_path", "last_msg", "last_date")
+# The touches of newer commits replace the last touch of a bucket unless they are older
+IS_LATER_TOUCH = (
+    "CAST(strftime('%s', excluded.last_date) AS INTEGER) "
+    ">= CAST(strftime('%s', file_buckets.last_date) AS INTEGER)"
+)
+
+RollupRange = namedtuple(
+    "RollupRange",
+    ["files", "touches", "lines", "last_changes", "last_msgs", "last_dates", "pairs"],
+)
+RollupRange.__doc__ = """
+The aggregates of the commits of a date range.
+files are the file names in the order they were first touched, touches and lines their
+number of modifications and of added and deleted lines, last_changes the (commit hash,
+path) of their last touch, with its message and date in last_msgs and last_dates.
+pairs are the (file index, author) pairs in the order they were first seen.
+"""
+
+
+class RollupIndexError(Exception):
+    "To raise exceptions generated while building or reading the rollup index"
+
+
+def get_slot(timestamp):
+    """
+    Returns the bucket of a POSIX timestamp: 2 * day for its first second, midnight,
+    and 2 * day + 1 for the rest of the day.
+    """
+    day, seconds = divmod(int(timestamp), SECONDS_PER_DAY)
+    return 2 * day + (seconds > 0)
+
+
+def get_timestamp(date):
+    """
+    Returns the POSIX timestamp of a datetime. Dates without a timezone are taken
+    as UTC, like git log does.
+    """
+    if date.tzinfo is None or date.tzinfo.utcoffset(date) is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return date.timestamp()
+
+
+def get_slot_range(since=None, to=None):
+    """
+    Returns the buckets of the commits between two dates, both included.
+    Returns:
+        tuple: The first and the last bucket, or None when a date is not a UTC midnight,
+        which the buckets can not answer exactly.
+    """
+    slots = []
+    for date, default in ((since, MIN_SLOT), (to, MAX_SLOT)):
+        if date is None:
+            slots.append(default)
+            continue
+        timestamp = get_timestamp(date)
+        if timestamp % SECONDS_PER_DAY:
+            return None
+        slots.append(get_slot(timestamp))
+    return tuple(slots)
+
+
+def is_rollup_range(since=None, to=None):
+    """
+    Checks if the rollup index answers the commits between two dates exactly.
+    """
+    return get_slot_range(since, to) is not None
+
+
+def aggregate_commits(commits, first_sequence):
+    """
+    Aggregates commits into day buckets.
+    Args:
+        commits (iterable): The CommitStats of the commits, in history order.
+        first_sequence (int): The position in the history of the first commit.
+    Returns:
+        tuple: The file buckets and the author buckets, by (slot, file name) and
+        (slot, file name, author), and the number of commits.
+    """
+    file_buckets = {}
+    author_buckets = {}
+    # The timestamps of the last touches of the file buckets
+    last_timestamps = {}
+    num_commits = 0
+    for sequence, commit in enumerate(commits, first_sequence):
+        num_commits += 1
+        timestamp = get_timestamp(commit.committer_date)
+        slot = get_slot(timestamp)
+        last_date = commit.committer_date.isoformat()
+        for position, file in enumerate(commit.files):
+            order = sequence * FILE_POSITIONS + position
+            lines = file.added_lines + file.deleted_lines
+            bucket = file_buckets.get((slot, file.filename))
+            if bucket is None:
+                file_buckets[(slot, file.filename)] = [
+                    1, file.added_lines, file.deleted_lines, order,
+                    commit.hash, file.path, commit.msg, last_date,
+                ]
+                last_timestamps[(slot, file.filename)] = timestamp
+            else:
+                bucket[0] += 1
+                bucket[1] += file.added_lines
+                bucket[2] += file.deleted_lines
+                # The last touch is the latest by commit date, the later in history on ties
+                if timestamp >= last_timestamps[(slot, file.filename)]:
+                    bucket[3:] = [order, commit.hash, file.path, commit.msg, last_date]
+                    last_timestamps[(slot, file.filename)] = timestamp
+            bucket = author_buckets.get((slot, file.filename, commit.author))
+            if bucket is None:
+                author_buckets[(slot, file.filename, commit.author)] = [1, lines, order]
+            else:
+                bucket[0] += 1
+                bucket[1] += lines
+    return file_buckets, author_buckets, num_commits
+
+
+class RollupIndex:
+    """
+    Stores the day buckets of one branch of a repository in a SQLite database.
+    """
+
+    def __init__(self, repo_path, branch=None, cache_dir=None):
+        """
+        Opens the index database, creating it when needed.
+        Args:
+            repo_path (str): The path or URL identifying the repository.
+            branch (str, optional): The branch of the index. Defaults to HEAD.
+            cache_dir (str, optional): The directory of the index database.
+        """
+        self.repo_key = repo_identity(repo_path)
+        self.ref = branch or "HEAD"
+        cache_dir = cache_dir or config_util.get_cache_dir("rollups")
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            self.connection = sqlite3.connect(
+                os.path.join(cache_dir, "rollup_index.sqlite3"), timeout=60,
+                isolation_level=None,
+            )
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.create_tables()
+        except (OSError, sqlite3.Error) as index_error:
+            logger.exception("Error while opening the rollup index: %s", index_error)
+            raise RollupIndexError("Error while opening the rollup index") from index_error
+
+    def create_tables(self):
+        """
+        Creates the index tables if they do not exist yet.
+        """
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS rollup_state (
+                repo TEXT NOT NULL,
+                ref TEXT NOT NULL,
+                head TEXT,
+                next_sequence INTEGER,
+                PRIMARY KEY (repo, ref)
+            );
+            CREATE TABLE IF NOT EXISTS file_buckets (
+                repo TEXT NOT NULL,
+                ref TEXT NOT NULL,
+                slot INTEGER NOT NULL,
+                filename TEXT NOT NULL,
+                touches INTEGER,
+                added_lines INTEGER,
+                deleted_lines INTEGER,
+                last_order INTEGER,
+                last_sha TEXT,
+                last_path TEXT,
+                last_msg TEXT,
+                last_date TEXT,
+                PRIMARY KEY (repo, ref, slot, filename)
+            );
+            CREATE TABLE IF NOT EXISTS author_buckets (
+                repo TEXT NOT NULL,
+                ref TEXT NOT NULL,
+                slot INTEGER NOT NULL,
+                filename TEXT NOT NULL,
+                author TEXT NOT NULL,
+                touches INTEGER,
+                lines INTEGER,
+                first_order INTEGER,
+                PRIMARY KEY (repo, ref, slot, filename, author)
+            );
+            """
+        )
+
+    def get_state(self):
+        """
+        Returns:
+            tuple: The head commit covered by the index and the position of the next commit,
+            or (None, 0) when the index is empty.
+        """
+        row = self.connection.execute(
+            "SELECT head, next_sequence FROM rollup_state WHERE repo = ? AND ref = ?",
+            (self.repo_key, self.ref),
+        ).fetchone()
+        return row if row else (None, 0)
+
+    def update(self, local_path):
+        """
+        Adds the commits of the branch that are not in the index yet. The index is
+        rebuilt when the history was rewritten.
+        The new commits are read and aggregated before the write lock is taken, so the
+        lock, shared by the indexes of all the repositories, is only held for the writes.
+        Args:
+            local_path (str): The path of a local clone or mirror of the repository.
+        Returns:
+            int: The number of commits added.
+        """
+        try:
+            git_repo = Repo(local_path)
+            try:
+                head = git_repo.commit(self.ref).hexsha
+                state = self.get_state()
+                while True:
+                    indexed_head, next_sequence = state
+                    if indexed_head == head:
+                        return 0
+                    if indexed_head is not None and git_repo.is_ancestor(indexed_head, head):
+                        # git log accepts a revision range where it accepts a branch
+                        revisions = f"{indexed_head}..{head}"
+                    else:
+                        revisions = head
+                        next_sequence = 0
+                    with profile_util.span("rollup.update"):
+                        file_buckets, author_buckets, num_commits = aggregate_commits(
+                            iter_numstat_commits(local_path, branch=revisions), next_sequence
+                        )
+                    self.connection.execute("BEGIN IMMEDIATE")
+                    # Another run may have extended the index while the commits were read
+                    if self.get_state() == state:
+                        break
+                    self.connection.execute("ROLLBACK")
+                    state = self.get_state()
+
+                if revisions == head:
+                    self.delete_buckets()
+                self.write_buckets(file_buckets, author_buckets)
+                self.connection.execute(
+                    "INSERT INTO rollup_state (repo, ref, head, next_sequence) "
+                    "VALUES (?, ?, ?, ?) ON CONFLICT (repo, ref) DO UPDATE SET "
+                    "head = excluded.head, next_sequence = excluded.next_sequence",
+                    (self.repo_key, self.ref, head, next_sequence + num_commits),
+                )
+                self.connection.execute("COMMIT")
+            finally:
+                git_repo.close()
+        except (GitError, BadName, ValueError) as git_error:
+            self.rollback()
+            logger.exception("Error while reading %s: %s", local_path, git_error)
+            raise RollupIndexError(f"Error while reading the branch {self.ref}") from git_error
+        except sqlite3.Error as index_error:
+            self.rollback()
+            logger.exception("Error while updating the rollup index: %s", index_error)
+            raise RollupIndexError("Error while updating the rollup index") from index_error
+        except BaseException:
+            self.rollback()
+            raise
+        profile_util.count("rollup.commits_added", num_commits)
+        logger.debug("Added %d commits to the rollup index of %s", num_commits, self.repo_key)
+        return num_commits
+
+    def rollback(self):
+        "Cancels the pending writes"
+        if self.connection.in_transaction:
+            self.connection.execute("ROLLBACK")
+
+    def delete_buckets(self):
+        "Removes the buckets of the branch, before it is indexed again"
+        for table in ("file_buckets", "author_buckets"):
+            self.connection.execute(
+                f"DELETE FROM {table} WHERE repo = ? AND ref = ?", (self.repo_key, self.ref)
+            )
+
+    def write_buckets(self, file_buckets, author_buckets):
+        """
+        Adds the buckets returned by aggregate_commits to the stored ones.
+        """
+        self.connection.executemany(
+            "INSERT INTO file_buckets (repo, ref, slot, filename, touches, added_lines, "
+            "deleted_lines, last_order, last_sha, last_path, last_msg, last_date) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (repo, ref, slot, filename) DO UPDATE SET "
+            "touches = touches + excluded.touches, "
+            "added_lines = added_lines + excluded.added_lines, "
+            "deleted_lines = deleted_lines + excluded.deleted_lines, "
+            + ", ".join(
+                f"{column} = CASE WHEN {IS_LATER_TOUCH} THEN excluded.{column} ELSE {column} END"
+                for column in LAST_TOUCH_COLUMNS
+            ),
+            [
+                (self.repo_key, self.ref, slot, filename, *bucket)
+                for (slot, filename), bucket in file_buckets.items()
+            ],
+        )
+        self.connection.executemany(
+            "INSERT INTO author_buckets (repo, ref, slot, filename, author, touches, lines, "
+            "first_order) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (repo, ref, slot, filename, author) DO UPDATE SET "
+            "touches = touches + excluded.touches, lines = lines + excluded.lines",
+            [
+                (self.repo_key, self.ref, slot, filename, author, *bucket)
+                for (slot, filename, author), bucket in author_buckets.items()
+            ],
+        )
+
+    def query(self, since=None, to=None):
+        """
+        Merges the day buckets of the commits between two dates, both included.
+        Args:
+            since (datetime, optional): A UTC midnight, the start of the range.
+            to (datetime, optional): A UTC midnight, the end of the range.
+        Returns:
+            RollupRange: The aggregates of the range.
+        """
+        slot_range = get_slot_range(since, to)
+        if slot_range is None:
+            raise ValueError("The rollup index only answers ranges between UTC midnights")
+        parameters = (self.repo_key, self.ref) + slot_range
+        try:
+            with profile_util.span("rollup.query"):
+                # The bare columns take the values of the row with the latest day, the
+                # slots following the commit dates
+                file_rows = self.connection.execute(
+                    "SELECT filename, SUM(touches), SUM(added_lines + deleted_lines), "
+                    "MAX(slot), last_sha, last_path, last_msg, last_date "
+                    "FROM file_buckets WHERE repo = ? AND ref = ? AND slot BETWEEN ? AND ? "
+                    "GROUP BY filename",
+                    parameters,
+                ).fetchall()
+                pair_rows = self.connection.execute(
+                    "SELECT filename, author FROM author_buckets "
+                    "WHERE repo = ? AND ref = ? AND slot BETWEEN ? AND ? "
+                    "GROUP BY filename, author ORDER BY MIN(first_order)",
+                    parameters,
+                ).fetchall()
+        except sqlite3.Error as index_error:
+            logger.exception("Error while reading the rollup index: %s", index_error)
+            raise RollupIndexError("Error while reading the rollup index") from index_error
+        profile_util.count("rollup.buckets", len(file_rows))
+
+        # Files are listed in the order they were first touched, like commit by commit
+        file_indexes = {}
+        pairs = []
+        for filename, author in pair_rows:
+            file_index = file_indexes.setdefault(filename, len(file_indexes))
+            pairs.append((file_index, author))
+        rows = sorted(file_rows, key=lambda row: file_indexes[row[0]])
+        return RollupRange(
+            files=[row[0] for row in rows],
+            touches=[row[1] for row in rows],
+            lines=[row[2] for row in rows],
+            last_changes=[(row[4], row[5]) for row in rows],
+            last_msgs=[row[6] for row in rows],
+            last_dates=[datetime.fromisoformat(row[7]) for row in rows],
+            pairs=pairs,
+        )
+
+    def close(self):
+        """
+        Closes the database.
+        """
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,117 @@
+"""
+This script splits GitHub search queries into date windows.
+The search API returns at most 1000 results per query, so a query over a long date range
+on a busy repository is silently truncated. When a query has a date range qualifier,
+such as `created:2023-01-01..2023-12-31`, and matches more results than that, its range
+is split into smaller windows, recursively, until every window is under the cap.
+"""
+
+import os
+import re
+import sys
+import math
+from datetime import datetime, time, timedelta, timezone
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import logger_util
+
+logger = logger_util.get_logger('root')
+
+SEARCH_RESULT_LIMIT = 1000
+DATE_RANGE_PATTERN = re.compile(r"\b(created|updated|closed|merged):(\S+?)\.\.(\S+)")
+# Open ended ranges are bounded by the creation of GitHub and the current time
+EARLIEST_DATE = datetime(2008, 1, 1, tzinfo=timezone.utc)
+SMALLEST_WINDOW = timedelta(seconds=1)
+
+
+def parse_search_date(value, is_end):
+    """
+    Parses a date of a search qualifier as a UTC datetime. A date without a time
+    stands for the whole day, so it is the start or the end of the day.
+    """
+    if value == "*":
+        return datetime.now(timezone.utc).replace(microsecond=0) if is_end else EARLIEST_DATE
+    if "T" not in value:
+        day = datetime.strptime(value, "%Y-%m-%d").date()
+        return datetime.combine(day, time.max if is_end else time.min, timezone.utc).replace(
+            microsecond=0
+        )
+    date = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return date.astimezone(timezone.utc)
+
+
+def format_search_date(date):
+    """
+    Formats a UTC datetime for a search qualifier.
+    """
+    return date.strftime("%Y-%m-%dT%H:%M:%S+00:00")
+
+
+def get_date_range(query):
+    """
+    Returns the date range qualifier of a query as a match and its start and end
+    datetimes, or None when the query has no date range or it cannot be parsed.
+    """
+    match = DATE_RANGE_PATTERN.search(query)
+    if match is None:
+        return None
+    try:
+        start = parse_search_date(match.group(2), is_end=False)
+        end = parse_search_date(match.group(3), is_end=True)
+    except ValueError:
+        return None
+    return match, start, end
+
+
+def split_range(start, end, num_windows):
+    """
+    Splits an inclusive range of seconds into at most num_windows contiguous windows.
+    """
+    num_seconds = int((end - start).total_seconds()) + 1
+    num_windows = min(num_windows, num_seconds)
+    windows = []
+    window_start = start
+    for index in range(num_windows):
+        window_end = start + timedelta(seconds=num_seconds * (index + 1) // num_windows - 1)
+        windows.append((window_start, window_end))
+        window_start = window_end + SMALLEST_WINDOW
+    return windows
+
+
+def split_query(query, count_results):
+    """
+    Splits a query into queries over date windows that each match at most
+    SEARCH_RESULT_LIMIT results.
+    Args:
+        query (str): The search query.
+        count_results (callable): Takes a query and returns the number of results
+        and a payload, such as the first page of results, that is returned along with
+        the query so that it does not need to be fetched again.
+    Returns:
+        list: (query, payload) pairs, in the order of the date windows.
+    """
+    total_count, payload = count_results(query)
+    if total_count <= SEARCH_RESULT_LIMIT:
+        return [(query, payload)]
+
+    date_range = get_date_range(query)
+    if date_range is None or date_range[2] - date_range[1] < SMALLEST_WINDOW:
+        logger.warning(
+            "The search '%s' matches %d results, only the first %d are returned",
+            query, total_count, SEARCH_RESULT_LIMIT,
+        )
+        return [(query, payload)]
+
+    match, start, end = date_range
+    # Results are rarely spread evenly, the windows that are still too large are split again
+    num_windows = max(2, math.ceil(total_count / SEARCH_RESULT_LIMIT) + 1)
+    logger.debug("Splitting the search '%s' into %d windows", query, num_windows)
+    windows = []
+    for window_start, window_end in split_range(start, end, num_windows):
+        window_query = (
+            f"{query[:match.start()]}{match.group(1)}:{format_search_date(window_start)}.."
+            f"{format_search_date(window_end)}{query[match.end():]}"
+        )
+        windows.extend(split_query(window_query, count_results))
+    return windows
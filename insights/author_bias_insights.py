@@ -3,7 +3,7 @@ This script is used to produce the following insight:
 Find the files that have high Author Bias during the time period
 
 Usage:
-python author_bias_insights.py
+python author_bias_insights.py [--profile [JSON_PATH]]
 
 Provide the following inputs:
 Enter the start date in YYYY-MM-DD format (eg: 2023-02-01)
@@ -25,7 +25,7 @@ import sys
 import numpy as np
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from modules import fetch_author_count
-from utils import logger_util
+from utils import logger_util, profile_util, report_writer
 
 logger_util.setup_logging()
 logger = logger_util.get_logger("userLogger")
@@ -105,46 +105,52 @@ def write_html_report(file_info_df, file_name):
         None
     """
     try:
-        with open(file_name, "w", encoding="utf-8") as file:
-            if file_info_df.empty:
-                message = "No data available between the specified dates."
-                file.write(message)
-            else:
-                html = file_info_df.to_html(index=False)
-                file.write(html)
+        with profile_util.span("html.render"):
+            report_writer.write_html_report(file_info_df, file_name)
     except (FileNotFoundError, PermissionError) as report_error:
         logger.error(
             "An error occurred while writing the HTML report: %s", report_error)
         sys.exit(1)
 
 
+def create_report(contributors_data, file_name):
+    """
+    Prints the files with a high author bias and writes the HTML report.
+    Returns:
+        bool: False when there is no commit between the dates, and no report is written.
+    """
+    if contributors_data.size == 0:
+        print("No commits has been done during this time range")
+        return False
+    report_data = contributors_data.copy()
+    high_bias_data = calculate_author_bias(contributors_data)
+    num_rows = len(high_bias_data.index)
+    if num_rows == 0:
+        print("No files have high Author Bias in this repository.")
+    elif num_rows < 2:
+        print("Not enough data is available to list the files with high Author Bias.")
+    else:
+        file_list = high_bias_data["File Name"].tolist()
+        print("\n Files with High Author Bias during the time period:\n")
+        for each_file in file_list:
+            print(" -> " + each_file)
+
+    write_html_report(report_data, file_name)
+    return True
+
+
 if __name__ == "__main__":
     start_date, end_date, repo_path = get_inputs()
+    profile_util.setup_profiling(os.path.join(reports_dir, "author_bias_profile.json"))
     try:
         contributors_data = fetch_author_count.get_contributors_info(
             repo_path, start_date, end_date
         )
-        report_data = contributors_data.copy()
     except fetch_author_count.FetchDataError as error:
         error_message = f"Error extracting review details for repository \
             '{repo_path}' between {start_date} and {end_date}: {error}"
         logger.error(error_message)
         sys.exit(1)
 
-    if contributors_data.size == 0:
-        print("No commits has been done during this time range")
-    else:
-        high_bias_data = calculate_author_bias(contributors_data)
-        num_rows = len(high_bias_data.index)
-        if num_rows == 0:
-            print("No files have high Author Bias in this repository.")
-        elif num_rows < 2:
-            print("Not enough data is available to list the files with high Author Bias.")
-        else:
-            file_list = high_bias_data["File Name"].tolist()
-            print("\n Files with High Author Bias during the time period:\n")
-            for each_file in file_list:
-                print(" -> " + each_file)
-
-        write_html_report(report_data, html_report_path)
+    if create_report(contributors_data, html_report_path):
         print("\nDetailed report can be found in report_author_bias.html\n")
@@ -0,0 +1,406 @@
+"""
+This script produces the insights of several repositories in one run, without prompting,
+from a JSON config file listing the repositories, the date ranges and the insights.
+
+Usage:
+python insights/batch_runner.py <config.json> [--concurrency N]
+
+Example config:
+{
+    "start_date": "2023-01-01",
+    "end_date": "2023-06-30",
+    "insights": ["top_touched_files", "author_bias", "pr_review_time",
+                 "size_of_prs", "merge_activity"],
+    "concurrency": 4,
+    "repos": [
+        {"name": "qxf2/newsletter_automation"},
+        {"name": "qxf2/qxf2-page-object-model", "branch": "master", "file_type": ".py"},
+        {"path": "/path/to/a/local/clone", "insights": ["top_touched_files"]}
+    ]
+}
+
+The settings at the top level are the defaults of every repository, and a repository
+can override any of them: start_date, end_date, insights, branch (the current branch
+of the repository by default), file_type, num_files and output_dir. A repository has
+a GitHub "name" (owner/name), needed by the PR based insights, and/or a "path", a local
+path or a URL, which defaults to https://github.com/<name>.git.
+
+The commits of a repository are walked once for all its Git based insights, and its
+merged PRs are fetched once for all its PR based insights. The Git and the GitHub data
+of a repository are fetched at the same time, and the repositories are spread over
+a pool of processes. Every repository gets its own folder under the output directory,
+with the HTML reports of its insights and a summary.txt of what they printed.
+A summary.json of the status and time of every insight is written at the top.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import contextlib
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from git.exc import GitCommandError, NoSuchPathError
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from helpers.commit_cache import CommitCacheError
+from helpers.commit_scanner import CommitScanner
+from helpers.git_log_parser import GitLogError
+from helpers.github_pr_data_extractor import PRDataExtractor, PRDataExtractionError
+from helpers.repo_mirror import RepoMirrorError
+from helpers.rollup_index import RollupIndexError
+from insights import (
+    author_bias_insights, merge_activity, pr_review_time, size_of_prs, top_touched_files,
+)
+from modules import fetch_pr_review_time, fetch_size_of_pr
+from modules.fetch_author_count import AuthorCountAggregator
+from modules.fetch_most_modified_files import TopFilesAggregator
+from utils import config_util, logger_util
+
+logger = logger_util.get_logger("userLogger")
+
+gitlog_insights_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+GIT_INSIGHTS = ("top_touched_files", "author_bias")
+PR_INSIGHTS = ("pr_review_time", "size_of_prs", "merge_activity")
+INSIGHTS = GIT_INSIGHTS + PR_INSIGHTS
+REPORT_FILES = {
+    "top_touched_files": "top_touched_files_report.html",
+    "author_bias": "report_author_bias.html",
+    "pr_review_time": "pr_review_time_report.html",
+    "size_of_prs": "size_of_prs_report.html",
+    "merge_activity": "merge_activity_report.html",
+}
+DEFAULTS = {
+    "output_dir": os.path.join(gitlog_insights_dir, "reports", "batch"),
+    "concurrency": 1,
+    "insights": list(INSIGHTS),
+    "branch": None,
+    "file_type": None,
+    "num_files": 5,
+}
+REPO_SETTINGS = (
+    "name", "path", "start_date", "end_date", "insights", "branch", "file_type", "num_files",
+    "output_dir",
+)
+GIT_ERRORS = (
+    CommitCacheError, GitLogError, RepoMirrorError, RollupIndexError, GitCommandError,
+    NoSuchPathError, KeyError, ValueError,
+)
+PR_ERRORS = (PRDataExtractionError, GitLogError, RepoMirrorError, KeyError, ValueError)
+
+
+class BatchConfigError(Exception):
+    "To raise exceptions generated while reading the batch config"
+
+
+def parse_date(value, setting):
+    """
+    Returns a date of the config as a datetime.
+    """
+    try:
+        return datetime.strptime(str(value), "%Y-%m-%d")
+    except ValueError as value_error:
+        raise BatchConfigError(
+            f"{setting} must be a date in YYYY-MM-DD format, got '{value}'"
+        ) from value_error
+
+
+def get_repo_slug(repo):
+    """
+    Returns the name of the folder of a repository's reports.
+    """
+    if repo["name"]:
+        return repo["name"].replace("/", "_")
+    path = repo["path"].rstrip("/")
+    if path.endswith(".git"):
+        path = path[:-len(".git")]
+    return os.path.basename(path) or "repository"
+
+
+def read_config(config_path):
+    """
+    Reads the batch config and applies the defaults to every repository.
+    Returns:
+        tuple: The concurrency, the output directory and the list of repositories,
+        each a dict of its settings.
+    """
+    try:
+        with open(config_path, encoding="utf-8") as config_file:
+            config = json.load(config_file)
+    except (OSError, json.JSONDecodeError) as config_error:
+        raise BatchConfigError(f"Could not read {config_path}: {config_error}") from config_error
+
+    if not isinstance(config, dict) or not isinstance(config.get("repos"), list):
+        raise BatchConfigError("The config must be an object with a list of repos")
+    defaults = dict(DEFAULTS, **{key: value for key, value in config.items() if key != "repos"})
+
+    repos = []
+    for entry in config["repos"]:
+        if isinstance(entry, str):
+            entry = {"name": entry}
+        unknown = set(entry) - set(REPO_SETTINGS)
+        if unknown:
+            raise BatchConfigError(f"Unknown settings {sorted(unknown)} in {entry}")
+        repo = {setting: defaults.get(setting) for setting in REPO_SETTINGS}
+        repo.update(entry)
+        if not repo["name"] and not repo["path"]:
+            raise BatchConfigError(f"The repository {entry} needs a name or a path")
+        repo["path"] = repo["path"] or f"https://github.com/{repo['name']}.git"
+        for setting in ("start_date", "end_date"):
+            if repo[setting] is None:
+                raise BatchConfigError(f"The repository {entry} needs a {setting}")
+            parse_date(repo[setting], setting)
+        if parse_date(repo["end_date"], "end_date") <= parse_date(repo["start_date"], "start_date"):
+            raise BatchConfigError(f"The end date must be greater than the start date in {entry}")
+        unknown = set(repo["insights"]) - set(INSIGHTS)
+        if unknown:
+            raise BatchConfigError(f"Unknown insights {sorted(unknown)}, expected some of {INSIGHTS}")
+        repo["slug"] = get_repo_slug(repo)
+        repos.append(repo)
+    return int(defaults["concurrency"]), defaults["output_dir"], repos
+
+
+def group_repos(repos):
+    """
+    Groups the entries of the same repository, to run them in the same process:
+    the mirror of a repository is only locked within a process.
+    Returns:
+        list: The lists of entries of every repository.
+    """
+    groups = {}
+    for repo in repos:
+        groups.setdefault(repo["path"], []).append(repo)
+    return list(groups.values())
+
+
+def fetch_git_data(repo):
+    """
+    Walks the commits of a repository once for all its Git based insights.
+    Returns:
+        dict: The DataFrame of every requested Git based insight.
+    """
+    aggregators = {}
+    if "top_touched_files" in repo["insights"]:
+        aggregators["top_touched_files"] = TopFilesAggregator(repo["file_type"], repo["num_files"])
+    if "author_bias" in repo["insights"]:
+        aggregators["author_bias"] = AuthorCountAggregator()
+    if not aggregators:
+        return {}
+    scanner = CommitScanner(
+        repo["path"],
+        since=parse_date(repo["start_date"], "start_date"),
+        to=parse_date(repo["end_date"], "end_date"),
+        branch=repo["branch"],
+    )
+    return dict(zip(aggregators, scanner.run(*aggregators.values())))
+
+
+def fetch_pr_data(repo):
+    """
+    Fetches the PRs of a repository once for all its PR based insights.
+    Returns:
+        dict: The PR details of every requested PR based insight, with the PR metrics
+        of the same PRs for the review time and the size of the PRs.
+    """
+    requested = [insight for insight in PR_INSIGHTS if insight in repo["insights"]]
+    if not requested:
+        return {}
+    merge_backend = config_util.get_setting("merge_backend", "api")
+    needs_merged_prs = "pr_review_time" in requested or (
+        "merge_activity" in requested and merge_backend != "git"
+    )
+    if (needs_merged_prs or "size_of_prs" in requested) and not repo["name"]:
+        raise ValueError("The PR based insights need the name of the GitHub repository")
+
+    start_date, end_date = repo["start_date"], repo["end_date"]
+    pr_data = {}
+    merged_pr_details = None
+    # One extractor syncs the PR store once for all the insights
+    github_api = PRDataExtractor(repo["name"]) if repo["name"] else None
+    if needs_merged_prs:
+        merged_pr_details = github_api.get_merged_pr_details(start_date, end_date)
+    if "pr_review_time" in requested:
+        pr_data["pr_review_time"] = (
+            merged_pr_details.copy(),
+            fetch_pr_review_time.get_review_metrics(
+                repo["name"], start_date, end_date, github_api, sync=False
+            ),
+        )
+    if "merge_activity" in requested:
+        if merge_backend == "git":
+            pr_data["merge_activity"] = merge_activity.get_merge_data_extractor(
+                repo["path"]
+            ).get_merged_pr_details(start_date, end_date)
+        else:
+            pr_data["merge_activity"] = merged_pr_details.copy()
+    if "size_of_prs" in requested:
+        pr_data["size_of_prs"] = (
+            github_api.get_pr_files_details(start_date, end_date),
+            fetch_size_of_pr.get_size_metrics(
+                repo["name"], start_date, end_date, github_api, sync=False
+            ),
+        )
+    return pr_data
+
+
+def create_report(insight, data, repo, file_name):
+    """
+    Prints the insights of one insight script on the shared data and writes its HTML report.
+    Returns:
+        bool: False when there was no data to report.
+    """
+    start_date, end_date = repo["start_date"], repo["end_date"]
+    if insight == "top_touched_files":
+        top_touched_files.create_report(
+            data, parse_date(start_date, "start_date"), parse_date(end_date, "end_date"),
+            file_name,
+        )
+        return not data.empty
+    if insight == "author_bias":
+        return author_bias_insights.create_report(data, file_name)
+    if insight == "merge_activity":
+        return merge_activity.create_report(data, start_date, end_date, file_name)
+    pr_details, metrics = data
+    if pr_details.empty:
+        print(f"No data found betweent the specified dates : {start_date} and {end_date}")
+        return False
+    if insight == "pr_review_time":
+        return pr_review_time.create_report(
+            fetch_pr_review_time.get_review_time(pr_details), file_name, metrics
+        )
+    return size_of_prs.create_report(fetch_size_of_pr.get_pr_size(pr_details), file_name, metrics)
+
+
+def run_repo(repo):
+    """
+    Fetches the data of a repository and writes the reports of its insights.
+    Returns:
+        dict: The status and time of every insight, and the errors.
+    """
+    report_dir = os.path.join(
+        repo["output_dir"], repo["slug"], f"{repo['start_date']}_{repo['end_date']}"
+    )
+    os.makedirs(report_dir, exist_ok=True)
+    results = {insight: {"status": "pending"} for insight in repo["insights"]}
+    fetches = {"git": (fetch_git_data, GIT_INSIGHTS, GIT_ERRORS),
+               "pr": (fetch_pr_data, PR_INSIGHTS, PR_ERRORS)}
+
+    with open(os.path.join(report_dir, "summary.txt"), "w", encoding="utf-8") as summary_file:
+        with contextlib.redirect_stdout(summary_file):
+            print(f"Insights of {repo['name'] or repo['path']} "
+                  f"between {repo['start_date']} and {repo['end_date']}")
+            with ThreadPoolExecutor(max_workers=len(fetches)) as executor:
+                futures = {
+                    source: (executor.submit(timed_call, fetch, repo), insights, errors)
+                    for source, (fetch, insights, errors) in fetches.items()
+                }
+                for source, (future, insights, errors) in futures.items():
+                    try:
+                        data, seconds = future.result()
+                    except errors as error:
+                        logger.error("Error fetching the %s data of %s: %s",
+                                     source, repo["slug"], error)
+                        for insight in insights:
+                            if insight in results:
+                                results[insight] = {"status": "failed", "error": str(error)}
+                        continue
+                    for insight, insight_data in data.items():
+                        results[insight] = run_insight(insight, insight_data, repo, report_dir)
+                        results[insight]["fetch_seconds"] = round(seconds, 3)
+    return {"repo": repo["slug"], "start_date": repo["start_date"],
+            "end_date": repo["end_date"], "report_dir": report_dir, "insights": results}
+
+
+def timed_call(function, *args):
+    """
+    Calls a function.
+    Returns:
+        tuple: The result of the function and the seconds it took.
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def run_insight(insight, data, repo, report_dir):
+    """
+    Writes the report of one insight, catching its errors so the other insights still run.
+    """
+    print(f"\n== {insight} ==")
+    try:
+        has_data, seconds = timed_call(
+            create_report, insight, data, repo, os.path.join(report_dir, REPORT_FILES[insight])
+        )
+    except (KeyError, ValueError) as error:
+        logger.error("Error creating the %s report of %s: %s", insight, repo["slug"], error)
+        return {"status": "failed", "error": str(error)}
+    except SystemExit:
+        # write_html_report exits when the report can not be written
+        return {"status": "failed", "error": "The HTML report could not be written"}
+    return {"status": "ok" if has_data else "no data", "report_seconds": round(seconds, 3)}
+
+
+def run_group(repos):
+    """
+    Runs the entries of one repository in turn.
+    """
+    return [run_repo(repo) for repo in repos]
+
+
+def print_summary(results):
+    "Prints the status of every insight of every repository"
+    print(f"\n{'repository':<40} {'dates':<23} {'insight':<18} {'status':<8} {'seconds':>8}")
+    for repo_result in results:
+        dates = f"{repo_result['start_date']}..{repo_result['end_date']}"
+        for insight, result in repo_result["insights"].items():
+            seconds = result.get("fetch_seconds", 0) + result.get("report_seconds", 0)
+            print(f"{repo_result['repo']:<40} {dates:<23} {insight:<18} "
+                  f"{result['status']:<8} {seconds:>8.2f}")
+
+
+def main():
+    "Reads the config, runs the repositories in a pool of processes and writes the summary"
+    parser = argparse.ArgumentParser(description="Produces the insights of several repositories")
+    parser.add_argument("config", help="The JSON file listing the repositories")
+    parser.add_argument("--concurrency", type=int,
+                        help="The number of repositories processed at the same time")
+    arguments = parser.parse_args()
+
+    try:
+        concurrency, output_dir, repos = read_config(arguments.config)
+    except BatchConfigError as error:
+        logger.error(error)
+        sys.exit(1)
+    concurrency = max(1, arguments.concurrency or concurrency)
+
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=concurrency) as executor:
+        groups = group_repos(repos)
+        futures = [executor.submit(run_group, group) for group in groups]
+        for group, future in zip(groups, futures):
+            try:
+                results.extend(future.result())
+            except Exception as error:  # pylint: disable=broad-except
+                # One failing repository must not stop the reports of the others
+                logger.exception("Error processing %s: %s", group[0]["slug"], error)
+                results.extend(
+                    {"repo": repo["slug"], "start_date": repo["start_date"],
+                     "end_date": repo["end_date"], "error": str(error),
+                     "insights": {insight: {"status": "failed", "error": str(error)}
+                                  for insight in repo["insights"]}}
+                    for repo in group
+                )
+
+    os.makedirs(output_dir, exist_ok=True)
+    summary_path = os.path.join(output_dir, "summary.json")
+    with open(summary_path, "w", encoding="utf-8") as summary_file:
+        json.dump({"wall_seconds": round(time.perf_counter() - start, 3), "repos": results},
+                  summary_file, indent=2)
+    print_summary(results)
+    print(f"\nReports written to {output_dir}, summary in {summary_path}")
+
+
+if __name__ == "__main__":
+    main()
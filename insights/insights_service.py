@@ -0,0 +1,554 @@
+"""
+This script runs gitlog-insights as a long-running local HTTP/JSON service, so that
+dashboards can query the insights without paying for the interpreter startup, the imports,
+a clone or fetch and a full recomputation on every query.
+
+Usage:
+python insights/insights_service.py [--host 127.0.0.1] [--port 8050]
+
+Endpoints (GET, dates in YYYY-MM-DD format):
+/top_files?repo=<path or URL>&start_date=&end_date=[&branch=][&file_type=.py][&num_files=5]
+/contributors?repo=<path or URL>&start_date=&end_date=[&branch=]
+/review_time?repo=<owner/name>&start_date=&end_date=
+/pr_size?repo=<owner/name>&start_date=&end_date=
+/merge_activity?repo=<owner/name>&start_date=&end_date=
+/review_metrics?repo=<owner/name>&start_date=&end_date=
+/size_metrics?repo=<owner/name>&start_date=&end_date=
+/stats
+Add refresh=1 to a query to fetch the repository or the PRs before answering.
+
+The service keeps in memory, with least recently used eviction:
+  - the commit statistics of every queried repository and branch, read once with
+    git log --numstat and then extended with the new commits, so that a date range
+    is answered without walking the history again
+  - the results of the queries, as JSON, keyed by the commit the history was at
+  - one PR extractor per repository, reading the local PR store
+The review and size metrics of a range of days are merged from the daily buckets of
+the PR metrics cube, so they are answered without reading the PRs of the range.
+Repositories are fetched, and the PR store synced, at most once every
+GITLOG_INSIGHTS_SERVICE_REFRESH_SECONDS.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+from git import Repo
+from git.exc import GitError
+from gitdb.exc import BadName
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from helpers.commit_cache import REMOTE_PREFIXES, CommitCacheError
+from helpers.commit_scanner import CommitScanner, feed_aggregators
+from helpers.git_log_parser import GitLogError, iter_numstat_commits
+from helpers.github_pr_data_extractor import PRDataExtractor, PRDataExtractionError
+from helpers.pr_metrics_cube import summarize_review_metrics, summarize_size_metrics
+from helpers.repo_mirror import RepoMirrorCache, RepoMirrorError
+from insights.merge_activity import get_merge_data_extractor
+from modules import fetch_pr_review_time, fetch_size_of_pr
+from modules.fetch_author_count import AuthorCountAggregator
+from modules.fetch_most_modified_files import TopFilesAggregator
+from modules.fetch_report_merge_activity import get_merge_activity_details
+from utils import config_util, logger_util, profile_util
+
+logger = logger_util.get_logger("userLogger")
+
+DEFAULT_PORT = 8050
+DEFAULT_REFRESH_SECONDS = 300
+DEFAULT_MAX_REPOS = 8
+DEFAULT_MAX_RESULTS = 512
+DATA_ERRORS = (
+    CommitCacheError, GitLogError, RepoMirrorError, PRDataExtractionError, KeyError, ValueError,
+)
+
+
+class RequestError(Exception):
+    "To raise exceptions for invalid queries, answered with the status 400"
+
+
+class LRUCache:
+    """
+    A thread safe mapping that keeps its most recently used entries.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max(1, max_entries)
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, max_age=None):
+        """
+        Returns the value of a key, or None when it is missing or older than max_age seconds.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or (max_age is not None and time.monotonic() - entry[0] > max_age):
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        "Stores the value of a key, evicting the least recently used entries"
+        with self.lock:
+            self.entries[key] = (time.monotonic(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, key, value):
+        "Removes a key, unless it was stored again with another value since"
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] is value:
+                del self.entries[key]
+
+    def get_stats(self):
+        "Returns the size and the hits of the cache"
+        with self.lock:
+            return {
+                "entries": len(self.entries), "max_entries": self.max_entries,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+            }
+
+
+def get_timestamps(commits):
+    """
+    Returns the committer dates of commits as an array of POSIX timestamps.
+    """
+    return np.array(
+        [commit.committer_date.timestamp() for commit in commits], dtype=np.int64
+    )
+
+
+def is_refresh(query):
+    "Checks if a query asks to fetch the repository or the PRs first"
+    return query.get("refresh", "").strip().lower() in config_util.TRUE_VALUES
+
+
+class RepositoryHistory:
+    """
+    The statistics of the commits of one branch of a repository, kept in memory.
+    Commits are in the order of git log --reverse, with their timestamps in an array,
+    so the commits of any date range are selected without walking the history.
+    """
+
+    def __init__(self, repo_path, branch=None):
+        self.repo_path = repo_path
+        self.branch = branch
+        self.local_path = None
+        self.head = None
+        self.commits = []
+        self.timestamps = np.empty(0, dtype=np.int64)
+        self.refreshed_at = None
+        self.lock = threading.Lock()
+
+    def refresh(self, max_age):
+        """
+        Fetches the repository and reads the commits added since the last refresh,
+        unless the history was refreshed less than max_age seconds ago.
+        """
+        with self.lock:
+            if self.refreshed_at is not None and time.monotonic() - self.refreshed_at < max_age:
+                return
+            if self.repo_path.startswith(REMOTE_PREFIXES):
+                self.local_path = RepoMirrorCache().get_local_path(self.repo_path)
+            else:
+                self.local_path = self.repo_path
+            try:
+                git_repo = Repo(self.local_path)
+                head = git_repo.commit(self.branch or "HEAD").hexsha
+            except GitError as git_error:
+                raise RequestError(f"{self.repo_path} is not a Git repository") from git_error
+            except (BadName, ValueError) as name_error:
+                raise RequestError(f"Unknown branch '{self.branch}'") from name_error
+
+            if head != self.head:
+                if self.head is not None and git_repo.is_ancestor(self.head, head):
+                    logger.debug("Reading the new commits of %s", self.repo_path)
+                    # git log accepts a revision range where it accepts a branch
+                    new_commits = list(
+                        iter_numstat_commits(self.local_path, branch=f"{self.head}..{head}")
+                    )
+                    self.commits = self.commits + new_commits
+                    self.timestamps = np.concatenate(
+                        [self.timestamps, get_timestamps(new_commits)]
+                    )
+                else:
+                    logger.debug("Reading the history of %s", self.repo_path)
+                    self.commits = list(iter_numstat_commits(self.local_path, branch=head))
+                    self.timestamps = get_timestamps(self.commits)
+                self.head = head
+            git_repo.close()
+            self.refreshed_at = time.monotonic()
+
+    def get_snapshot(self):
+        """
+        Returns:
+            tuple: The head commit, the commits and their timestamps, consistent with each other.
+        """
+        with self.lock:
+            return self.head, self.commits, self.timestamps
+
+
+class HistoryScanner(CommitScanner):
+    """
+    A commit scanner reading the commits of a date range from a history kept in memory.
+    Like the "git" backend, the complexity of the reported files is looked up in `finalize`.
+    """
+
+    def __init__(self, history, since, to):
+        super().__init__(history.repo_path, since=since, to=to, branch=history.branch,
+                         backend="git")
+        self.history = history
+
+    def get_commits(self, commits, timestamps):
+        """
+        Yields the commits within the date range, in the order git log gives them.
+        Dates without a timezone are taken as UTC, like for git log.
+        """
+        since = self.since.replace(tzinfo=self.since.tzinfo or timezone.utc).timestamp()
+        to = self.to.replace(tzinfo=self.to.tzinfo or timezone.utc).timestamp()
+        for index in np.flatnonzero((timestamps >= since) & (timestamps <= to)).tolist():
+            yield commits[index]
+
+    def run(self, *aggregators):
+        _, commits, timestamps = self.history.get_snapshot()
+        self.local_path = self.history.local_path
+        try:
+            with profile_util.span("git.traversal"):
+                feed_aggregators(self.get_commits(commits, timestamps), aggregators)
+            with profile_util.span("aggregate.finalize"):
+                for aggregator in aggregators:
+                    aggregator.finalize(self)
+        finally:
+            if self.git_repo is not None:
+                self.git_repo.clear()
+            self.git_repo = None
+            self.local_path = None
+
+        with profile_util.span("aggregate.result"):
+            return [aggregator.result() for aggregator in aggregators]
+
+
+def parse_date(query, name):
+    """
+    Returns a date of a query as a datetime.
+    """
+    value = query.get(name)
+    if not value:
+        raise RequestError(f"The query needs the {name}")
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError as value_error:
+        raise RequestError(f"{name} must be a date in YYYY-MM-DD format") from value_error
+
+
+def get_query_range(query):
+    """
+    Returns the repository and the dates of a query.
+    """
+    repo = query.get("repo")
+    if not repo:
+        raise RequestError("The query needs the repo")
+    start_date = parse_date(query, "start_date")
+    end_date = parse_date(query, "end_date")
+    if end_date <= start_date:
+        raise RequestError("end_date must be greater than start_date")
+    return repo, start_date, end_date
+
+
+class InsightsService:
+    """
+    Answers the queries of the insights from the data kept in memory.
+    """
+
+    def __init__(self, refresh_seconds=None, max_repos=None, max_results=None):
+        """
+        Initializes the caches of the service.
+        Args:
+            refresh_seconds (int, optional): The time during which a repository is not
+            fetched and the PRs are not synced again. Defaults to the
+            GITLOG_INSIGHTS_SERVICE_REFRESH_SECONDS setting.
+            max_repos (int, optional): The number of repository histories kept in memory.
+            Defaults to the GITLOG_INSIGHTS_SERVICE_MAX_REPOS setting.
+            max_results (int, optional): The number of query results kept in memory.
+            Defaults to the GITLOG_INSIGHTS_SERVICE_MAX_RESULTS setting.
+        """
+        if refresh_seconds is None:
+            refresh_seconds = config_util.get_int_setting(
+                "service_refresh_seconds", DEFAULT_REFRESH_SECONDS
+            )
+        if max_repos is None:
+            max_repos = config_util.get_int_setting("service_max_repos", DEFAULT_MAX_REPOS)
+        if max_results is None:
+            max_results = config_util.get_int_setting("service_max_results", DEFAULT_MAX_RESULTS)
+        self.refresh_seconds = refresh_seconds
+        self.histories = LRUCache(max_repos)
+        self.extractors = LRUCache(max_repos)
+        self.results = LRUCache(max_results)
+        self.lock = threading.Lock()
+        self.started_at = time.monotonic()
+
+    def get_history(self, repo_path, branch, refresh=False):
+        """
+        Returns the refreshed history of a branch of a repository.
+        """
+        key = (repo_path, branch)
+        with self.lock:
+            history = self.histories.get(key)
+            is_new = history is None
+            if is_new:
+                # Stored before it is read, so the concurrent queries wait on its lock
+                # for this thread to read the history instead of reading it again
+                history = RepositoryHistory(repo_path, branch)
+                self.histories.put(key, history)
+        try:
+            history.refresh(0 if refresh or is_new else self.refresh_seconds)
+        except BaseException:
+            if history.head is None:
+                # Only valid repositories are kept
+                self.histories.discard(key, history)
+            raise
+        return history
+
+    def get_extractor(self, repo_name):
+        """
+        Returns the PR extractor of a repository, kept to reuse its connections.
+        """
+        with self.lock:
+            extractor = self.extractors.get(repo_name)
+            if extractor is None:
+                extractor = PRDataExtractor(repo_name, sync_interval=self.refresh_seconds)
+                self.extractors.put(repo_name, extractor)
+        return extractor
+
+    def get_result(self, key, compute, max_age=None):
+        """
+        Returns the cached result of a query, or computes it and caches it.
+        Args:
+            compute (function): Returns the result as a DataFrame, or already as JSON.
+        Returns:
+            tuple: The rows of the result as JSON, and whether they were cached.
+        """
+        rows = self.results.get(key, max_age)
+        if rows is not None:
+            return rows, True
+        rows = compute()
+        if not isinstance(rows, str):
+            rows = rows.to_json(orient="records", date_format="iso")
+        self.results.put(key, rows)
+        return rows, False
+
+    def get_git_result(self, key, query, aggregator):
+        """
+        Returns the result of a Git based insight, keyed by the head commit of the history.
+        Args:
+            key (tuple): The name of the insight and the settings of its aggregator.
+        """
+        repo_path, start_date, end_date = get_query_range(query)
+        history = self.get_history(repo_path, query.get("branch") or None, is_refresh(query))
+        head, _, _ = history.get_snapshot()
+        key += (repo_path, history.branch, head, start_date, end_date)
+
+        def compute():
+            result, = HistoryScanner(history, start_date, end_date).run(aggregator)
+            return result
+
+        return self.get_result(key, compute)
+
+    def get_pr_result(self, name, query, compute):
+        """
+        Returns the result of a PR based insight, computed again once it is older
+        than the refresh time.
+        """
+        repo_name, start_date, end_date = get_query_range(query)
+        start_date, end_date = f"{start_date:%Y-%m-%d}", f"{end_date:%Y-%m-%d}"
+        max_age = 0 if is_refresh(query) else self.refresh_seconds
+        return self.get_result(
+            (name, repo_name, start_date, end_date),
+            lambda: compute(repo_name, start_date, end_date),
+            max_age,
+        )
+
+    def top_files(self, query):
+        "Answers the top touched files of a repository, like find_top_files"
+        try:
+            num_files = int(query.get("num_files", 5))
+        except ValueError as value_error:
+            raise RequestError("num_files must be a number") from value_error
+        file_type = (query.get("file_type") or "").lower() or None
+        return self.get_git_result(
+            ("top_files", file_type, num_files), query, TopFilesAggregator(file_type, num_files)
+        )
+
+    def contributors(self, query):
+        "Answers the contributors of the files of a repository, like get_contributors_info"
+        return self.get_git_result(("contributors",), query, AuthorCountAggregator())
+
+    def review_time(self, query):
+        "Answers the review time of the merged PRs, like calculate_review_time"
+
+        def compute(repo_name, start_date, end_date):
+            pr_details = self.get_extractor(repo_name).get_merged_pr_details(start_date, end_date)
+            if pr_details.empty:
+                return pr_details
+            return fetch_pr_review_time.get_review_time(pr_details)
+
+        return self.get_pr_result("review_time", query, compute)
+
+    def pr_size(self, query):
+        "Answers the size of the PRs, like get_pr_details"
+
+        def compute(repo_name, start_date, end_date):
+            pr_details = self.get_extractor(repo_name).get_pr_files_details(start_date, end_date)
+            if pr_details.empty:
+                return pr_details
+            return fetch_size_of_pr.get_pr_size(pr_details)
+
+        return self.get_pr_result("pr_size", query, compute)
+
+    def review_metrics(self, query):
+        "Answers the review time metrics of the merged PRs from the PR metrics cube"
+
+        def compute(repo_name, start_date, end_date):
+            metrics = self.get_extractor(repo_name).get_pr_metrics(
+                "review", start_date, end_date
+            )
+            return json.dumps(summarize_review_metrics(metrics))
+
+        return self.get_pr_result("review_metrics", query, compute)
+
+    def size_metrics(self, query):
+        "Answers the size metrics of the PRs from the PR metrics cube"
+
+        def compute(repo_name, start_date, end_date):
+            metrics = self.get_extractor(repo_name).get_pr_metrics("size", start_date, end_date)
+            return json.dumps(summarize_size_metrics(metrics))
+
+        return self.get_pr_result("size_metrics", query, compute)
+
+    def merge_activity(self, query):
+        "Answers the merges by day of the week, like get_merge_activity_details"
+
+        def compute(repo_name, start_date, end_date):
+            if config_util.get_setting("merge_backend", "api") == "git":
+                extractor = get_merge_data_extractor(repo_name)
+            else:
+                extractor = self.get_extractor(repo_name)
+            merge_details = extractor.get_merged_pr_details(start_date, end_date)
+            if merge_details.empty:
+                return merge_details
+            return get_merge_activity_details(merge_details)
+
+        return self.get_pr_result("merge_activity", query, compute)
+
+    def get_stats(self):
+        "Returns the state of the caches of the service"
+        return {
+            "uptime_seconds": round(time.monotonic() - self.started_at, 1),
+            "refresh_seconds": self.refresh_seconds,
+            "histories": self.histories.get_stats(),
+            "extractors": self.extractors.get_stats(),
+            "results": self.results.get_stats(),
+        }
+
+
+class InsightsRequestHandler(BaseHTTPRequestHandler):
+    """
+    Answers the HTTP queries of the service.
+    """
+    protocol_version = "HTTP/1.1"
+    routes = (
+        "top_files", "contributors", "review_time", "pr_size", "merge_activity",
+        "review_metrics", "size_metrics",
+    )
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        "Logs the requests at the debug level"
+        logger.debug("%s %s", self.address_string(), format % args)
+
+    def send_json(self, status, data):
+        "Sends a JSON response"
+        if not isinstance(data, bytes):
+            data = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        "Answers a query"
+        start = time.perf_counter()
+        url = urlparse(self.path)
+        name = url.path.strip("/")
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        service = self.server.service
+        if name == "stats":
+            self.send_json(200, service.get_stats())
+            return
+        if name not in self.routes:
+            self.send_json(404, {"error": f"Unknown endpoint /{name}"})
+            return
+        try:
+            rows, cached = getattr(service, name)(query)
+        except RequestError as error:
+            self.send_json(400, {"error": str(error)})
+            return
+        except DATA_ERRORS as error:
+            logger.error("Error answering %s: %s", self.path, error)
+            self.send_json(500, {"error": str(error)})
+            return
+        header = json.dumps({
+            "insight": name,
+            "query": query,
+            "cached": cached,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 3),
+        })
+        # The rows are cached as JSON, so they are not encoded again
+        self.send_json(200, f'{header[:-1]}, "rows": {rows}}}'.encode("utf-8"))
+
+
+def create_server(address, service):
+    """
+    Returns the HTTP server of a service.
+    """
+    server = ThreadingHTTPServer(address, InsightsRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def main():
+    "Runs the service until it is interrupted"
+    parser = argparse.ArgumentParser(description="Serves the insights over HTTP/JSON")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT,
+                        help="The port of the service, 0 for any free port")
+    arguments = parser.parse_args()
+
+    server = create_server((arguments.host, arguments.port), InsightsService())
+    host, port = server.server_address[:2]
+    print(f"Serving the insights on http://{host}:{port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
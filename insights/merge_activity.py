@@ -6,7 +6,7 @@ across different days of the week.
 It extracts and identifies the predominant days when code contributions occured.
 
 Usage:
-python merge_activity.py
+python merge_activity.py [--profile [JSON_PATH]]
 
 Provide the following inputs:
 Enter the start date in YYYY-MM-DD format (eg: 2022-01-01)
@@ -14,6 +14,10 @@ Enter the end date in YYYY-MM-DD format (must be greater than start date) (eg: 2
 Enter the repository path: local or remote GitHub repositories
 (eg: qxf2/newsletter_automation)
 
+Merges are read from the GitHub API by default. With GITLOG_INSIGHTS_MERGE_BACKEND=git,
+they are read from the merge and squash commits of the local Git history instead,
+without any token or rate limit. The repository can then also be a local path.
+
 - The script prompts for necessary inputs and
 then fetches the merge activity report within the specified date range.
 It displays inference based on the data fetched and a simple html report.
@@ -24,8 +28,11 @@ import sys
 from datetime import datetime
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from helpers.github_pr_data_extractor import PRDataExtractor, PRDataExtractionError
+from helpers.git_merge_data_extractor import GitMergeDataExtractor
+from helpers.git_log_parser import GitLogError
+from helpers.repo_mirror import RepoMirrorError
 from modules.fetch_report_merge_activity import get_merge_activity_details
-from utils import logger_util
+from utils import config_util, logger_util, profile_util, report_writer
 
 logger_util.setup_logging()
 logger = logger_util.get_logger("userLogger")
@@ -34,6 +41,8 @@ gitlog_insights_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)
 reports_dir = os.path.join(gitlog_insights_dir, 'reports')
 html_report_path = os.path.join(reports_dir, 'merge_activity_report.html')
 
+MERGE_BACKENDS = ("api", "git")
+
 def get_inputs():
     """
     Prompts the user to enter a start date, end date and repository path,
@@ -66,6 +75,19 @@ def get_inputs():
     return start_date_input, end_date_input, repo_name_input
 
 
+def get_merge_data_extractor(repo_path):
+    """
+    Returns the extractor of merged PRs selected by the GITLOG_INSIGHTS_MERGE_BACKEND
+    setting: "api" for the GitHub API, "git" for the local Git history.
+    """
+    backend = config_util.get_setting("merge_backend", "api")
+    if backend not in MERGE_BACKENDS:
+        raise ValueError(f"Unknown merge backend '{backend}', expected one of {MERGE_BACKENDS}")
+    if backend == "git":
+        return GitMergeDataExtractor(repo_path)
+    return PRDataExtractor(repo_path)
+
+
 def write_html_report(file_info_df, file_name):
     """
     Writes a DataFrame to an HTML report file.
@@ -78,33 +100,43 @@ def write_html_report(file_info_df, file_name):
         None
     """
     try:
-        with open(file_name, "w", encoding='utf-8') as file:
-            if file_info_df.empty:
-                message = "No data available between the specified dates."
-                file.write(message)
-            else:
-                html = file_info_df.to_html(index=False)
-                file.write(html)
+        with profile_util.span("html.render"):
+            report_writer.write_html_report(file_info_df, file_name)
     except (FileNotFoundError, PermissionError) as report_error:
         logger.error("An error occurred while writing the HTML report: %s", report_error)
         sys.exit(1)
 
 
 
+def create_report(merge_details, start_date, end_date, file_name):
+    """
+    Prints the insights on the merge activity and writes the HTML report.
+    Returns:
+        bool: False when no PR was merged between the dates, and no report is written.
+    """
+    if merge_details.empty:
+        print(f"No data found betweent the specified dates : {start_date} and {end_date}")
+        return False
+    weekly_report = get_merge_activity_details(merge_details)
+    write_html_report(weekly_report, file_name)
+    return True
+
+
 if __name__ == "__main__":
     start_date, end_date, repo_path = get_inputs()
+    profile_util.setup_profiling(os.path.join(reports_dir, "merge_activity_profile.json"))
     start_date = start_date.strftime('%Y-%m-%d')
     end_date = end_date.strftime('%Y-%m-%d')
     try:
-        github_api = PRDataExtractor(repo_path)
+        github_api = get_merge_data_extractor(repo_path)
+    except ValueError as error:
+        logger.error(f"Invalid setting for the merge activity: {error}")
+        sys.exit(1)
+    try:
         merge_details = github_api.get_merged_pr_details(start_date,end_date)
-    except PRDataExtractionError as error:
+    except (PRDataExtractionError, GitLogError, RepoMirrorError) as error:
         error_message = f"Error extracting review details for repository '{repo_path}' between {start_date} and {end_date}: {error}"
         logger.error(error_message)
         sys.exit(1)
-    if merge_details.empty:
-        print(f"No data found betweent the specified dates : {start_date} and {end_date}")
-    else:
-        weekly_report = get_merge_activity_details(merge_details)
-        write_html_report(weekly_report, html_report_path)
+    create_report(merge_details, start_date, end_date, html_report_path)
         
\ No newline at end of file
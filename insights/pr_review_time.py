@@ -3,7 +3,7 @@ This script is used to produce the following insight:
 Find the average PR review time within the specified time period
 
 Usage:
-python pr_review_time.py
+python pr_review_time.py [--profile [JSON_PATH]]
 
 Provide the following inputs:
 Enter the start date in YYYY-MM-DD format (eg: 2023-02-01)
@@ -26,7 +26,7 @@ import sys
 import os
 from datetime import datetime
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils import logger_util
+from utils import logger_util, profile_util, report_writer
 from modules import fetch_pr_review_time
 from helpers import github_pr_data_extractor
 
@@ -83,36 +83,43 @@ def write_html_report(file_info_df, review_time, file_name):
         None
     """
     try:
-        with open(file_name, "w+", encoding="utf-8") as file:
-            if file_info_df.empty:
-                message = "No data available between the specified dates."
-                file.write(message)
-            else:
-                html = file_info_df.to_html(index=False)
-                file.write(html)
+        with profile_util.span("html.render"):
+            report_writer.write_html_report(file_info_df, file_name)
     except (FileNotFoundError, PermissionError) as report_error:
         logger.error("An error occurred while writing the HTML report: %s", report_error)
         sys.exit(1)
 
 
+def create_report(review_details, file_name, review_metrics=None):
+    """
+    Prints the insights on the review time and writes the HTML report.
+    The review metrics of the same PRs, when given, provide the aggregates of the insights.
+    Returns:
+        bool: False when there is no review detail, and no report is written.
+    """
+    if review_details.empty:
+        return False
+    average_review_time = fetch_pr_review_time.compute_inference(review_details, review_metrics)
+    write_html_report(review_details, average_review_time, file_name)
+    return True
+
+
 if __name__ == "__main__":
     input_start_date, input_end_date, input_repo_name = get_inputs()
+    profile_util.setup_profiling(os.path.join(reports_dir, "pr_review_time_profile.json"))
+    github_api = github_pr_data_extractor.PRDataExtractor(input_repo_name)
     try:
         review_details = fetch_pr_review_time.calculate_review_time(
-            input_repo_name, input_start_date, input_end_date
+            input_repo_name, input_start_date, input_end_date, github_api
+        )
+        # The store was just synced for the same range
+        review_metrics = fetch_pr_review_time.get_review_metrics(
+            input_repo_name, input_start_date, input_end_date, github_api, sync=False
         )
     except github_pr_data_extractor.PRDataExtractionError as error:
         error_message = f"Error extracting review details for repository \
             '{input_repo_name}' between {input_start_date} and {input_end_date}: {error}"
         logger.error(error_message)
         sys.exit(1)
-    if not review_details.empty:
-        average_review_time = fetch_pr_review_time.compute_inference(
-            review_details
-        )
-        write_html_report(
-            review_details,
-            average_review_time,
-            html_report_path,
-        )
+    if create_report(review_details, html_report_path, review_metrics):
         print('\nDetailed report can be found in pr_review_time_report.html\n')
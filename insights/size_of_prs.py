@@ -4,7 +4,7 @@ Find the size of the PR and number of files changed in a GitHub repository
 within the specified time period.
 
 Usage:
-python size_of_PRs.py
+python size_of_PRs.py [--profile [JSON_PATH]]
 
 Provide the following inputs:
 Enter the start date in YYYY-MM-DD format (eg: 2023-02-01)
@@ -26,7 +26,7 @@ from datetime import datetime
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from modules import fetch_size_of_pr
 from helpers import github_pr_data_extractor
-from utils import logger_util
+from utils import logger_util, profile_util, report_writer
 
 logger_util.setup_logging()
 logger = logger_util.get_logger("userLogger")
@@ -79,27 +79,40 @@ def write_html_report(file_info_df,file_name):
         None
     """
     try:
-        with open(file_name, "w", encoding='utf-8') as file:
-            if file_info_df.empty:
-                message = "No data available between the specified dates."
-                file.write(message)
-            else:
-                html = file_info_df.to_html(index=False)
-                file.write(html)
+        with profile_util.span("html.render"):
+            report_writer.write_html_report(file_info_df, file_name)
     except (FileNotFoundError, PermissionError) as report_error:
         logger.error("An error occurred while writing the HTML report: %s", report_error)
         sys.exit(1)
 
+def create_report(pr_details, file_name, size_metrics=None):
+    """
+    Prints the insights on the size of the PRs and writes the HTML report.
+    The size metrics of the same PRs, when given, provide the maximums of the insights.
+    Returns:
+        bool: False when there is no PR detail, and no report is written.
+    """
+    if pr_details.empty:
+        return False
+    fetch_size_of_pr.get_pr_insights(pr_details, size_metrics)
+    write_html_report(pr_details, file_name)
+    return True
+
+
 if __name__ == "__main__":
     start_date, end_date, repo_path = get_inputs()
+    profile_util.setup_profiling(os.path.join(reports_dir, "size_of_prs_profile.json"))
+    github_api = github_pr_data_extractor.PRDataExtractor(repo_path)
     try:
-        pr_details = fetch_size_of_pr.get_pr_details(repo_path,start_date,end_date)
+        pr_details = fetch_size_of_pr.get_pr_details(repo_path,start_date,end_date,github_api)
+        # The store and the PR files were just synced for the same range
+        size_metrics = fetch_size_of_pr.get_size_metrics(
+            repo_path, start_date, end_date, github_api, sync=False
+        )
 
     except github_pr_data_extractor.PRDataExtractionError as error:
         error_message = f"Error extracting PR details for repository '{repo_path}' between {start_date} and {end_date}: {error}"
         logger.error(error_message)
         sys.exit(1)
-    if not pr_details.empty:
-        fetch_size_of_pr.get_pr_insights(pr_details)
-        write_html_report(pr_details, html_report_path)
+    if create_report(pr_details, html_report_path, size_metrics):
         print('\nDetailed report can be found in size_of_prs_report.html\n')
\ No newline at end of file
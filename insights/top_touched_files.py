@@ -4,7 +4,7 @@ Find the most modified files in a GitHub repository within the specified time pe
 This info can help testing teams align their testing efforts accordingly.
 
 Usage:
-python top_touched_files.py
+python top_touched_files.py [--profile [JSON_PATH]]
 
 Provide the following inputs:
 Enter the start date in YYYY-MM-DD format (eg: 2023-02-01)
@@ -27,7 +27,7 @@ import os
 import sys
 from datetime import datetime
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils import logger_util
+from utils import logger_util, profile_util, report_writer
 from modules import fetch_most_modified_files
 
 logger_util.setup_logging()
@@ -112,20 +112,28 @@ def write_html_report(file_info_df, file_name):
         None
     """
     try:
-        with open(file_name, "w", encoding="utf-8") as file:
-            if file_info_df.empty:
-                message = "No data available between the specified dates."
-                file.write(message)
-            else:
-                html = file_info_df.to_html(index=False)
-                file.write(html)
+        with profile_util.span("html.render"):
+            report_writer.write_html_report(file_info_df, file_name)
     except (FileNotFoundError, PermissionError) as report_error:
         logger.error("An error occurred while writing the HTML report: %s", report_error)
         sys.exit(1)
 
 
+def create_report(top_files_df, start_date, end_date, file_name):
+    """
+    Prints the insights on the top files and writes the HTML report.
+    """
+    if top_files_df.empty:
+        print(f"\n No data found betweent the specified dates : {start_date} and {end_date}")
+    else:
+        insights = fetch_most_modified_files.get_insights(top_files_df, start_date, end_date)
+        print(insights)
+    write_html_report(top_files_df, file_name)
+
+
 if __name__ == "__main__":
     start_date, end_date, repo_path, branch, file_type = get_inputs()
+    profile_util.setup_profiling(os.path.join(reports_dir, "top_touched_files_profile.json"))
     try:
         top_files_df = fetch_most_modified_files.find_top_files(
             repo_path, start_date, end_date, file_type, branch
@@ -135,10 +143,5 @@ if __name__ == "__main__":
         logger.error(error_message)
         sys.exit(1)
 
-    if top_files_df.empty:
-        print(f"\n No data found betweent the specified dates : {start_date} and {end_date}")
-    else:
-        insights = fetch_most_modified_files.get_insights(top_files_df, start_date, end_date)
-        print(insights)
-    write_html_report(top_files_df, html_report_path)
+    create_report(top_files_df, start_date, end_date, html_report_path)
     print('\nDetailed report can be found in top_touched_files_report.html\n')
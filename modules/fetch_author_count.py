@@ -5,9 +5,14 @@ in a Git repository within a specified date range.
 import sys
 import os
 from datetime import datetime
-from pydriller import Repository
 import pandas as pd
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from helpers.commit_cache import CommitCacheError
+from helpers.commit_scanner import CommitAggregator, CommitScanner
+from helpers.git_log_parser import GitLogError
+from helpers.interned_stats import FileAuthorStats
+from helpers.repo_mirror import RepoMirrorError
+from helpers.rollup_index import RollupIndexError
 from utils import logger_util
 
 logger = logger_util.get_logger('root')
@@ -17,13 +22,74 @@ class FetchDataError(Exception):
     def __init__(self, message):
         super().__init__(message)
 
-def get_contributors_info(repo_path, start_date, end_date):
+class AuthorCountAggregator(CommitAggregator):
+    """
+    Collects the authors and the number of modified lines of every file.
+    Files and authors are interned to integer ids, and the statistics are kept in arrays.
+    """
+
+    def __init__(self):
+        self.stats = FileAuthorStats()
+
+    def process(self, commit):
+        intern_file = self.stats.files.intern
+        self.stats.add_many(
+            [intern_file(modified_file.filename) for modified_file in commit.files],
+            self.stats.authors.intern(commit.author),
+            [
+                modified_file.added_lines + modified_file.deleted_lines
+                for modified_file in commit.files
+            ],
+        )
+
+    def process_rollup(self, rollup):
+        file_ids = self.stats.files.intern_all(rollup.files)
+        self.stats.add_totals(
+            file_ids,
+            rollup.touches,
+            rollup.lines,
+            file_ids[[file_index for file_index, _ in rollup.pairs]],
+            self.stats.authors.intern_all([author for _, author in rollup.pairs]),
+        )
+
+    def merge(self, other):
+        self.stats.merge(other.stats)
+
+    def result(self):
+        """
+        Returns:
+            pandas.DataFrame: A DataFrame that contains the contributors' information
+        """
+        file_names = self.stats.files.values
+        if not file_names:
+            return pd.DataFrame()
+        authors = self.stats.get_authors()
+        contributors_df = pd.DataFrame(
+            {
+                'File Name': file_names,
+                'Authors': authors,
+                'No of Authors': [len(file_authors) for file_authors in authors],
+                'Modifications': self.stats.get_lines(),
+            },
+            index=file_names,
+        )
+        return contributors_df
+
+
+def get_contributors_info(
+    repo_path, start_date, end_date, use_cache=True, workers=None, backend=None
+):
     """
     Fetches the contributors' information for a given repository within a specific date range.
     Args:
         repo_path (str): The path to the repository to be analyzed.
         start_date (str): The start date of the analysis in the format 'YYYY-MM-DD'.
         end_date (str): The end date of the analysis in the format 'YYYY-MM-DD'.
+        use_cache (bool): Whether to reuse the per-commit stats cached by earlier runs.
+        workers (int, optional): The number of processes mining the commits.
+        backend (str, optional): "pydriller", "git" or "rollup". The "git" backend reads the
+        line counts from git log --numstat, which is much faster on large repositories.
+        The "rollup" backend answers from the day buckets of the rollup index.
 
     Returns:
         pandas.DataFrame: A DataFrame that contains the contributors' information
@@ -32,34 +98,15 @@ def get_contributors_info(repo_path, start_date, end_date):
         start_date = datetime.strptime(start_date, '%Y-%m-%d')
         end_date = datetime.strptime(end_date, '%Y-%m-%d')
 
-        authors_dict = {}
-
-        modifications_dict = {}
-
-        for commit in Repository(repo_path, since=start_date, to=end_date).traverse_commits():
-            for modified_file in commit.modified_files:
-                file_name = modified_file.filename
-                if modified_file.filename not in authors_dict:
-                    authors_dict[modified_file.filename] = set()
-                authors_dict[modified_file.filename].add(commit.author.name)
-
-                if file_name not in modifications_dict:
-                    modifications_dict[file_name] = 0
-                modifications_dict[file_name] += \
-                    modified_file.added_lines + \
-                    modified_file.deleted_lines
-
-
-        contributors_dict = {}
-        for file, authors in authors_dict.items():
-            modifications = modifications_dict[file]
-            contributors_dict[file] = {
-                'File Name': file,
-                'Authors': ', '.join(authors),
-                'No of Authors': len(authors),
-                'Modifications' : modifications
-            }
-        contributors_df = pd.DataFrame.from_dict(contributors_dict, orient='index')
+        scanner = CommitScanner(
+            repo_path,
+            since=start_date,
+            to=end_date,
+            use_cache=use_cache,
+            workers=workers,
+            backend=backend,
+        )
+        contributors_df, = scanner.run(AuthorCountAggregator())
         return contributors_df
 
     except ValueError as value_error:
@@ -68,4 +115,6 @@ def get_contributors_info(repo_path, start_date, end_date):
     except KeyError as key_error:
         logger.exception("Error while fetching data %s", key_error)
         raise FetchDataError("Error while fetching data:") from key_error
-
+    except (CommitCacheError, GitLogError, RepoMirrorError, RollupIndexError) as git_error:
+        logger.exception("Error while fetching data %s", git_error)
+        raise FetchDataError("Error while fetching data:") from git_error
@@ -6,13 +6,17 @@ start_date, end_date, repo, branch, file_type
 import sys
 import os
 from typing import Optional
-import heapq
-from collections import defaultdict
+import numpy as np
 import pandas as pd
 from git.exc import GitCommandError, NoSuchPathError
-from pydriller import Repository
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils import logger_util
+from helpers.commit_cache import CommitCacheError
+from helpers.commit_scanner import CommitAggregator, CommitScanner
+from helpers.git_log_parser import GitLogError
+from helpers.interned_stats import FileAuthorStats
+from helpers.repo_mirror import RepoMirrorError
+from helpers.rollup_index import RollupIndexError
+from utils import analytics_util, logger_util
 
 logger = logger_util.get_logger("root")
 
@@ -20,6 +24,129 @@ logger = logger_util.get_logger("root")
 class FetchFilesDataError(Exception):
     "To catch exceptions raised when accessing PyDriller methods"
 
+def is_not_older(date, last_date):
+    """
+    Checks if a modification dated `date` replaces the last modification of a file,
+    dated `last_date`: when it is not older, or when neither has a date, the later one
+    in traversal order wins. A modification without a date never replaces a dated one.
+    """
+    if date is None:
+        return last_date is None
+    return last_date is None or date >= last_date
+
+
+class TopFilesAggregator(CommitAggregator):
+    """
+    Counts the modifications of every file and keeps the details of the top files.
+    Files and authors are interned to integer ids: the counts and the authors are kept
+    in arrays, and only the details of the last modification of every file are kept.
+    Complexity is only computed for the top files, at the commit that last modified them.
+    """
+
+    def __init__(self, file_type: Optional[str] = None, num_files: int = 5):
+        self.file_type = file_type
+        self.num_files = num_files
+        self.stats = FileAuthorStats()
+        # The details of the last modification of every file, by file id
+        self.last_msgs = []
+        self.last_dates = []
+        self.last_changes = []
+        self.top_files = []
+        self.complexities = []
+
+    def is_matching_file(self, file_name):
+        "Checks if the file has the requested file type"
+        return not self.file_type or file_name.endswith(self.file_type)
+
+    def process(self, commit):
+        intern_file = self.stats.files.intern
+        file_ids = []
+        for file in commit.files:
+            file_name = file.filename
+            if self.is_matching_file(file_name):
+                file_id = intern_file(file_name)
+                if file_id == len(self.last_msgs):
+                    self.last_msgs.append(None)
+                    self.last_dates.append(None)
+                    self.last_changes.append(None)
+                # The last modification is the latest by commit date, with its message
+                if is_not_older(commit.committer_date, self.last_dates[file_id]):
+                    self.last_msgs[file_id] = commit.msg
+                    self.last_dates[file_id] = commit.committer_date
+                    self.last_changes[file_id] = (commit.hash, file.path)
+                file_ids.append(file_id)
+        if file_ids:
+            self.stats.add_many(file_ids, self.stats.authors.intern(commit.author))
+
+    def process_rollup(self, rollup):
+        indexes = [
+            index for index, file_name in enumerate(rollup.files)
+            if self.is_matching_file(file_name)
+        ]
+        file_ids = self.stats.files.intern_all([rollup.files[index] for index in indexes])
+        file_map = dict(zip(indexes, file_ids.tolist()))
+        missing = len(self.stats.files) - len(self.last_msgs)
+        self.last_msgs.extend([None] * missing)
+        self.last_dates.extend([None] * missing)
+        self.last_changes.extend([None] * missing)
+        for index, file_id in file_map.items():
+            self.last_msgs[file_id] = rollup.last_msgs[index]
+            self.last_dates[file_id] = rollup.last_dates[index]
+            self.last_changes[file_id] = rollup.last_changes[index]
+        pairs = [(file_index, author) for file_index, author in rollup.pairs
+                 if file_index in file_map]
+        self.stats.add_totals(
+            file_ids,
+            [rollup.touches[index] for index in indexes],
+            [rollup.lines[index] for index in indexes],
+            np.array([file_map[file_index] for file_index, _ in pairs], dtype=np.int64),
+            self.stats.authors.intern_all([author for _, author in pairs]),
+        )
+
+    def merge(self, other):
+        file_map = self.stats.merge(other.stats)
+        missing = len(self.stats.files) - len(self.last_msgs)
+        self.last_msgs.extend([None] * missing)
+        self.last_dates.extend([None] * missing)
+        self.last_changes.extend([None] * missing)
+        for other_id, file_id in enumerate(file_map.tolist()):
+            # The later shard wins the ties, like in a serial scan
+            if is_not_older(other.last_dates[other_id], self.last_dates[file_id]):
+                self.last_msgs[file_id] = other.last_msgs[other_id]
+                self.last_dates[file_id] = other.last_dates[other_id]
+                self.last_changes[file_id] = other.last_changes[other_id]
+
+    def finalize(self, scanner):
+        counts = self.stats.get_counts()
+        # A stable sort keeps the files with the same count in the order they were seen
+        self.top_files = np.argsort(-counts, kind="stable")[:self.num_files].tolist()
+        self.complexities = scanner.file_complexities(
+            [self.last_changes[file_id] for file_id in self.top_files]
+        )
+
+    def result(self):
+        """
+        Returns:
+            DataFrame: A dataframe containing the info of the top files.
+        """
+        data = []
+        counts = self.stats.get_counts()
+        authors = self.stats.get_authors(self.top_files)
+
+        for file_id, file_authors, complexity in zip(self.top_files, authors, self.complexities):
+            file_dict = {
+                "File": self.stats.files.values[file_id],
+                "Count": counts[file_id],
+                "Complexity": complexity,
+                "Authors": file_authors,
+                "Last Commit Message": self.last_msgs[file_id],
+                "Last Commit Date": self.last_dates[file_id].strftime("%Y-%m-%d %H:%M:%S"),
+            }
+            data.append(file_dict)
+
+        return pd.DataFrame(data)
+
+
 def find_top_files(
     repo_path: str,
     start_date: str,
@@ -27,6 +154,9 @@ def find_top_files(
     file_type: Optional[str],
     branch: str,
     num_files: int = 5,
+    use_cache: bool = True,
+    workers: Optional[int] = None,
+    backend: Optional[str] = None,
 ):
     """
     Find the top files in a repository based on the number of modifications.
@@ -37,51 +167,29 @@ def find_top_files(
         end_date (str): The end date for filtering commits.
         branch (str): The branch to consider for commits.
         file_type (str, optional): The file type to filter. Defaults to None.
+        num_files (int): The number of top files to return. Defaults to 5.
+        use_cache (bool): Whether to reuse the per-commit stats cached by earlier runs.
+        workers (int, optional): The number of processes mining the commits.
+        backend (str, optional): "pydriller", "git" or "rollup", the engine reading the commits.
 
     Returns:
         DataFrame: A dataframe containing the file info.
     """
 
-    file_count = defaultdict(int)
-    file_info = defaultdict(
-        lambda: {"authors": set(), "messages": [], "dates": [], "complexity": None}
+    scanner = CommitScanner(
+        repo_path,
+        since=start_date,
+        to=end_date,
+        branch=branch,
+        use_cache=use_cache,
+        workers=workers,
+        backend=backend,
     )
-    commit_list = Repository(
-        repo_path, since=start_date, to=end_date, only_in_branch=branch
-    ).traverse_commits()
 
     try:
-        for commit in commit_list:
-            for file in commit.modified_files:
-                file_name = file.filename
-                if not file_type or file_name.endswith(file_type):
-                    file_info[file_name]["authors"].add(commit.author.name)
-                    if commit.committer_date is not None:
-                        date_str = commit.committer_date.strftime("%Y-%m-%d %H:%M:%S")
-                        file_info[file_name]["dates"].append(date_str)
-                    file_info[file_name]["messages"].append(commit.msg)
-                    file_info[file_name]["complexity"] = (
-                        file.complexity if not pd.isna(file.complexity) else -1
-                    )
-                    file_count[file_name] += 1
-
         pd.set_option("display.max_column", None)
 
-        top_files = heapq.nlargest(num_files, file_count.items(), key=lambda x: x[1])
-        data = []
-
-        for file, count in top_files:
-            file_dict = {
-                "File": file,
-                "Count": count,
-                "Complexity": file_info[file]["complexity"],
-                "Authors": ", ".join(file_info[file]["authors"]),
-                "Last Commit Message": file_info[file]["messages"][-1],
-                "Last Commit Date": file_info[file]["dates"][-1],
-            }
-            data.append(file_dict)
-
-        file_info_df = pd.DataFrame(data)
+        file_info_df, = scanner.run(TopFilesAggregator(file_type, num_files))
 
         return file_info_df
 
@@ -95,6 +203,11 @@ def find_top_files(
         raise FetchFilesDataError(
             f"Error occurred while extracting data. {path_error}"
         ) from path_error
+    except (CommitCacheError, GitLogError, RepoMirrorError, RollupIndexError) as git_error:
+        logger.exception("Error occured : %s", git_error)
+        raise FetchFilesDataError(
+            f"Error occurred while extracting data. {git_error}"
+        ) from git_error
     except GitCommandError as branch_error:
         if branch_error.status == 128:
             print("\nError : Incorrect branch name\n")
@@ -145,15 +258,10 @@ def get_insights(
     )
 
     # Find the author(s) who made the commits to the maximum modified file(s)
-    max_commits_authors = (
+    # Removing duplicate author names
+    max_commits_authors = analytics_util.unique_list_values(
         file_info_df.loc[file_info_df['Count'] == max_changes_count, 'Authors']
-        .to_list()
     )
-
-    # Removing duplicate author names
-    names_lists = [author_names.split(', ') for author_names in max_commits_authors]
-    author_names = [name for names_list in names_lists for name in names_list]
-    max_commits_authors = list(dict.fromkeys(author_names))
     max_commits_authors_summary = (
         f"Author(s) who made these {max_changes_count} commits are: "
         f"{max_commits_authors}"
@@ -6,17 +6,18 @@ import os
 import pandas as pd
 from helpers.github_pr_data_extractor import PRDataExtractor, PRDataExtractionError
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils import logger_util
+from helpers.pr_metrics_cube import get_mean_review_time
+from utils import analytics_util, logger_util, profile_util
 
 logger = logger_util.get_logger("userLogger")
 
-def calculate_review_time(repo_name, start_date, end_date):
+def calculate_review_time(repo_name, start_date, end_date, github_api=None):
     """
     Gets the PR review details and calculates the total review time for each PR.
     It also computes the average review time for the given time period
     """
 
-    github_api = PRDataExtractor(repo_name)
+    github_api = github_api or PRDataExtractor(repo_name)
     try:
         pr_details = github_api.get_merged_pr_details(start_date, end_date)
     except PRDataExtractionError as error:
@@ -27,34 +28,75 @@ def calculate_review_time(repo_name, start_date, end_date):
         print(f"No data found betweent the specified dates : {start_date} and {end_date}")
         return pd.DataFrame([])
 
-    pr_details["created_at"] = pd.to_datetime(pr_details["created_at"], errors="coerce")
-    pr_details["closed_at"] = pd.to_datetime(pr_details["closed_at"], errors="coerce")
-    pr_details = pr_details[pr_details["status"] == "closed"]
+    return get_review_time(pr_details)
 
-    pr_details["review_time"] = pr_details["closed_at"] - pr_details["created_at"]
+
+def get_review_time(pr_details):
+    """
+    Calculates the review time of the closed PRs of merged PR details, such as the
+    ones returned by PRDataExtractor.get_merged_pr_details. The details are modified.
+    """
+    with profile_util.span("pandas.aggregate"):
+        pr_details["created_at"] = pd.to_datetime(pr_details["created_at"], errors="coerce")
+        pr_details["closed_at"] = pd.to_datetime(pr_details["closed_at"], errors="coerce")
+        pr_details = pr_details[pr_details["status"] == "closed"]
+
+        pr_details["review_time"] = pr_details["closed_at"] - pr_details["created_at"]
 
     return pr_details
 
 
+def get_review_metrics(repo_name, start_date, end_date, github_api=None, sync=True):
+    """
+    Gets the review time metrics of the PRs merged in the given time period
+    from the PR metrics cube.
+    Returns:
+        ReviewMetrics: The metrics, or None when the PR store is not used.
+    """
+    github_api = github_api or PRDataExtractor(repo_name)
+    if not github_api.use_store:
+        return None
+    try:
+        return github_api.get_pr_metrics("review", start_date, end_date, sync)
+    except PRDataExtractionError as error:
+        logger.error(f"An error occurred while getting the review time metrics: {error}")
+        raise PRDataExtractionError("Error while getting the review time metrics") from error
+
 
-def compute_inference(review_details):
+def get_most_prs_author(authors):
+    """
+    Returns the author with the most PRs of a DataFrame of authors with their number of
+    PRs and their latest PR number. Ties go to the author of the latest PR, so the
+    PR metrics cube and the PR details give the same author.
+    """
+    return authors.sort_values(["prs", "last_pr"], ascending=False).iloc[0]["author"]
+
+
+def compute_inference(review_details, review_metrics=None):
     """
     Calculates the average review time for a set of pull requests (PRs) and
     computes inference.
 
     Args:
         review_details (DataFrame): A DataFrame containing information about pull requests
+        review_metrics (ReviewMetrics, optional): The metrics of the same pull requests
+        from the PR metrics cube, which then provide the average and the authors.
 
     Returns:
         average_review_time (float): The average review time for the pull requests.
         long_review_prs (DataFrame): A DataFrame containing information about the
         pull requests with review times longer than the average.
     """
-    try:
-        average_review_time = review_details['review_time'].mean()
-    except Exception as error:
-        logger.error(f"Error calculating average review time: {error}")
-        average_review_time = 0
+    if review_metrics is not None:
+        average_review_time = get_mean_review_time(
+            review_metrics.prs, review_metrics.review_seconds
+        )
+    else:
+        try:
+            average_review_time = review_details['review_time'].mean()
+        except Exception as error:
+            logger.error(f"Error calculating average review time: {error}")
+            average_review_time = 0
 
     print("\nInsights for the timeperiod :")
 
@@ -64,15 +106,30 @@ def compute_inference(review_details):
 
     if not long_review_prs.empty:
         print("\n -> The following PRs took longer than average time:")
-        for index, row in long_review_prs.iterrows():
-            print(f" ** PR #{row['pr_number']}: {row['pr_title']} - Review Time: {row['review_time']}")
+        long_review_lines = analytics_util.concat_columns(
+            " ** PR #", long_review_prs['pr_number'], ": ", long_review_prs['pr_title'],
+            " - Review Time: ", long_review_prs['review_time'],
+        )
+        print("\n".join(long_review_lines))
             
-    # Find the author with the most reviews
-    most_reviews_author = review_details['author'].value_counts().idxmax()
+    if review_metrics is not None:
+        authors = review_metrics.authors
+        most_reviews_author = get_most_prs_author(authors)
+        avg_time_by_author = pd.Series(
+            [get_mean_review_time(prs, seconds)
+             for prs, seconds in zip(authors["prs"], authors["review_seconds"])],
+            index=authors["author"],
+        )
+    else:
+        # Find the author with the most reviews
+        most_reviews_author = get_most_prs_author(
+            review_details.groupby("author")["pr_number"].agg(prs="size", last_pr="max")
+            .reset_index()
+        )
+        # Find the author with the most average review time
+        avg_time_by_author = review_details.groupby("author")["review_time"].mean()
     print(f"\n -> Author with the most PR's': {most_reviews_author}")
 
-    # Find the author with the most average review time
-    avg_time_by_author = review_details.groupby("author")["review_time"].mean()
     most_avg_time_author = avg_time_by_author.idxmax()
     print(
         "\n -> Author with the highest average review time: ", most_avg_time_author
@@ -2,7 +2,11 @@
 This script collects merge activity data
 """
 
+import os
+import sys
 import pandas as pd
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import analytics_util, profile_util
 
 def get_merge_activity_details(merge_activity_df):
     """
@@ -15,27 +19,13 @@ def get_merge_activity_details(merge_activity_df):
     - analyzed_df (DataFrame): DataFrame with detailed analysis results.
     """
 
-    merge_activity_df['created_at'] = pd.to_datetime(merge_activity_df['created_at'])
-    merge_activity_df['closed_at'] = pd.to_datetime(merge_activity_df['closed_at'])
+    with profile_util.span("pandas.aggregate"):
+        merge_activity_df['created_at'] = pd.to_datetime(merge_activity_df['created_at'])
+        merge_activity_df['closed_at'] = pd.to_datetime(merge_activity_df['closed_at'])
 
-    merge_activity_df['day_of_week'] = merge_activity_df['closed_at'].dt.dayofweek
-    merge_activity_df['month'] = merge_activity_df['closed_at'].dt.strftime('%Y-%B')
-
-    grouped_by_month_day = merge_activity_df.groupby(['month', 'day_of_week']).size()
-    monthly_day_of_week_counts = grouped_by_month_day.unstack(fill_value=0)
-
-    # Define the days of the week for display
-    days_of_week = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-
-    analyzed_data = []
-    for month, data in monthly_day_of_week_counts.iterrows():
-        for day, count in data.items():
-            analyzed_data.append({
-            "Month": month,
-            "Day_of_Week": days_of_week[day],
-            "Merges": count
-        })
-    analyzed_df = pd.DataFrame(analyzed_data)
+        analyzed_df = analytics_util.count_by_month_and_weekday(
+            merge_activity_df['closed_at'], count_column="Merges"
+        )
 
     #Find and display insights
 
@@ -6,24 +6,42 @@ import os
 import pandas as pd
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from helpers.github_pr_data_extractor import PRDataExtractor, PRDataExtractionError
-from utils import logger_util
+from utils import logger_util, profile_util
 
 logger = logger_util.get_logger("root")
 
 
-def get_pr_details(repo_name, start_date, end_date):
+def get_pr_details(repo_name, start_date, end_date, github_api=None):
     """
     Gets the PR review details
     """
 
     try:
-        github_api = PRDataExtractor(repo_name)
+        github_api = github_api or PRDataExtractor(repo_name)
         pr_details = github_api.get_pr_files_details(start_date, end_date)
         if pr_details.empty:
             print(
                 f"No data found betweent the specified dates : {start_date} and {end_date}"
             )
             return pd.DataFrame([])
+        return get_pr_size(pr_details)
+
+    except ValueError as value_error:
+        logger.exception("An error occured while extracting PR data %s", value_error)
+        raise PRDataExtractionError("Error while extracting PR data") from value_error
+    except KeyError as key_error:
+        logger.exception("An error occured while extracting PR data %s", key_error)
+        raise PRDataExtractionError("Error while extracting PR data") from key_error
+    except PRDataExtractionError as error:
+        logger.exception("An error occured while extracting PR data %s", error)
+        raise PRDataExtractionError("Error while extracting PR data") from error
+
+def get_pr_size(pr_details):
+    """
+    Counts the files and the changed lines of every PR of PR files details, such as the
+    ones returned by PRDataExtractor.get_pr_files_details.
+    """
+    with profile_util.span("pandas.aggregate"):
         grouped_pr_details = (
             pr_details.groupby("pr_number")
             .agg(
@@ -34,28 +52,46 @@ def get_pr_details(repo_name, start_date, end_date):
             )
             .reset_index()
         )
-        grouped_pr_details.columns = [
-            "pr_number",
-            "num_files_changed",
-            "total_lines_changed",
-        ]
-        return grouped_pr_details
+    grouped_pr_details.columns = [
+        "pr_number",
+        "num_files_changed",
+        "total_lines_changed",
+    ]
+    return grouped_pr_details
 
-    except ValueError as value_error:
-        logger.exception("An error occured while extracting PR data %s", value_error)
-        raise PRDataExtractionError("Error while extracting PR data") from value_error
-    except KeyError as key_error:
-        logger.exception("An error occured while extracting PR data %s", key_error)
-        raise PRDataExtractionError("Error while extracting PR data") from key_error
+def get_size_metrics(repo_name, start_date, end_date, github_api=None, sync=True):
+    """
+    Gets the size metrics of the PRs created in the given time period
+    from the PR metrics cube.
+    Returns:
+        SizeMetrics: The metrics, or None when the PR store is not used.
+    """
+    github_api = github_api or PRDataExtractor(repo_name)
+    if not github_api.use_store:
+        return None
+    try:
+        return github_api.get_pr_metrics("size", start_date, end_date, sync)
     except PRDataExtractionError as error:
-        logger.exception("An error occured while extracting PR data %s", error)
-        raise PRDataExtractionError("Error while extracting PR data") from error
+        logger.exception("An error occured while getting the PR size metrics %s", error)
+        raise PRDataExtractionError("Error while getting the PR size metrics") from error
 
-def get_pr_insights(pr_details):
-    "PR insights"
-    number_of_lines_changed = pr_details.loc[pr_details["total_lines_changed"].idxmax()]
-    pr_number = number_of_lines_changed["pr_number"]
-    total_lines_changed = number_of_lines_changed["total_lines_changed"]
+def get_pr_insights(pr_details, size_metrics=None):
+    """
+    PR insights. The PRs with the most changed lines and files are taken from the
+    size metrics of the same PRs when they are given.
+    """
+    if size_metrics is not None:
+        pr_number = size_metrics.max_lines_pr
+        total_lines_changed = size_metrics.max_lines_changed
+        pr_number_files = size_metrics.max_files_pr
+        num_files_changed = size_metrics.max_files_changed
+    else:
+        number_of_lines_changed = pr_details.loc[pr_details["total_lines_changed"].idxmax()]
+        pr_number = number_of_lines_changed["pr_number"]
+        total_lines_changed = number_of_lines_changed["total_lines_changed"]
+        number_of_files_changed = pr_details.loc[pr_details["num_files_changed"].idxmax()]
+        pr_number_files = number_of_files_changed["pr_number"]
+        num_files_changed = number_of_files_changed["num_files_changed"]
 
     # Framing inferences
     lines_message = (
@@ -65,10 +101,6 @@ def get_pr_insights(pr_details):
     print("\nInsights for the time period:")
     print(lines_message)
 
-    number_of_files_changed = pr_details.loc[pr_details["num_files_changed"].idxmax()]
-    pr_number_files = number_of_files_changed["pr_number"]
-    num_files_changed = number_of_files_changed["num_files_changed"]
-
     files_message = (
         f"\n -> The PR#{pr_number_files} has maximum number of files changed: "
         f"{num_files_changed} changes."
@@ -0,0 +1,63 @@
+"""
+Fixtures shared by the tests: a small local repository whose commits have known
+authors, files and dates, and a cache directory of their own.
+"""
+
+import os
+import sys
+import subprocess
+import pytest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# (author, committer date, {path: content}, renamed paths as (old, new))
+FIXTURE_COMMITS = [
+    ("Alice", "2023-01-01T00:00:00+00:00", {"README.md": "readme\n", "src/app.py": "a = 1\n"}, []),
+    ("Bob", "2023-01-01T00:00:01+00:00", {"src/app.py": "a = 1\nb = 2\n"}, []),
+    ("Alice", "2023-01-01T23:59:59+00:00", {'docs/say "hi".txt': "hi\n"}, []),
+    ("Carol", "2023-01-02T00:00:00+00:00", {"src/util.py": "def f():\n    return 1\n"}, []),
+    ("Bob", "2023-01-02T12:00:00+00:00", {}, [("src/util.py", "lib/util.py")]),
+    ("Carol", "2023-01-02T12:30:00+00:00", {"lib/util.py": "def f():\n    return 2\n"}, []),
+    ("Alice", "2023-01-03T00:00:00+00:00", {"README.md": "readme\nmore\n"}, []),
+    ("Bob", "2023-01-03T09:00:00-05:00", {"src/app.py": "a = 3\n"}, []),
+    # Committed last, but dated before the previous commit
+    ("Carol", "2023-01-03T06:00:00+00:00", {"src/app.py": "a = 4\n"}, []),
+]
+
+
+def run_git(repo_path, *arguments, env=None):
+    "Runs a git command in the fixture repository"
+    subprocess.run(
+        ["git", "-C", str(repo_path)] + list(arguments),
+        check=True, capture_output=True, env=env,
+    )
+
+
+@pytest.fixture(name="cache_dir")
+def use_cache_dir(tmp_path, monkeypatch):
+    "Keeps the caches and indexes of a test in its own directory"
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setenv("GITLOG_INSIGHTS_CACHE_DIR", str(cache_dir))
+    return cache_dir
+
+
+@pytest.fixture(name="fixture_repo", scope="session")
+def make_fixture_repo(tmp_path_factory):
+    "Creates a repository with the FIXTURE_COMMITS, and returns its path"
+    repo_path = tmp_path_factory.mktemp("fixture_repo")
+    run_git(repo_path, "init", "--quiet", "--initial-branch=main")
+    for author, date, files, renames in FIXTURE_COMMITS:
+        for old_path, new_path in renames:
+            os.makedirs(repo_path / os.path.dirname(new_path), exist_ok=True)
+            run_git(repo_path, "mv", old_path, new_path)
+        for path, content in files.items():
+            os.makedirs(repo_path / os.path.dirname(path), exist_ok=True)
+            (repo_path / path).write_text(content, encoding="utf-8")
+            run_git(repo_path, "add", path)
+        env = dict(
+            os.environ,
+            GIT_AUTHOR_NAME=author, GIT_AUTHOR_EMAIL=f"{author.lower()}@example.com",
+            GIT_COMMITTER_NAME=author, GIT_COMMITTER_EMAIL=f"{author.lower()}@example.com",
+            GIT_AUTHOR_DATE=date, GIT_COMMITTER_DATE=date,
+        )
+        run_git(repo_path, "commit", "--quiet", "-m", f"Commit by {author} at {date}", env=env)
+    return str(repo_path)
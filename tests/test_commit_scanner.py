@@ -0,0 +1,105 @@
+"""
+Tests that the backends of the commit scanner give the same insights.
+"""
+
+from datetime import datetime
+import pytest
+from helpers.commit_scanner import CommitAggregator, CommitScanner
+from modules.fetch_author_count import AuthorCountAggregator
+from modules.fetch_most_modified_files import TopFilesAggregator
+from utils import profile_util
+
+# The rollup index only answers ranges between midnights, both included
+RANGES = [
+    (datetime(2023, 1, 1), datetime(2023, 1, 4)),
+    (datetime(2023, 1, 1), datetime(2023, 1, 2)),
+    (datetime(2023, 1, 2), datetime(2023, 1, 3)),
+    (datetime(2023, 1, 3), datetime(2023, 1, 3)),
+]
+
+
+class CountAggregator(CommitAggregator):
+    "Counts the commits, without supporting the parallel and the rollup backends"
+
+    def __init__(self):
+        self.num_commits = 0
+
+    def process(self, commit):
+        self.num_commits += 1
+
+    def result(self):
+        return self.num_commits
+
+
+def scan(repo_path, since, to, backend, workers=1, use_cache=False):
+    "Runs the insights of the Git based aggregators with a backend"
+    contributors, top_files, top_python_files = CommitScanner(
+        repo_path, since, to, use_cache=use_cache, workers=workers, backend=backend
+    ).run(AuthorCountAggregator(), TopFilesAggregator(), TopFilesAggregator(".py", 2))
+    return contributors.to_json(), top_files.to_json(), top_python_files.to_json()
+
+
+@pytest.mark.usefixtures("cache_dir")
+@pytest.mark.parametrize("since, to", RANGES)
+def test_backends_give_the_same_insights(fixture_repo, since, to):
+    expected = scan(fixture_repo, since, to, "pydriller")
+    assert scan(fixture_repo, since, to, "git") == expected
+    assert scan(fixture_repo, since, to, "rollup") == expected
+
+
+@pytest.mark.usefixtures("cache_dir")
+@pytest.mark.parametrize("backend, workers", [
+    ("pydriller", 1), ("pydriller", 2), ("git", 1), ("rollup", 1),
+])
+def test_last_modification_is_the_latest_by_commit_date(fixture_repo, backend, workers):
+    since, to = RANGES[0]
+    _, top_files = CommitScanner(
+        fixture_repo, since, to, use_cache=False, workers=workers, backend=backend
+    ).run(CountAggregator(), TopFilesAggregator(".py", 1))
+    # app.py was last committed by Carol, with a date before the commit of Bob
+    assert top_files.to_dict("records")[0] == {
+        "File": "app.py", "Count": 4, "Complexity": 0, "Authors": ["Alice", "Bob", "Carol"],
+        "Last Commit Message": "Commit by Bob at 2023-01-03T09:00:00-05:00",
+        "Last Commit Date": "2023-01-03 09:00:00",
+    }
+
+
+@pytest.mark.usefixtures("cache_dir")
+def test_parallel_scan_gives_the_same_insights(fixture_repo):
+    since, to = RANGES[0]
+    expected = scan(fixture_repo, since, to, "pydriller")
+    assert scan(fixture_repo, since, to, "pydriller", workers=2) == expected
+
+
+@pytest.mark.usefixtures("cache_dir")
+@pytest.mark.parametrize("backend, workers", [("pydriller", 2), ("rollup", 1)])
+def test_aggregators_without_optional_capabilities(fixture_repo, backend, workers):
+    since, to = RANGES[0]
+    num_commits, _ = CommitScanner(
+        fixture_repo, since, to, use_cache=False, workers=workers, backend=backend
+    ).run(CountAggregator(), AuthorCountAggregator())
+    assert num_commits == 9
+
+
+def test_aggregators_must_implement_process_and_result():
+    with pytest.raises(TypeError):
+        CommitAggregator()  # pylint: disable=abstract-class-instantiated
+
+
+@pytest.mark.usefixtures("cache_dir")
+def test_git_backend_caches_the_complexity_of_the_top_files(fixture_repo):
+    since, to = RANGES[0]
+    counters = []
+    profile_util.enable()
+    try:
+        for _ in range(2):
+            results = scan(fixture_repo, since, to, "git", use_cache=True)
+            counters.append(profile_util.take_snapshot()["counters"])
+    finally:
+        profile_util.disable()
+    assert results == scan(fixture_repo, since, to, "pydriller")
+    assert counters[0]["complexity.computed"] > 0
+    assert "complexity.computed" not in counters[1]
+    assert counters[1]["complexity.cache_hits"] == (
+        counters[0]["complexity.computed"] + counters[0].get("complexity.cache_hits", 0)
+    )
@@ -0,0 +1,81 @@
+"""
+Tests of the parsing of the git log --numstat output.
+"""
+
+from helpers.git_log_parser import (
+    iter_numstat_commits, parse_numstat_line, parse_numstat_log, parse_renamed_path,
+    unquote_path,
+)
+
+
+def test_parse_renamed_path_of_a_whole_path():
+    assert parse_renamed_path("old.py => new.py") == "new.py"
+    assert parse_renamed_path("src/old.py => lib/new.py") == "lib/new.py"
+
+
+def test_parse_renamed_path_of_a_part_of_the_path():
+    assert parse_renamed_path("src/{old => new}/app.py") == "src/new/app.py"
+    assert parse_renamed_path("src/{old.py => new.py}") == "src/new.py"
+
+
+def test_parse_renamed_path_into_or_out_of_a_directory():
+    assert parse_renamed_path("src/{ => lib}/app.py") == "src/lib/app.py"
+    assert parse_renamed_path("src/{lib => }/app.py") == "src/app.py"
+
+
+def test_parse_renamed_path_keeps_other_paths():
+    assert parse_renamed_path("src/app.py") == "src/app.py"
+    assert parse_renamed_path("a{b}c.py") == "a{b}c.py"
+
+
+def test_unquote_path_decodes_escapes():
+    assert unquote_path('"say \\"hi\\".txt"') == 'say "hi".txt'
+    assert unquote_path('"tab\\there.txt"') == "tab\there.txt"
+    assert unquote_path('"back\\\\slash.txt"') == "back\\slash.txt"
+
+
+def test_unquote_path_decodes_utf8_octal_escapes():
+    assert unquote_path('"caf\\303\\251.py"') == "café.py"
+
+
+def test_unquote_path_keeps_unquoted_paths():
+    assert unquote_path("plain.py") == "plain.py"
+    assert unquote_path('"half.py') == '"half.py'
+
+
+def test_parse_numstat_line_of_a_quoted_renamed_path():
+    file_stats = parse_numstat_line('3\t1\t"docs/{a.txt => say \\"hi\\".txt}"')
+    assert file_stats.filename == 'say "hi".txt'
+    assert file_stats.path == 'docs/say "hi".txt'
+    assert (file_stats.added_lines, file_stats.deleted_lines) == (3, 1)
+
+
+def test_parse_numstat_line_of_a_binary_file():
+    file_stats = parse_numstat_line("-\t-\timage.png")
+    assert (file_stats.added_lines, file_stats.deleted_lines) == (0, 0)
+
+
+def test_parse_numstat_log_of_commits_with_and_without_files():
+    lines = [
+        "\x1eaaa\x1fAlice\x1f2023-01-01T00:00:00+00:00\x1fFirst\n",
+        "\n",
+        "body\x1d\n",
+        "\n",
+        "1\t0\tREADME.md\n",
+        "2\t2\tsrc/{old => new}/app.py\n",
+        "\x1ebbb\x1fBob\x1f2023-01-02T10:00:00+02:00\x1fMerge\x1d\n",
+    ]
+    first, second = parse_numstat_log(lines)
+    assert (first.hash, first.author, first.msg) == ("aaa", "Alice", "First\n\nbody")
+    assert [file.path for file in first.files] == ["README.md", "src/new/app.py"]
+    assert second.hash == "bbb"
+    assert second.committer_date.isoformat() == "2023-01-02T10:00:00+02:00"
+    assert not second.files
+
+
+def test_iter_numstat_commits_reads_renames_and_quoted_paths(fixture_repo):
+    commits = list(iter_numstat_commits(fixture_repo))
+    assert [commit.author for commit in commits][:3] == ["Alice", "Bob", "Alice"]
+    assert [file.path for file in commits[2].files] == ['docs/say "hi".txt']
+    assert [file.path for file in commits[4].files] == ["lib/util.py"]
+    assert [(file.added_lines, file.deleted_lines) for file in commits[4].files] == [(0, 0)]
@@ -0,0 +1,110 @@
+"""
+Tests of the reading of merged pull requests from the merge and squash commits.
+"""
+
+import os
+import pytest
+from helpers.git_merge_data_extractor import (
+    GitMergeDataExtractor, get_login, get_merged_pr, parse_merge_log,
+)
+from conftest import run_git
+
+
+def test_get_merged_pr_of_a_merge_commit():
+    assert get_merged_pr(
+        "Merge pull request #12 from alice/fix-login", "\nFix the login\n\nDetails", "bob"
+    ) == (12, "Fix the login", None)
+    # Without a title in the body, the branch stands for it
+    assert get_merged_pr("Merge pull request #12 from alice/fix-login", "", "bob") == (
+        12, "fix-login", None
+    )
+
+
+def test_get_merged_pr_of_a_squash_commit():
+    assert get_merged_pr("Fix the login (#12)", "", "alice") == (12, "Fix the login", "alice")
+    assert get_merged_pr("Fix (#3) and (#12)", "", "alice") == (12, "Fix (#3) and", "alice")
+
+
+def test_get_merged_pr_of_other_commits():
+    assert get_merged_pr("Fix the login", "", "alice") is None
+    assert get_merged_pr("Fix #12", "", "alice") is None
+    assert get_merged_pr("Merge branch 'main' into fix", "", "alice") is None
+
+
+def test_get_login_of_noreply_emails():
+    assert get_login("Alice Smith", "12345+alice@users.noreply.github.com") == "alice"
+    assert get_login("Alice Smith", "alice@users.noreply.github.com") == "alice"
+    assert get_login("Alice Smith", "alice@example.com") == "Alice Smith"
+
+
+def test_parse_merge_log_of_multiline_messages():
+    lines = [
+        "\x1eaaa\x1fAlice\x1fa@x\x1f2023-01-01T10:00:00+00:00\x1f"
+        "2023-01-02T10:00:00+00:00\x1fMerge pull request #1 from a/b\n",
+        "\n",
+        "Title\x1d\n",
+        "\x1ebbb\x1fBob\x1fb@x\x1f2023-01-03T10:00:00+00:00\x1f"
+        "2023-01-03T10:00:00+00:00\x1fSquash (#2)\x1d\n",
+    ]
+    assert list(parse_merge_log(lines)) == [
+        ("aaa", "Alice", "a@x", "2023-01-01T10:00:00+00:00", "2023-01-02T10:00:00+00:00",
+         "Merge pull request #1 from a/b\n\nTitle"),
+        ("bbb", "Bob", "b@x", "2023-01-03T10:00:00+00:00", "2023-01-03T10:00:00+00:00",
+         "Squash (#2)"),
+    ]
+
+
+def commit(repo_path, message, date, email="alice@example.com", *arguments):
+    "Commits a change of the repository, or a merge with the given arguments"
+    env = dict(
+        os.environ, GIT_AUTHOR_NAME="Alice", GIT_AUTHOR_EMAIL=email,
+        GIT_COMMITTER_NAME="Alice", GIT_COMMITTER_EMAIL=email,
+        GIT_AUTHOR_DATE=date, GIT_COMMITTER_DATE=date,
+    )
+    if arguments:
+        run_git(repo_path, *arguments, "-m", message, env=env)
+        return
+    with open(os.path.join(repo_path, "file.txt"), "a", encoding="utf-8") as file:
+        file.write(f"{message}\n")
+    run_git(repo_path, "add", "file.txt")
+    run_git(repo_path, "commit", "--quiet", "-m", message, env=env)
+
+
+@pytest.fixture(name="merge_repo", scope="module")
+def make_merge_repo(tmp_path_factory):
+    "Creates a repository with merge and squash commits, and returns its path"
+    repo_path = str(tmp_path_factory.mktemp("merge_repo"))
+    run_git(repo_path, "init", "--quiet", "--initial-branch=main")
+    commit(repo_path, "Initial commit", "2023-01-01T08:00:00+00:00")
+    run_git(repo_path, "checkout", "--quiet", "-b", "feature")
+    commit(repo_path, "Work on the feature", "2023-01-02T08:00:00+00:00")
+    run_git(repo_path, "checkout", "--quiet", "main")
+    commit(repo_path, "Merge pull request #1 from alice/feature\n\nAdd the feature",
+           "2023-01-02T20:00:00-05:00", "alice@example.com", "merge", "--no-ff", "--quiet",
+           "feature")
+    commit(repo_path, "Fix the bug (#2)", "2023-01-04T10:00:00+00:00",
+           "123+bob@users.noreply.github.com")
+    # A cherry-pick of the same PR keeps its subject, the PR is counted once, as of the
+    # latest commit since git log lists the newest commits first
+    commit(repo_path, "Fix the bug (#2)", "2023-01-05T10:00:00+00:00")
+    commit(repo_path, "Unrelated commit", "2023-01-06T10:00:00+00:00")
+    return repo_path
+
+
+def test_get_merged_pr_details_of_merge_and_squash_commits(merge_repo):
+    details = GitMergeDataExtractor(merge_repo).get_merged_pr_details("2023-01-01", "2023-01-31")
+    assert details.to_dict("records") == [
+        {"pr_number": 2, "pr_title": "Fix the bug", "created_at": "2023-01-05T10:00:00Z",
+         "author": "Alice", "status": "closed", "closed_at": "2023-01-05T10:00:00Z"},
+        {"pr_number": 1, "pr_title": "Add the feature", "created_at": "2023-01-03T01:00:00Z",
+         "author": None, "status": "closed", "closed_at": "2023-01-03T01:00:00Z"},
+    ]
+
+
+def test_get_merged_pr_details_filters_by_merge_date(merge_repo):
+    extractor = GitMergeDataExtractor(merge_repo)
+    # The merge commit of the second of January in New York is on the third in UTC
+    assert extractor.get_merged_pr_details("2023-01-02", "2023-01-02").empty
+    details = extractor.get_merged_pr_details("2023-01-03", "2023-01-04")
+    assert details["pr_number"].tolist() == [2, 1]
+    assert details["author"].tolist() == ["bob", None]
@@ -0,0 +1,85 @@
+"""
+Tests of the reading of paginated GitHub API resources.
+"""
+
+import threading
+import pytest
+from helpers.github_paginator import GitHubPaginator, get_page_number, set_page_number
+
+
+class StubResponse:
+    "A page of a resource, with the links GitHub sends"
+
+    def __init__(self, items, links):
+        self.items = items
+        self.links = links
+
+    def json(self):
+        return self.items
+
+
+class StubExtractor:
+    """
+    Serves resources of num_pages pages of page_size items, with or without last links,
+    and records the pages requested.
+    """
+
+    max_workers = 4
+
+    def __init__(self, num_pages, page_size=3, last_links=True):
+        self.num_pages = num_pages
+        self.page_size = page_size
+        self.last_links = last_links
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def get_response(self, url, params=None, immutable=False):
+        page = get_page_number(url)
+        with self.lock:
+            self.requests.append((url.split("?")[0], page, params, immutable))
+        base_url = set_page_number(url, 1)
+        links = {}
+        if page < self.num_pages:
+            links["next"] = {"url": set_page_number(base_url, page + 1)}
+            if self.last_links:
+                links["last"] = {"url": set_page_number(base_url, self.num_pages)}
+        start = (page - 1) * self.page_size
+        return StubResponse(list(range(start, start + self.page_size)), links)
+
+    def validate_response(self, response):
+        pass
+
+
+@pytest.mark.parametrize("last_links", [True, False])
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_get_all_items_reads_every_page_once(last_links, max_workers):
+    extractor = StubExtractor(5, last_links=last_links)
+    items = GitHubPaginator(extractor, max_workers).get_all_items("https://api/items")
+    assert items == list(range(15))
+    assert sorted(page for _, page, _, _ in extractor.requests) == [1, 2, 3, 4, 5]
+    assert extractor.requests[0][2] == {"per_page": 100}
+
+
+def test_get_items_of_resources_keeps_the_pages_of_each_resource_apart():
+    extractor = StubExtractor(3)
+    first_page = extractor.get_response("https://api/b")
+    items = GitHubPaginator(extractor).get_items_of_resources(
+        [("https://api/a", {"q": "x"}, True, None), ("https://api/b", None, False, first_page)]
+    )
+    assert items == [list(range(9)), list(range(9))]
+    # The first page of the second resource was given, so it is not fetched again
+    assert sorted((url, page) for url, page, _, _ in extractor.requests[1:]) == [
+        ("https://api/a", 1), ("https://api/a", 2), ("https://api/a", 3),
+        ("https://api/b", 2), ("https://api/b", 3),
+    ]
+    assert all(immutable for url, _, _, immutable in extractor.requests[1:]
+               if url == "https://api/a")
+
+
+def test_iter_pages_yields_each_page_as_it_arrives():
+    extractor = StubExtractor(4)
+    pages = GitHubPaginator(extractor).iter_pages([("https://api/items", None, False, None)])
+    assert next(pages) == (0, 1, [0, 1, 2])
+    # Only the first page was fetched when it was yielded
+    assert len(extractor.requests) == 1
+    assert sorted(page for _, page, _ in pages) == [2, 3, 4]
@@ -0,0 +1,124 @@
+"""
+Tests of the conditional requests sent with the cache of GitHub API responses.
+"""
+
+import pytest
+import requests
+from helpers.github_data_extractor import GitHubDataExtractor
+from helpers.http_cache import open_response_cache
+
+URL = "https://api.github.com/repos/qxf2/synthetic/pulls/1/files"
+ETAG = '"abc"'
+LAST_MODIFIED = "Mon, 02 Jan 2023 10:00:00 GMT"
+
+
+def make_response(status_code, body=b"", headers=None):
+    "Returns a response of the API"
+    response = requests.Response()
+    response.status_code = status_code
+    response.url = URL
+    response.headers.update(headers or {})
+    response._content = body  # pylint: disable=protected-access
+    return response
+
+
+class StubSession:
+    "Answers the requests with the given responses, and records their headers"
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.sent_headers = []
+
+    def request(self, method, url, headers=None, **kwargs):  # pylint: disable=unused-argument
+        self.sent_headers.append(dict(headers))
+        return self.responses.pop(0)
+
+
+@pytest.fixture(name="extractor")
+def make_extractor(cache_dir, monkeypatch):  # pylint: disable=unused-argument
+    "Returns an extractor with its response cache in the cache directory of the test"
+    monkeypatch.setenv("GITLOG_INSIGHTS_HTTP_CACHE", "true")
+    monkeypatch.setenv("TOKEN", "token")
+    extractor = GitHubDataExtractor("qxf2/synthetic", max_workers=1, max_retries=0)
+    assert extractor.response_cache is not None
+    return extractor
+
+
+def get_conditional_headers(headers):
+    "Returns the conditional headers of a request"
+    return {name: value for name, value in headers.items()
+            if name in ("If-None-Match", "If-Modified-Since")}
+
+
+def test_not_modified_response_is_served_from_the_cache(extractor):
+    extractor.session = StubSession(
+        make_response(200, b"[1]", {"ETag": ETAG, "Last-Modified": LAST_MODIFIED}),
+        make_response(304),
+    )
+    assert extractor.get_response(URL).content == b"[1]"
+    response = extractor.get_response(URL)
+    assert (response.status_code, response.json()) == (200, [1])
+    assert [get_conditional_headers(headers) for headers in extractor.session.sent_headers] == [
+        {}, {"If-None-Match": ETAG, "If-Modified-Since": LAST_MODIFIED},
+    ]
+
+
+def test_modified_response_replaces_the_cached_one(extractor):
+    extractor.session = StubSession(
+        make_response(200, b"[1]", {"ETag": ETAG}),
+        make_response(200, b"[2]", {"ETag": '"def"'}),
+        make_response(304),
+    )
+    assert extractor.get_response(URL).json() == [1]
+    assert extractor.get_response(URL).json() == [2]
+    assert extractor.get_response(URL).json() == [2]
+    assert [get_conditional_headers(headers) for headers in extractor.session.sent_headers] == [
+        {}, {"If-None-Match": ETAG}, {"If-None-Match": '"def"'},
+    ]
+
+
+def test_responses_are_cached_by_parameters(extractor):
+    extractor.session = StubSession(
+        make_response(200, b"[1]", {"ETag": ETAG}), make_response(200, b"[2]"),
+    )
+    assert extractor.get_response(URL, {"page": 1}).json() == [1]
+    assert extractor.get_response(URL, {"page": 2}).json() == [2]
+    assert not get_conditional_headers(extractor.session.sent_headers[1])
+
+
+def test_failed_responses_are_not_cached(extractor):
+    extractor.session = StubSession(
+        make_response(404, b"{}", {"ETag": ETAG}), make_response(200, b"[1]"),
+    )
+    assert extractor.get_response(URL).status_code == 404
+    assert extractor.get_response(URL).json() == [1]
+    assert not get_conditional_headers(extractor.session.sent_headers[1])
+
+
+def test_immutable_responses_are_served_without_request(extractor):
+    extractor.session = StubSession(make_response(200, b"[1]", {"ETag": ETAG}))
+    assert extractor.get_response(URL, immutable=True).json() == [1]
+    assert extractor.get_response(URL, immutable=True).json() == [1]
+    assert len(extractor.session.sent_headers) == 1
+
+
+def test_requests_are_sent_without_the_cache_when_it_fails(extractor):
+    extractor.session = StubSession(
+        make_response(200, b"[1]", {"ETag": ETAG}), make_response(200, b"[2]"),
+    )
+    assert extractor.get_response(URL).json() == [1]
+    # A closed database raises errors on every read and write
+    extractor.response_cache.connection.close()
+    assert extractor.get_response(URL).json() == [2]
+    assert not get_conditional_headers(extractor.session.sent_headers[1])
+
+
+def test_cache_is_not_used_when_it_cannot_be_opened(tmp_path, monkeypatch):
+    blocking_file = tmp_path / "file"
+    blocking_file.write_text("", encoding="utf-8")
+    monkeypatch.setenv("GITLOG_INSIGHTS_CACHE_DIR", str(blocking_file))
+    monkeypatch.setenv("GITLOG_INSIGHTS_HTTP_CACHE", "true")
+    assert open_response_cache() is None
+    monkeypatch.setenv("GITLOG_INSIGHTS_CACHE_DIR", str(tmp_path))
+    monkeypatch.setenv("GITLOG_INSIGHTS_HTTP_CACHE", "false")
+    assert open_response_cache() is None
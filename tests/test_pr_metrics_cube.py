@@ -0,0 +1,148 @@
+"""
+Tests that the buckets of the PR metrics cube, maintained by the triggers of the PR store,
+give the same metrics as computing them again from the stored PRs.
+"""
+
+import random
+from datetime import datetime, timedelta
+import pytest
+from helpers.github_pr_data_extractor import PRDataExtractor
+from helpers.pr_store import PRStore
+
+REPO_NAME = "qxf2/synthetic"
+DAYS = ["2023-01-01", "2023-01-02", "2023-01-03", "2023-01-04"]
+AUTHORS = ["alice", "bob", "carol"]
+RANGES = [(DAYS[0], DAYS[-1]), (DAYS[0], DAYS[0]), (DAYS[1], DAYS[2]), (DAYS[3], DAYS[3])]
+
+
+def make_record(rng, number):
+    "Returns a random pull request, merged or not, created and closed within DAYS"
+    created = datetime.fromisoformat(rng.choice(DAYS[:2])) + timedelta(
+        seconds=rng.randrange(86400)
+    )
+    closed = created + timedelta(seconds=rng.randrange(2 * 86400))
+    is_closed = rng.random() < 0.8
+    is_merged = is_closed and rng.random() < 0.8
+    return {
+        "number": number,
+        "title": f"PR {number}",
+        "author": rng.choice(AUTHORS),
+        "state": "closed" if is_closed else "open",
+        "created_at": f"{created.isoformat()}Z",
+        "closed_at": f"{closed.isoformat()}Z" if is_closed else None,
+        "merged_at": f"{closed.isoformat()}Z" if is_merged else None,
+        "updated_at": f"{(closed + timedelta(seconds=rng.randrange(60))).isoformat()}Z",
+    }
+
+
+def make_files(rng):
+    "Returns random files of a pull request, some of them listed twice"
+    names = [f"file{index}.py" for index in range(rng.randrange(0, 5))]
+    return [
+        {"filename": name, "status": "modified", "additions": 1, "deletions": 1,
+         "changes": rng.randrange(100)}
+        for name in names + rng.sample(names, min(len(names), 1))
+    ]
+
+
+def get_seconds(start, end):
+    "Returns the seconds between two API dates"
+    return int((datetime.fromisoformat(end[:-1]) - datetime.fromisoformat(start[:-1]))
+               .total_seconds())
+
+
+def compute_review_metrics(store, start_day, end_day):
+    "Computes the review metrics of a range of days from the stored PRs"
+    authors = {}
+    longest = (None, None)
+    for record in sorted(store.get_pull_requests("merged", start_day, end_day),
+                         key=lambda record: record["number"]):
+        if record["state"] != "closed" or record["closed_at"] is None:
+            continue
+        seconds = get_seconds(record["created_at"], record["closed_at"])
+        author = authors.setdefault(record["author"], [0, 0, 0, 0, 0])
+        author[0] += 1
+        author[1] += seconds
+        author[2] += seconds * seconds
+        author[3] = max(author[3], seconds)
+        author[4] = record["number"]
+        if longest[0] is None or seconds > longest[0]:
+            longest = (seconds, record["number"])
+    return (
+        sum(author[0] for author in authors.values()),
+        sum(author[1] for author in authors.values()),
+        sum(author[2] for author in authors.values()),
+        *longest,
+        [(name, *values) for name, values in sorted(authors.items())],
+    )
+
+
+def compute_size_metrics(store, start_day, end_day):
+    "Computes the size metrics of a range of days from the stored PRs and their files"
+    authors = {}
+    most_lines = most_files = (None, None)
+    for record in sorted(store.get_pull_requests("created", start_day, end_day),
+                         key=lambda record: record["number"]):
+        files = store.get_files([record["number"]])
+        if not files:
+            continue
+        lines = sum(file["changes"] for file in files)
+        num_files = len({file["filename"] for file in files})
+        author = authors.setdefault(record["author"], [0, 0, 0, 0, 0])
+        author[0] += 1
+        author[1] += lines
+        author[2] += num_files
+        author[3] = max(author[3], lines)
+        author[4] = max(author[4], num_files)
+        if most_lines[0] is None or lines > most_lines[0]:
+            most_lines = (lines, record["number"])
+        if most_files[0] is None or num_files > most_files[0]:
+            most_files = (num_files, record["number"])
+    return (
+        sum(author[0] for author in authors.values()),
+        sum(author[1] for author in authors.values()),
+        sum(author[2] for author in authors.values()),
+        *most_lines,
+        *most_files,
+        [(name, *values) for name, values in sorted(authors.items())],
+    )
+
+
+def get_cube_metrics(extractor, measure, start_day, end_day):
+    "Returns the metrics of the cube as a tuple comparable with the computed ones"
+    metrics = extractor.get_pr_metrics(measure, start_day, end_day, sync=False)
+    authors = [tuple(row) for row in metrics.authors.itertuples(index=False)]
+    return tuple(metrics[:-1]) + (authors,)
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_cube_matches_the_metrics_computed_from_the_prs(cache_dir, seed):
+    rng = random.Random(seed)
+    extractor = PRDataExtractor(REPO_NAME, max_workers=1, use_store=True)
+    numbers = list(range(1, 31))
+    with PRStore(REPO_NAME, str(cache_dir / "prs")) as store:
+        for step in range(6):
+            if step == 0:
+                store.upsert_pull_requests([make_record(rng, number) for number in numbers])
+            else:
+                # Updates move PRs across days and authors, or close and reopen them
+                store.upsert_pull_requests(
+                    [dict(make_record(rng, number), updated_at=f"2023-02-0{step}T00:00:00Z")
+                     for number in rng.sample(numbers, 8)]
+                )
+                deleted = rng.sample(numbers, 2)
+                store.connection.executemany(
+                    "DELETE FROM pull_requests WHERE repo = ? AND number = ?",
+                    [(REPO_NAME, number) for number in deleted],
+                )
+                store.connection.commit()
+                numbers = [number for number in numbers if number not in deleted]
+            for record in store.get_stale_files(rng.sample(numbers, 10)):
+                store.put_files(record["number"], record["updated_at"], make_files(rng))
+            for start_day, end_day in RANGES:
+                assert get_cube_metrics(extractor, "review", start_day, end_day) == (
+                    compute_review_metrics(store, start_day, end_day)
+                )
+                assert get_cube_metrics(extractor, "size", start_day, end_day) == (
+                    compute_size_metrics(store, start_day, end_day)
+                )
@@ -0,0 +1,129 @@
+"""
+Tests of the bookkeeping of the ranges and of the watermark of the PR store.
+"""
+
+import pytest
+from helpers.github_pr_data_extractor import PRDataExtractor
+from helpers.pr_store import PRStore, get_missing_ranges, merge_ranges
+
+DAY_1 = ("2023-01-01T00:00:00Z", "2023-01-01T23:59:59Z")
+DAY_2 = ("2023-01-02T00:00:00Z", "2023-01-02T23:59:59Z")
+DAY_3 = ("2023-01-03T00:00:00Z", "2023-01-03T23:59:59Z")
+
+
+def test_merge_ranges_merges_overlapping_ranges():
+    assert merge_ranges([
+        ("2023-01-01T00:00:00Z", "2023-01-02T12:00:00Z"),
+        ("2023-01-02T06:00:00Z", "2023-01-03T00:00:00Z"),
+        ("2023-01-01T10:00:00Z", "2023-01-01T11:00:00Z"),
+    ]) == [("2023-01-01T00:00:00Z", "2023-01-03T00:00:00Z")]
+
+
+def test_merge_ranges_merges_adjacent_ranges():
+    assert merge_ranges([DAY_2, DAY_1]) == [(DAY_1[0], DAY_2[1])]
+
+
+def test_merge_ranges_keeps_ranges_apart_by_more_than_a_second():
+    later = ("2023-01-02T00:00:01Z", "2023-01-02T23:59:59Z")
+    assert merge_ranges([later, DAY_1]) == [DAY_1, later]
+    assert merge_ranges([]) == []
+
+
+def test_get_missing_ranges_of_an_empty_store():
+    assert get_missing_ranges([], "2023-01-01", "2023-01-03") == [(DAY_1[0], DAY_3[1])]
+
+
+def test_get_missing_ranges_of_covered_and_partly_covered_ranges():
+    covered = [DAY_2]
+    assert get_missing_ranges(covered, "2023-01-02", "2023-01-02") == []
+    assert get_missing_ranges(covered, "2023-01-01", "2023-01-02") == [DAY_1]
+    assert get_missing_ranges(covered, "2023-01-02", "2023-01-03") == [DAY_3]
+    assert get_missing_ranges(covered, "2023-01-01", "2023-01-03") == [DAY_1, DAY_3]
+
+
+def test_get_missing_ranges_between_covered_ranges():
+    covered = merge_ranges([DAY_1, DAY_3, ("2023-01-05T00:00:00Z", "2023-01-05T23:59:59Z")])
+    assert get_missing_ranges(covered, "2022-12-31", "2023-01-04") == [
+        ("2022-12-31T00:00:00Z", "2022-12-31T23:59:59Z"), DAY_2,
+        ("2023-01-04T00:00:00Z", "2023-01-04T23:59:59Z"),
+    ]
+    # The ranges outside of the requested range do not matter
+    assert get_missing_ranges(covered, "2023-01-02", "2023-01-02") == [DAY_2]
+
+
+def test_add_covered_range_merges_the_stored_ranges(cache_dir):
+    with PRStore("qxf2/synthetic", str(cache_dir)) as store:
+        store.add_covered_range("created", *DAY_1)
+        store.add_covered_range("created", *DAY_3)
+        assert store.get_covered_ranges("created") == [DAY_1, DAY_3]
+        store.add_covered_range("created", *DAY_2)
+        assert store.get_covered_ranges("created") == [(DAY_1[0], DAY_3[1])]
+        assert not store.get_covered_ranges("merged")
+
+
+def make_record(number, created_at, updated_at):
+    "Returns the store record of an open pull request"
+    return {
+        "number": number, "title": f"PR {number}", "author": "alice", "state": "open",
+        "created_at": created_at, "closed_at": None, "merged_at": None,
+        "updated_at": updated_at,
+    }
+
+
+@pytest.fixture(name="extractor")
+def make_extractor(cache_dir, monkeypatch):  # pylint: disable=unused-argument
+    """
+    Returns an extractor, with its caches in the cache directory of the test, whose
+    searches are answered from its `records` dictionary, by the qualifiers following
+    the repository, and recorded in its `queries` list.
+    """
+    monkeypatch.setenv("GITLOG_INSIGHTS_PR_STORE_SYNC_LAG", "300")
+    extractor = PRDataExtractor("qxf2/synthetic", max_workers=1, use_store=True)
+    extractor.records = {}
+    extractor.queries = []
+
+    def search_store_records(query):
+        qualifiers = query.split(" ", 2)[2]
+        extractor.queries.append(qualifiers)
+        return list(extractor.records.get(qualifiers, []))
+
+    extractor.search_store_records = search_store_records
+    return extractor
+
+
+def test_sync_store_searches_the_updates_from_before_the_watermark(extractor, cache_dir):
+    with PRStore("qxf2/synthetic", str(cache_dir)) as store:
+        store.set_watermark("2023-01-03T12:00:00Z")
+        store.add_covered_range("created", *DAY_1)
+        late_pr = make_record(2, "2023-01-01T08:00:00Z", "2023-01-03T11:58:00Z")
+        new_pr = make_record(3, "2023-01-02T08:00:00Z", "2023-01-03T13:00:00Z")
+        extractor.records["updated:2023-01-03T11:55:00+00:00..*"] = [late_pr, new_pr]
+        extractor.sync_store(store, "created", "2023-01-01", "2023-01-02")
+        assert extractor.queries == [
+            "updated:2023-01-03T11:55:00+00:00..*",
+            "created:2023-01-02T00:00:00+00:00..2023-01-02T23:59:59+00:00",
+        ]
+        # The PR indexed after the previous sync, although updated before it, is stored
+        assert [record["number"] for record in store.get_pull_requests(
+            "created", "2023-01-01", "2023-01-02")] == [3, 2]
+        assert store.get_watermark() == "2023-01-03T13:00:00Z"
+        assert store.get_covered_ranges("created") == [(DAY_1[0], DAY_2[1])]
+
+
+def test_sync_store_keeps_the_watermark_without_updates(extractor, cache_dir):
+    with PRStore("qxf2/synthetic", str(cache_dir)) as store:
+        store.set_watermark("2023-01-03T12:00:00Z")
+        store.add_covered_range("created", *DAY_1)
+        extractor.sync_store(store, "created", "2023-01-01", "2023-01-01")
+        assert extractor.queries == ["updated:2023-01-03T11:55:00+00:00..*"]
+        assert store.get_watermark() == "2023-01-03T12:00:00Z"
+
+
+def test_first_sync_only_searches_the_requested_range(extractor, cache_dir):
+    with PRStore("qxf2/synthetic", str(cache_dir)) as store:
+        extractor.sync_store(store, "merged", "2023-01-01", "2023-01-01")
+        assert extractor.queries == [
+            "merged:2023-01-01T00:00:00+00:00..2023-01-01T23:59:59+00:00"
+        ]
+        assert store.get_watermark() is not None
+        assert store.get_covered_ranges("merged") == [DAY_1]
@@ -0,0 +1,90 @@
+"""
+Tests of the day buckets of the rollup index.
+"""
+
+from datetime import datetime, timedelta, timezone
+import pytest
+from conftest import run_git
+from helpers.rollup_index import (
+    MAX_SLOT, MIN_SLOT, RollupIndex, get_slot, get_slot_range, get_timestamp, is_rollup_range,
+)
+
+MIDNIGHT = datetime(2023, 1, 2, tzinfo=timezone.utc)
+
+
+def test_get_slot_puts_midnight_in_its_own_bucket():
+    timestamp = get_timestamp(MIDNIGHT)
+    assert get_slot(timestamp - 1) == get_slot(timestamp) - 1
+    assert get_slot(timestamp + 1) == get_slot(timestamp) + 1
+    assert get_slot(timestamp + 86399) == get_slot(timestamp) + 1
+    assert get_slot(timestamp + 86400) == get_slot(timestamp) + 2
+
+
+def test_get_slot_before_the_epoch():
+    assert get_slot(-86400) == -2
+    assert get_slot(-1) == -1
+    assert get_slot(0) == 0
+
+
+def test_get_slot_range_between_midnights():
+    start, end = get_slot_range(MIDNIGHT, MIDNIGHT + timedelta(days=1))
+    assert start == get_slot(get_timestamp(MIDNIGHT))
+    # The midnight ending the range is included, the rest of its day is not
+    assert end == start + 2
+
+
+def test_get_slot_range_of_naive_and_other_timezone_midnights():
+    assert get_slot_range(MIDNIGHT.replace(tzinfo=None)) == get_slot_range(MIDNIGHT)
+    eastern = timezone(timedelta(hours=-5))
+    assert get_slot_range(datetime(2023, 1, 1, 19, tzinfo=eastern)) == get_slot_range(MIDNIGHT)
+    assert get_slot_range(datetime(2023, 1, 2, tzinfo=eastern)) is None
+
+
+def test_get_slot_range_of_open_and_partial_ranges():
+    assert get_slot_range() == (MIN_SLOT, MAX_SLOT)
+    assert get_slot_range(to=MIDNIGHT)[0] == MIN_SLOT
+    assert not is_rollup_range(MIDNIGHT + timedelta(seconds=1))
+    assert not is_rollup_range(MIDNIGHT, MIDNIGHT + timedelta(hours=12))
+
+
+@pytest.mark.parametrize(
+    "since, to, expected_touches",
+    [
+        # The midnight commits of the first and the last day are both included
+        ("2023-01-01", "2023-01-02", 5),
+        ("2023-01-02", "2023-01-03", 4),
+        ("2023-01-02", "2023-01-02", 1),
+        ("2023-01-03", "2023-01-04", 3),
+        ("2022-12-31", "2023-01-01", 2),
+    ],
+)
+def test_query_includes_the_commits_at_both_midnights(
+    fixture_repo, cache_dir, since, to, expected_touches
+):
+    with RollupIndex(fixture_repo, cache_dir=str(cache_dir)) as index:
+        index.update(fixture_repo)
+        rollup = index.query(
+            datetime.fromisoformat(since).replace(tzinfo=timezone.utc),
+            datetime.fromisoformat(to).replace(tzinfo=timezone.utc),
+        )
+    assert sum(rollup.touches) == expected_touches
+
+
+def test_query_rejects_ranges_that_split_a_day(fixture_repo, cache_dir):
+    with RollupIndex(fixture_repo, cache_dir=str(cache_dir)) as index:
+        with pytest.raises(ValueError):
+            index.query(MIDNIGHT, MIDNIGHT + timedelta(hours=1))
+
+
+def test_update_keeps_the_latest_touch_by_commit_date(fixture_repo, cache_dir, tmp_path):
+    clone_path = tmp_path / "clone"
+    run_git(tmp_path, "clone", "--quiet", fixture_repo, str(clone_path))
+    # The last commit, dated before the one it follows, is added by a second update
+    run_git(clone_path, "reset", "--quiet", "--hard", "HEAD~1")
+    with RollupIndex(str(clone_path), cache_dir=str(cache_dir)) as index:
+        index.update(str(clone_path))
+        run_git(clone_path, "reset", "--quiet", "--hard", "origin/main")
+        assert index.update(str(clone_path)) == 1
+        rollup = index.query()
+    app_index = rollup.files.index("app.py")
+    assert rollup.last_msgs[app_index] == "Commit by Bob at 2023-01-03T09:00:00-05:00"
@@ -0,0 +1,82 @@
+"""
+Tests of the splitting of GitHub search queries into date windows.
+"""
+
+from datetime import datetime, timedelta, timezone
+from helpers.search_window import (
+    SEARCH_RESULT_LIMIT, format_search_date, get_date_range, split_query, split_range,
+)
+
+START = datetime(2023, 1, 1, tzinfo=timezone.utc)
+
+
+def make_counter(dates):
+    """
+    Returns a count_results function over results created at the given dates,
+    which records the queries it is called with.
+    """
+    queries = []
+
+    def count_results(query):
+        queries.append(query)
+        _, start, end = get_date_range(query)
+        return sum(start <= date <= end for date in dates), query
+
+    count_results.queries = queries
+    return count_results
+
+
+def test_split_range_covers_the_range_without_gaps():
+    end = START + timedelta(days=10, seconds=-1)
+    windows = split_range(START, end, 3)
+    assert windows[0][0] == START
+    assert windows[-1][1] == end
+    for (_, previous_end), (next_start, _) in zip(windows, windows[1:]):
+        assert next_start - previous_end == timedelta(seconds=1)
+
+
+def test_split_range_has_at_most_one_window_per_second():
+    assert split_range(START, START + timedelta(seconds=1), 5) == [
+        (START, START), (START + timedelta(seconds=1), START + timedelta(seconds=1)),
+    ]
+    assert split_range(START, START, 2) == [(START, START)]
+
+
+def test_split_query_keeps_a_query_at_the_limit():
+    dates = [START + timedelta(minutes=minute) for minute in range(SEARCH_RESULT_LIMIT)]
+    count_results = make_counter(dates)
+    query = "repo:qxf2/synthetic created:2023-01-01..2023-01-31"
+    assert split_query(query, count_results) == [(query, query)]
+
+
+def test_split_query_splits_a_query_over_the_limit():
+    dates = [START + timedelta(minutes=minute) for minute in range(SEARCH_RESULT_LIMIT + 1)]
+    count_results = make_counter(dates)
+    windows = split_query("is:pr created:2023-01-01..2023-01-31 is:merged", count_results)
+    counts = [count_results(query)[0] for query, _ in windows]
+    assert sum(counts) == SEARCH_RESULT_LIMIT + 1
+    assert max(counts) <= SEARCH_RESULT_LIMIT
+    assert all(query.startswith("is:pr created:") for query, _ in windows)
+    assert all(query.endswith(" is:merged") for query, _ in windows)
+    assert windows[0][0].startswith(f"is:pr created:{format_search_date(START)}..")
+
+
+def test_split_query_stops_at_one_second_windows():
+    # More results than the limit in the same second can not be split
+    dates = [START + timedelta(seconds=5)] * (SEARCH_RESULT_LIMIT + 1)
+    count_results = make_counter(dates)
+    windows = split_query("created:2023-01-01..2023-01-01", count_results)
+    assert sum(count_results(query)[0] for query, _ in windows) == SEARCH_RESULT_LIMIT + 1
+    second = format_search_date(START + timedelta(seconds=5))
+    assert [query for query, _ in windows if count_results(query)[0]] == [
+        f"created:{second}..{second}"
+    ]
+
+
+def test_split_query_keeps_a_query_without_date_range():
+    def count_results(_):
+        return SEARCH_RESULT_LIMIT + 1, None
+
+    assert split_query("repo:qxf2/synthetic is:pr", count_results) == [
+        ("repo:qxf2/synthetic is:pr", None)
+    ]
@@ -0,0 +1,84 @@
+"""
+This script provides the DataFrame operations shared by the insights.
+They work on whole columns instead of looping over rows in Python, so that they
+keep up with reports over millions of PR or commit rows.
+"""
+
+import numpy as np
+import pandas as pd
+
+DAYS_OF_WEEK = np.array(
+    ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"],
+    dtype=object,
+)
+
+
+def count_by_month_and_weekday(dates, count_column="Count"):
+    """
+    Counts dates by month and day of the week.
+    Args:
+        dates (Series): The dates to count. Missing dates are ignored.
+        count_column (str): The name of the column holding the counts.
+    Returns:
+        DataFrame: The Month (for example 2023-January), Day_of_Week and count columns.
+        Months are sorted by name and every day of the week seen in the data is listed
+        for every month, with a zero count when there was no date on that day.
+    """
+    dates = pd.to_datetime(dates).dropna()
+    if dates.empty:
+        return pd.DataFrame(columns=["Month", "Day_of_Week", count_column])
+
+    # Months are grouped as integers and only the distinct months are formatted
+    month_codes = dates.dt.year * 12 + dates.dt.month - 1
+    counts = (
+        pd.DataFrame({"month": month_codes.to_numpy(), "day": dates.dt.dayofweek.to_numpy()})
+        .groupby(["month", "day"])
+        .size()
+        .unstack(fill_value=0)
+    )
+    counts.index = [
+        pd.Timestamp(year=code // 12, month=code % 12 + 1, day=1).strftime("%Y-%B")
+        for code in counts.index
+    ]
+    stacked = counts.sort_index().stack()
+
+    return pd.DataFrame({
+        "Month": stacked.index.get_level_values(0).to_numpy(dtype=object),
+        "Day_of_Week": DAYS_OF_WEEK[stacked.index.get_level_values(1).to_numpy()],
+        count_column: stacked.to_numpy(),
+    })
+
+
+def concat_columns(*parts):
+    """
+    Concatenates strings and columns element-wise, for example to format one line per row.
+    Args:
+        parts (str or Series): The strings and the columns, in order. At least one part
+        must be a column, all the columns must share the same index.
+    Returns:
+        Series: The concatenated strings.
+    """
+    index = next(part.index for part in parts if isinstance(part, pd.Series))
+    result = pd.Series("", index=index, dtype=object)
+    for part in parts:
+        result = result + (part.astype(str) if isinstance(part, pd.Series) else part)
+    return result
+
+
+def unique_list_values(column):
+    """
+    Returns the distinct values of a column of lists, in the order they first appear.
+    """
+    return column.explode().dropna().drop_duplicates().tolist()
+
+
+def join_list_columns(frame, separator=", "):
+    """
+    Returns a copy of a DataFrame whose columns of lists are joined into strings,
+    for the reports.
+    """
+    frame = frame.copy()
+    for column in frame.columns:
+        if len(frame) and isinstance(frame[column].iloc[0], list):
+            frame[column] = frame[column].str.join(separator)
+    return frame
@@ -0,0 +1,61 @@
+"""
+This script reads the optional settings of gitlog-insights from environment variables.
+Every setting is read from a variable named GITLOG_INSIGHTS_<NAME>, for example
+GITLOG_INSIGHTS_CACHE_DIR.
+"""
+
+import os
+
+gitlog_insights_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+TRUE_VALUES = ("1", "true", "yes", "on")
+
+
+def get_setting(name, default=None):
+    """
+    Returns the value of a setting from the environment.
+    Args:
+        name (str): The name of the setting, without the GITLOG_INSIGHTS_ prefix.
+        default: The value returned when the setting is not set.
+    Returns:
+        str: The value of the setting.
+    """
+    return os.environ.get(f"GITLOG_INSIGHTS_{name.upper()}", default)
+
+
+def get_bool_setting(name, default=False):
+    """
+    Returns the value of a yes/no setting from the environment.
+    """
+    value = get_setting(name)
+    if value is None or value == "":
+        return default
+    return value.strip().lower() in TRUE_VALUES
+
+
+def get_int_setting(name, default):
+    """
+    Returns the value of a numeric setting from the environment.
+    """
+    value = get_setting(name)
+    if value is None or value == "":
+        return default
+    try:
+        return int(value)
+    except ValueError as value_error:
+        raise ValueError(
+            f"Setting GITLOG_INSIGHTS_{name.upper()} must be a number, got '{value}'"
+        ) from value_error
+
+
+def get_cache_dir(name):
+    """
+    Returns the directory used to cache one kind of data.
+    The cache root defaults to the .cache folder of this project.
+    Args:
+        name (str): The name of the sub directory for the cached data.
+    Returns:
+        str: The path of the cache directory.
+    """
+    cache_root = get_setting("cache_dir") or os.path.join(gitlog_insights_dir, ".cache")
+    return os.path.join(cache_root, name)
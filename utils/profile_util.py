@@ -0,0 +1,230 @@
+"""
+This script provides a lightweight instrumentation layer: timing spans and counters,
+reported by the insight scripts when they are run with --profile.
+
+Spans measure the time spent in a stage, such as cloning, commit traversal, diff parsing,
+complexity, HTTP round-trips, pandas aggregation or HTML rendering. Spans of the same name
+add up, across threads too, and spans may nest, so their shares of the wall time can add up
+to more than 100%. Counters count events such as commits walked, HTTP requests or cache hits.
+
+Profiling is off by default. While it is off, `span` returns a shared context manager
+that does nothing and `count` returns at once, so instrumented code only pays a function call.
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import argparse
+import threading
+
+
+class Profile:
+    """
+    The spans and counters recorded since profiling was enabled.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        "Clears the recorded spans and counters"
+        with self.lock:
+            self.spans = {}
+            self.counters = {}
+            self.started_at = time.perf_counter()
+
+
+profile = Profile()
+
+
+class NullSpan:
+    "The span returned while profiling is off"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+    "Adds the time spent in a with block to the span of its name"
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        add_time(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def span(name):
+    """
+    Returns a context manager timing a stage.
+    Args:
+        name (str): The name of the span, for example "git.clone".
+    """
+    if not profile.enabled:
+        return NULL_SPAN
+    return Span(name)
+
+
+def add_time(name, seconds, calls=1):
+    """
+    Adds time to a span, for stages that are not timed with a with block.
+    """
+    if not profile.enabled:
+        return
+    with profile.lock:
+        totals = profile.spans.setdefault(name, [0, 0.0])
+        totals[0] += calls
+        totals[1] += seconds
+
+
+def count(name, value=1):
+    """
+    Adds a value to a counter.
+    Args:
+        name (str): The name of the counter, for example "http.requests".
+        value (int or float): The value to add.
+    """
+    if not profile.enabled:
+        return
+    with profile.lock:
+        profile.counters[name] = profile.counters.get(name, 0) + value
+
+
+def is_enabled():
+    "Returns True when profiling is on"
+    return profile.enabled
+
+
+def enable():
+    "Turns profiling on and clears what was recorded"
+    profile.reset()
+    profile.enabled = True
+
+
+def disable():
+    "Turns profiling off"
+    profile.enabled = False
+
+
+def take_snapshot():
+    """
+    Returns the spans and counters recorded so far and clears them, for example
+    to send them from a worker process to the parent. Returns None while profiling is off.
+    """
+    if not profile.enabled:
+        return None
+    with profile.lock:
+        snapshot = {"spans": profile.spans, "counters": profile.counters}
+        profile.spans = {}
+        profile.counters = {}
+    return snapshot
+
+
+def merge_snapshot(snapshot):
+    """
+    Adds the spans and counters of a snapshot taken by take_snapshot.
+    """
+    if snapshot is None or not profile.enabled:
+        return
+    for name, (calls, seconds) in snapshot["spans"].items():
+        add_time(name, seconds, calls)
+    for name, value in snapshot["counters"].items():
+        count(name, value)
+
+
+def get_report():
+    """
+    Returns the recorded spans and counters.
+    Returns:
+        dict: The wall time since profiling was enabled, the calls, seconds and share
+        of the wall time of every span, and the counters.
+    """
+    with profile.lock:
+        wall_seconds = time.perf_counter() - profile.started_at
+        spans = {
+            name: {
+                "calls": calls,
+                "seconds": round(seconds, 6),
+                "share": round(seconds / wall_seconds, 4) if wall_seconds else 0,
+            }
+            for name, (calls, seconds) in sorted(
+                profile.spans.items(), key=lambda item: item[1][1], reverse=True
+            )
+        }
+        counters = dict(sorted(profile.counters.items()))
+    return {"wall_seconds": round(wall_seconds, 6), "spans": spans, "counters": counters}
+
+
+def format_report(report):
+    """
+    Returns a report as a text table.
+    """
+    lines = [
+        f"\nProfile (wall time {report['wall_seconds']:.3f}s)",
+        "Spans add up over threads and may nest, so their shares can exceed 100%.",
+        "",
+    ]
+    lines.append(f"{'span':<28} {'calls':>8} {'seconds':>10} {'share':>7}")
+    for name, totals in report["spans"].items():
+        lines.append(
+            f"{name:<28} {totals['calls']:>8} {totals['seconds']:>10.3f} "
+            f"{totals['share']:>7.1%}"
+        )
+    lines.append("")
+    lines.append(f"{'counter':<28} {'value':>8}")
+    for name, value in report["counters"].items():
+        value = f"{value:.3f}" if isinstance(value, float) else value
+        lines.append(f"{name:<28} {value:>8}")
+    return "\n".join(lines)
+
+
+def write_report(json_path):
+    """
+    Prints the breakdown of the recorded spans and counters and writes them as JSON.
+    """
+    report = get_report()
+    print(format_report(report))
+    try:
+        with open(json_path, "w", encoding="utf-8") as json_file:
+            json.dump(report, json_file, indent=2)
+        print(f"\nProfile written to {json_path}")
+    except OSError as os_error:
+        print(f"\nCould not write the profile to {json_path}: {os_error}")
+
+
+def setup_profiling(default_json_path):
+    """
+    Turns profiling on when the script was run with --profile, and reports the profile
+    when the script exits.
+    Args:
+        default_json_path (str): The JSON file written when --profile has no value.
+    Returns:
+        str: The path of the JSON file, or None when profiling is off.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--profile", nargs="?", const=default_json_path, metavar="JSON_PATH")
+    arguments, remaining = parser.parse_known_args()
+    sys.argv[1:] = remaining
+    if arguments.profile is None:
+        return None
+    enable()
+    os.makedirs(os.path.dirname(os.path.abspath(arguments.profile)), exist_ok=True)
+    atexit.register(write_report, arguments.profile)
+    return arguments.profile
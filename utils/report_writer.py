@@ -0,0 +1,256 @@
+"""
+This script writes the DataFrames of the insights as HTML reports. The rows are formatted
+and written to disk a chunk at a time, so the memory used by the report step does not
+grow with the number of rows.
+
+Tables longer than GITLOG_INSIGHTS_REPORT_PAGE_ROWS rows are split into linked pages:
+the first page is written to the report file and the next ones beside it, as
+<report>_page2.html, <report>_page3.html and so on.
+With GITLOG_INSIGHTS_REPORT_FORMAT=json, the rows are instead written as a compact JSON
+payload in a single page, which shows them one page at a time in the browser.
+"""
+
+import os
+import re
+import glob
+import html
+from utils import analytics_util, config_util, profile_util
+
+REPORT_FORMATS = ("html", "json")
+DEFAULT_PAGE_ROWS = 10000
+CHUNK_ROWS = 2000
+NO_DATA_MESSAGE = "No data available between the specified dates."
+HTML_ESCAPES = (("&", "&amp;"), ("<", "&lt;"), (">", "&gt;"))
+
+PAGE_HEADER = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+</head>
+<body>
+"""
+PAGE_FOOTER = """</body>
+</html>
+"""
+TABLE_HEADER = """<table border="1" class="dataframe">
+  <thead>
+    <tr style="text-align: right;">
+{headers}    </tr>
+  </thead>
+  <tbody>
+"""
+TABLE_FOOTER = """  </tbody>
+</table>
+"""
+# The rows are read from the payload and shown a page at a time
+JSON_TABLE_SCRIPT = """<p id="pager"></p>
+<table border="1" class="dataframe">
+  <thead><tr style="text-align: right;" id="headers"></tr></thead>
+  <tbody id="rows"></tbody>
+</table>
+<script>
+(function () {
+  var report = JSON.parse(document.getElementById("report-data").textContent);
+  var pageRows = %d, page = 0;
+  var pages = Math.max(1, Math.ceil(report.data.length / pageRows));
+  function cell(tag, value) {
+    var element = document.createElement(tag);
+    element.textContent = value === null ? "None" : String(value);
+    return element;
+  }
+  report.columns.forEach(function (column) {
+    document.getElementById("headers").appendChild(cell("th", column));
+  });
+  function link(label, target) {
+    var element = document.createElement("a");
+    element.href = "#";
+    element.textContent = label;
+    element.onclick = function () { show(target); return false; };
+    return element;
+  }
+  function show(target) {
+    page = Math.min(Math.max(target, 0), pages - 1);
+    var body = document.getElementById("rows"), pager = document.getElementById("pager");
+    body.textContent = "";
+    report.data.slice(page * pageRows, (page + 1) * pageRows).forEach(function (row) {
+      var line = document.createElement("tr");
+      row.forEach(function (value) { line.appendChild(cell("td", value)); });
+      body.appendChild(line);
+    });
+    pager.textContent = "";
+    if (page > 0) { pager.appendChild(link("Previous", page - 1)); }
+    pager.appendChild(document.createTextNode(
+      " Page " + (page + 1) + " of " + pages + " (" + report.data.length + " rows) "));
+    if (page < pages - 1) { pager.appendChild(link("Next", page + 1)); }
+  }
+  show(0);
+})();
+</script>
+"""
+
+
+def escape_html(text):
+    """
+    Escapes the special HTML characters of a column of strings.
+    """
+    for character, entity in HTML_ESCAPES:
+        text = text.str.replace(character, entity, regex=False)
+    return text
+
+
+def format_column(column):
+    """
+    Returns the cells of a column as escaped strings, with the floats rounded and
+    the missing values written like DataFrame.to_html does.
+    """
+    if column.dtype.kind == "f":
+        return column.round(6).astype(str).mask(column.isna(), "NaN")
+    if column.dtype.kind in "biu":
+        return column.astype(str)
+    return escape_html(column.astype(str))
+
+
+def iter_chunks(frame):
+    """
+    Yields the rows of a DataFrame in chunks of CHUNK_ROWS rows, with the columns
+    of lists joined into strings.
+    """
+    for start in range(0, len(frame), CHUNK_ROWS):
+        yield analytics_util.join_list_columns(frame.iloc[start:start + CHUNK_ROWS])
+
+
+def get_page_name(file_name, page):
+    """
+    Returns the file of a page of a report, the report file itself for the first page.
+    """
+    if page == 1:
+        return file_name
+    stem, extension = os.path.splitext(file_name)
+    return f"{stem}_page{page}{extension}"
+
+
+def remove_stale_pages(file_name, num_pages):
+    """
+    Removes the pages left by a previous, longer report of the same file.
+    """
+    stem, extension = os.path.splitext(file_name)
+    pattern = re.compile(re.escape(stem) + r"_page(\d+)" + re.escape(extension) + "$")
+    for page_name in glob.glob(f"{glob.escape(stem)}_page*{extension}"):
+        match = pattern.match(page_name)
+        if match and int(match.group(1)) > num_pages:
+            os.remove(page_name)
+
+
+def write_navigation(file, file_name, page, num_pages):
+    """
+    Writes the links to the previous and the next pages of a report.
+    """
+    links = []
+    if page > 1:
+        links.append(
+            f'<a href="{html.escape(os.path.basename(get_page_name(file_name, page - 1)))}">'
+            "Previous</a>"
+        )
+    links.append(f"Page {page} of {num_pages}")
+    if page < num_pages:
+        links.append(
+            f'<a href="{html.escape(os.path.basename(get_page_name(file_name, page + 1)))}">'
+            "Next</a>"
+        )
+    file.write(f"<p>{' | '.join(links)}</p>\n")
+
+
+def write_table_rows(file, frame):
+    """
+    Writes the rows of a DataFrame as table rows, a chunk at a time.
+    """
+    for chunk in iter_chunks(frame):
+        cells = [
+            analytics_util.concat_columns(
+                "      <td>", format_column(chunk[column]), "</td>\n"
+            )
+            for column in chunk.columns
+        ]
+        rows = analytics_util.concat_columns("    <tr>\n", *cells, "    </tr>\n")
+        file.write("".join(rows))
+        profile_util.count("report.rows", len(chunk))
+
+
+def write_html_pages(frame, file_name, page_rows):
+    """
+    Writes a DataFrame as HTML tables of at most page_rows rows, on linked pages.
+    """
+    num_pages = max(1, -(-len(frame) // page_rows))
+    title = html.escape(os.path.splitext(os.path.basename(file_name))[0])
+    headers = "".join(f"      <th>{html.escape(str(column))}</th>\n" for column in frame.columns)
+    for page in range(1, num_pages + 1):
+        with open(get_page_name(file_name, page), "w", encoding="utf-8") as file:
+            if num_pages > 1:
+                file.write(PAGE_HEADER.format(title=f"{title} ({page}/{num_pages})"))
+                write_navigation(file, file_name, page, num_pages)
+            file.write(TABLE_HEADER.format(headers=headers))
+            write_table_rows(file, frame.iloc[(page - 1) * page_rows:page * page_rows])
+            file.write(TABLE_FOOTER)
+            if num_pages > 1:
+                write_navigation(file, file_name, page, num_pages)
+                file.write(PAGE_FOOTER)
+    remove_stale_pages(file_name, num_pages)
+
+
+def write_json_page(frame, file_name, page_rows):
+    """
+    Writes a DataFrame as a JSON payload in a single page, with a table showing
+    page_rows rows at a time.
+    """
+    title = html.escape(os.path.splitext(os.path.basename(file_name))[0])
+    with open(file_name, "w", encoding="utf-8") as file:
+        file.write(PAGE_HEADER.format(title=title))
+        columns = frame.columns.to_series().astype(str).to_json(orient="values")
+        file.write(
+            '<script type="application/json" id="report-data">{"columns": '
+            f'{columns}, "data": ['
+        )
+        separator = ""
+        for chunk in iter_chunks(frame):
+            # A closing tag in a value would end the script element
+            rows = chunk.to_json(orient="values", date_format="iso")[1:-1].replace("</", "<\\/")
+            if rows:
+                file.write(separator + rows)
+                separator = ","
+            profile_util.count("report.rows", len(chunk))
+        file.write("]}</script>\n")
+        file.write(JSON_TABLE_SCRIPT % page_rows)
+        file.write(PAGE_FOOTER)
+    remove_stale_pages(file_name, 1)
+
+
+def write_html_report(frame, file_name, report_format=None, page_rows=None):
+    """
+    Writes a DataFrame to an HTML report, streaming its rows to the file in chunks.
+    Args:
+        frame (DataFrame): The rows of the report. Columns of lists are joined into strings.
+        file_name (str): The file of the report, or of its first page.
+        report_format (str, optional): "html" or "json". Defaults to the
+        GITLOG_INSIGHTS_REPORT_FORMAT setting, or "html".
+        page_rows (int, optional): The number of rows per page. Defaults to the
+        GITLOG_INSIGHTS_REPORT_PAGE_ROWS setting, or 10000.
+    Raises:
+        OSError: When the report can not be written.
+    """
+    report_format = report_format or config_util.get_setting("report_format", "html")
+    if report_format not in REPORT_FORMATS:
+        raise ValueError(
+            f"Unknown report format '{report_format}', expected one of {REPORT_FORMATS}"
+        )
+    if page_rows is None:
+        page_rows = config_util.get_int_setting("report_page_rows", DEFAULT_PAGE_ROWS)
+    page_rows = max(1, page_rows)
+    if frame.empty:
+        with open(file_name, "w", encoding="utf-8") as file:
+            file.write(NO_DATA_MESSAGE)
+        remove_stale_pages(file_name, 1)
+    elif report_format == "json":
+        write_json_page(frame, file_name, page_rows)
+    else:
+        write_html_pages(frame, file_name, page_rows)